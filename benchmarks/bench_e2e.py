@@ -0,0 +1,280 @@
+"""
+离线端到端基准：用本地桩服务器代替LLM、搜索API和被抓取的网站（见 stub_servers.py），
+在不同的章节数、迭代次数和并发运行数下完整运行 IterativeResearcher 和 DeepResearcher，
+报告每个场景的总耗时、各阶段累计耗时、事件循环最大延迟、进程峰值RSS以及每次运行的LLM调用次数。
+
+结果可以保存为JSON，并与之前保存的基线比较：总耗时超出容差或LLM调用次数变化时以非零状态退出，
+用于在部署前发现性能回退。
+
+用法：
+    python benchmarks/bench_e2e.py [--mode both] [--sections 1,3] [--iterations 1,3] [--concurrency 1,4]
+                                   [--llm-latency 0.05] [--json] [--output results.json]
+                                   [--baseline baseline.json] [--tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import itertools
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.stub_servers import StubServers
+
+
+def configure_environment(urls: Dict[str, str], cache_dir: str) -> None:
+    """把模型和搜索地址指向桩服务器，并关闭所有持久缓存，使每个场景都从冷状态开始。必须在导入 deep_researcher 之前调用。"""
+    import dotenv
+
+    # 开发者的 .env 会在导入时以 override=True 加载，可能把模型地址改回真实服务；基准必须完全离线
+    dotenv.load_dotenv = lambda *args, **kwargs: False
+    os.environ.pop("OPENAI_API_KEY", None)
+    os.environ.update({
+        "REASONING_MODEL_PROVIDER": "local",
+        "MAIN_MODEL_PROVIDER": "local",
+        "FAST_MODEL_PROVIDER": "local",
+        "REASONING_MODEL": "stub-reasoning",
+        "MAIN_MODEL": "stub-main",
+        "FAST_MODEL": "stub-fast",
+        "LOCAL_MODEL_URL": urls["llm"],
+        "SEARCH_PROVIDER": "serper",
+        "SERPER_API_KEY": "bench",
+        "SEARCH_API_URL": urls["search"],
+        "PAGE_CACHE_ENABLED": "false",
+        "SEARCH_CACHE_ENABLED": "false",
+        "LLM_CACHE_MODE": "off",
+        "CASSETTE_MODE": "off",
+        "PAGE_CACHE_PATH": os.path.join(cache_dir, "page_cache.sqlite3"),
+        "SEARCH_CACHE_PATH": os.path.join(cache_dir, "search_cache.sqlite3"),
+        "LLM_CACHE_PATH": os.path.join(cache_dir, "llm_cache.sqlite3"),
+        "LOG_PATH": os.path.join(cache_dir, "execution.log"),
+        "LOG_STDOUT": "false",
+        "NO_PROXY": "127.0.0.1,localhost",
+        "no_proxy": "127.0.0.1,localhost",
+    })
+
+
+class PhaseTimer:
+    """包装研究流程中各阶段的方法，累计每个阶段的调用次数和耗时（并发的章节各自计时，因此总和可能超过总耗时）。"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+
+    def instrument(self, cls, method_name: str, phase: str) -> None:
+        method = getattr(cls, method_name)
+
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.seconds[phase] += time.perf_counter() - started
+                self.calls[phase] += 1
+
+        setattr(cls, method_name, timed)
+
+    def reset(self) -> None:
+        self.seconds.clear()
+        self.calls.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {phase: {"seconds": round(self.seconds[phase], 3), "calls": self.calls[phase]} for phase in sorted(self.seconds)}
+
+
+class LoopLagMonitor:
+    """用一个定时协程测量事件循环的最大延迟。"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _tick(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, time.perf_counter() - start - self.interval)
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._tick())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+def peak_rss_mb() -> float:
+    """进程的峰值常驻内存（MB）。这是整个进程（包括桩服务器线程）的历史最高值，只增不减。"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+async def run_scenario(servers: StubServers, timer: PhaseTimer, mode: str, sections: int, iterations: int, concurrency: int) -> dict:
+    from deep_researcher.deep_research import DeepResearcher
+    from deep_researcher.iterative_research import IterativeResearcher
+    from deep_researcher.utils.logging import TraceInfo
+
+    servers.reset(sections=sections)
+    timer.reset()
+
+    async def run_once(index: int) -> None:
+        trace_info = TraceInfo(trace_id=f"bench-{mode}-{index}")
+        if mode == "deep":
+            researcher = DeepResearcher(max_iterations=iterations, max_time_minutes=600, verbose=False)
+            await researcher.run("基准测试：新能源汽车行业的市场格局", trace_info)
+        else:
+            researcher = IterativeResearcher(max_iterations=iterations, max_time_minutes=600, verbose=False)
+            await researcher.run("基准测试：新能源汽车行业的市场格局", trace_info)
+
+    # 研究流程会向标准输出打印大量日志，测量期间将其丢弃
+    async with LoopLagMonitor() as monitor:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(run_once(i) for i in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    llm_calls = dict(servers.llm.calls)
+    return {
+        "mode": mode,
+        "sections": sections if mode == "deep" else None,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "max_loop_lag_ms": round(monitor.max_lag * 1000, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "phases": timer.snapshot(),
+        "llm_calls_per_run": round(sum(llm_calls.values()) / concurrency, 2),
+        "llm_calls_by_agent": llm_calls,
+        "llm_tokens": dict(servers.llm.tokens),
+        "search_requests": servers.search.calls,
+        "page_requests": servers.site.calls,
+    }
+
+
+def scenario_key(result: dict) -> str:
+    return f"{result['mode']}/s{result['sections']}/i{result['iterations']}/c{result['concurrency']}"
+
+
+def compare_with_baseline(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """返回与基线相比的回退描述：总耗时超过基线的 (1 + tolerance) 倍，或每次运行的LLM调用次数发生变化。"""
+    previous = {scenario_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        key = scenario_key(result)
+        if key not in previous:
+            continue
+        before = previous[key]
+        if result["wall_seconds"] > before["wall_seconds"] * (1 + tolerance):
+            regressions.append(f"{key}: 总耗时 {before['wall_seconds']}s -> {result['wall_seconds']}s")
+        if result["llm_calls_per_run"] != before["llm_calls_per_run"]:
+            regressions.append(f"{key}: 每次运行LLM调用 {before['llm_calls_per_run']} -> {result['llm_calls_per_run']}")
+    return regressions
+
+
+async def run_all(servers: StubServers, args: argparse.Namespace) -> List[dict]:
+    from deep_researcher.deep_research import DeepResearcher
+    from deep_researcher.iterative_research import IterativeResearcher
+    from deep_researcher.tools import close_tool_resources
+
+    timer = PhaseTimer()
+    timer.instrument(DeepResearcher, "_build_report_plan", "plan")
+    timer.instrument(DeepResearcher, "_create_final_report", "final_report")
+    timer.instrument(IterativeResearcher, "_reflect", "reflect")
+    timer.instrument(IterativeResearcher, "_plan_agents", "select_agents")
+    timer.instrument(IterativeResearcher, "_run_tools", "run_tools")
+    timer.instrument(IterativeResearcher, "_create_final_report", "section_report")
+
+    modes = ["iterative", "deep"] if args.mode == "both" else [args.mode]
+    results = []
+    try:
+        for mode in modes:
+            section_counts = args.sections if mode == "deep" else [None]
+            for sections, iterations, concurrency in itertools.product(section_counts, args.iterations, args.concurrency):
+                result = await run_scenario(servers, timer, mode, sections or 1, iterations, concurrency)
+                result["sections"] = sections
+                results.append(result)
+                if not args.json:
+                    print(
+                        f"[{scenario_key(result)}] 总耗时 {result['wall_seconds']}s，事件循环最大延迟 {result['max_loop_lag_ms']} ms，"
+                        f"峰值RSS {result['peak_rss_mb']} MB，每次运行LLM调用 {result['llm_calls_per_run']} 次",
+                        flush=True,
+                    )
+    finally:
+        await close_tool_resources()
+    return results
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="离线端到端基准")
+    parser.add_argument("--mode", choices=["iterative", "deep", "both"], default="both", help="要运行的研究流程")
+    parser.add_argument("--sections", type=_int_list, default=[1, 3], help="DeepResearcher 报告的章节数（逗号分隔）")
+    parser.add_argument("--iterations", type=_int_list, default=[1, 3], help="每个研究循环的迭代次数（逗号分隔）")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4], help="同时进行的研究运行数（逗号分隔）")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="每次LLM调用的延迟（秒）")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="每次搜索请求的延迟（秒）")
+    parser.add_argument("--page-latency", type=float, default=0.01, help="每次页面请求的延迟（秒）")
+    parser.add_argument("--results-per-search", type=int, default=8, help="每次搜索返回的结果数")
+    parser.add_argument("--tasks-per-gap", type=int, default=2, help="工具选择代理为每个差距返回的搜索任务数")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    parser.add_argument("--output", type=str, help="把结果保存到此JSON文件")
+    parser.add_argument("--baseline", type=str, help="与此前保存的结果比较，发现回退时以状态1退出")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="与基线比较时允许的总耗时增幅")
+    args = parser.parse_args()
+
+    with StubServers() as servers, tempfile.TemporaryDirectory() as cache_dir:
+        urls = servers.start(
+            llm_latency=args.llm_latency,
+            search_latency=args.search_latency,
+            page_latency=args.page_latency,
+            results_per_search=args.results_per_search,
+            tasks_per_gap=args.tasks_per_gap,
+        )
+        configure_environment(urls, cache_dir)
+        results = asyncio.run(run_all(servers, args))
+
+    report = {
+        "settings": {
+            "llm_latency": args.llm_latency,
+            "search_latency": args.search_latency,
+            "page_latency": args.page_latency,
+            "results_per_search": args.results_per_search,
+            "tasks_per_gap": args.tasks_per_gap,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["scenarios"]
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"性能回退：{regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
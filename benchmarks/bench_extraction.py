@@ -0,0 +1,118 @@
+"""
+HTML提取基准：对比 BeautifulSoup 的 html_to_text / 爬虫链接提取与 lxml 单次遍历的 extract_page，
+以及50个页面同时到达时，默认线程池和提取进程池对总耗时与事件循环延迟的影响。
+
+用法：
+    python benchmarks/bench_extraction.py [--pages 50] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from bs4 import BeautifulSoup
+from benchmarks.fixtures import make_html
+from deep_researcher.tools.web_search import html_to_text
+from deep_researcher.tools.extraction import ExtractionEngine, extract_page
+
+
+def bs4_extract_links(html: str, current_url: str):
+    """原 crawl_website.extract_links 的解析逻辑（html.parser，在调用线程上运行）。"""
+    soup = BeautifulSoup(html, 'html.parser')
+    nav_links = set()
+    for nav_element in soup.find_all(['nav', 'header']):
+        for a in nav_element.find_all('a', href=True):
+            nav_links.add(urljoin(current_url, a['href']))
+    body_links = {urljoin(current_url, a['href']) for a in soup.find_all('a', href=True)} - nav_links
+    return list(nav_links), list(body_links)
+
+
+def time_call(func, *args, repeat: int = 5) -> float:
+    """返回多次调用中最快一次的耗时（毫秒）。"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def measure_concurrent(extract, pages) -> dict:
+    """并发提取所有页面，同时用一个计时协程测量事件循环的最大延迟。"""
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        interval = 0.005
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            max_lag = max(max_lag, time.perf_counter() - start - interval)
+
+    lag_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(extract(html) for html in pages))
+    wall = time.perf_counter() - start
+    running = False
+    await lag_task
+    return {"wall_ms": round(wall * 1000, 1), "max_loop_lag_ms": round(max_lag * 1000, 1)}
+
+
+async def run_concurrent(pages) -> dict:
+    loop = asyncio.get_running_loop()
+    engine = ExtractionEngine()
+
+    async def links_on_loop(html: str):
+        return bs4_extract_links(html, "https://example.com/")
+
+    # 预热进程池，避免把进程启动时间计入结果
+    await asyncio.gather(*(engine.extract(pages[0]) for _ in range(engine.max_workers or 1)))
+    try:
+        return {
+            "default_executor_html_to_text": await measure_concurrent(
+                lambda html: loop.run_in_executor(None, html_to_text, html), pages),
+            "event_loop_bs4_links": await measure_concurrent(links_on_loop, pages),
+            "extraction_engine": await measure_concurrent(
+                lambda html: engine.extract(html, "https://example.com/", with_links=True), pages),
+        }
+    finally:
+        engine.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTML提取基准")
+    parser.add_argument("--pages", type=int, default=50, help="并发场景中的页面数")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    args = parser.parse_args()
+
+    fixtures = {"en": make_html("en"), "zh": make_html("zh")}
+    results = {"single_page_ms": {}, "fixture_bytes": {lang: len(html.encode("utf-8")) for lang, html in fixtures.items()}}
+    for lang, html in fixtures.items():
+        results["single_page_ms"][lang] = {
+            "html_to_text": round(time_call(html_to_text, html), 2),
+            "extract_page": round(time_call(extract_page, html), 2),
+            "bs4_extract_links": round(time_call(bs4_extract_links, html, "https://example.com/"), 2),
+            "extract_page_with_links": round(time_call(extract_page, html, "https://example.com/", True), 2),
+        }
+    pages = [make_html("en" if i % 2 else "zh", seed=i) for i in range(args.pages)]
+    results["concurrent"] = asyncio.run(run_concurrent(pages))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"页面大小（字节）：{results['fixture_bytes']}")
+    for lang, timings in results["single_page_ms"].items():
+        print(f"[{lang}] 单页耗时（毫秒）：" + "，".join(f"{name}={value}" for name, value in timings.items()))
+    for name, stats in results["concurrent"].items():
+        print(f"[{args.pages}页并发] {name}: 总耗时 {stats['wall_ms']} ms，事件循环最大延迟 {stats['max_loop_lag_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
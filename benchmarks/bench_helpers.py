@@ -0,0 +1,170 @@
+"""
+热路径辅助函数的微基准：每个事件、每个页面或每次迭代都会调用的纯函数，
+在接近真实的数据上（大型中英文HTML、含花括号的长LLM输出、200条以上引用的报告）测量单次调用耗时。
+
+--check 把结果与 helper_thresholds.json 中的上限比较，任何函数超出上限都会列出并以状态1退出；
+优化或更换机器后可以用 --update-thresholds 按实测值乘以余量重新生成上限。
+
+用法：
+    python benchmarks/bench_helpers.py [--check] [--update-thresholds [--headroom 3]] [--only 名称前缀] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.fixtures import make_html, make_llm_output, make_log_messages, make_report_section
+from deep_researcher.agents.long_writer_agent import reformat_references, reformat_section_headings
+from deep_researcher.agents.utils.parse_output import find_json_in_string, parse_json_output
+from deep_researcher.iterative_research import Conversation, GapData, IterationData
+from deep_researcher.tools.web_search import html_to_text
+from deep_researcher.utils.context_window import THINKING_HISTORY_TOKENS
+from deep_researcher.utils.message_parser import MessageParser
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "helper_thresholds.json")
+
+
+def measure(func: Callable[[], object], setup: Optional[Callable[[], None]] = None, number: int = 1, repeat: int = 7) -> float:
+    """返回 repeat 轮中最快一轮的平均单次耗时（毫秒）。setup 在每轮计时之前调用，不计入耗时。"""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1000
+
+
+def make_conversation(iterations: int, gaps_per_iteration: int = 1, seed: int = 0) -> Conversation:
+    """构造有 iterations 次迭代的对话历史，每个差距有3个工具调用和3段较长的发现。"""
+    conversation = Conversation()
+    for i in range(iterations):
+        blocks = [
+            GapData(
+                gap=f"第{i + 1}次迭代的差距{j + 1}：新能源汽车市场的竞争格局和主要厂商份额",
+                tool_calls=[f"[Agent] WebSearchAgent [Query] query {i}-{j}-{k} [Entity] null" for k in range(3)],
+                findings=[make_llm_output("zh" if k % 2 else "en", kind="json", items=4, seed=seed + i * 10 + k) for k in range(3)],
+                sources=[f"https://example.com/{i}/{j}/{k}" for k in range(5)],
+            )
+            for j in range(gaps_per_iteration)
+        ]
+        conversation.add_iteration(IterationData(
+            gap=blocks[0].gap if gaps_per_iteration == 1 else "",
+            tool_calls=[call for block in blocks for call in block.tool_calls],
+            findings=[finding for block in blocks for finding in block.findings],
+            sources=[source for block in blocks for source in block.sources],
+            thought=[f"第{i + 1}次迭代的思考：需要进一步核实数据来源。" * 5],
+            gaps=blocks if gaps_per_iteration > 1 else [],
+        ))
+    return conversation
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object], Optional[Callable[[], None]], int]]:
+    """返回 (名称, 被测调用, 每轮之前的准备函数, 每轮调用次数) 列表。"""
+    cases = []
+
+    for lang in ("en", "zh"):
+        html = make_html(lang)
+        cases.append((f"html_to_text/{lang}", lambda html=html: html_to_text(html), None, 1))
+
+    for kind in ("json", "fenced", "embedded"):
+        output = make_llm_output("en", kind=kind)
+        cases.append((f"parse_json_output/{kind}", lambda output=output: parse_json_output(output), None, 5))
+    embedded = make_llm_output("zh", kind="embedded")
+    cases.append(("find_json_in_string/embedded", lambda: find_json_in_string(embedded), None, 5))
+
+    messages = make_log_messages()
+    cases.append(("MessageParser.parse/200_messages", lambda: [MessageParser.parse(message) for message in messages], None, 1))
+    # 调用方直接给出事件类型时（log_message 的 event 参数）不扫描消息内容
+    events = [MessageParser.parse(message) for message in messages]
+    cases.append((
+        "MessageParser.format_event/200_messages",
+        lambda: [MessageParser.format_event(event, content, trace_id="bench") for event, content in events], None, 20,
+    ))
+
+    section, section_refs, existing = make_report_section(references=250)
+    # reformat_references 会向已有参考文献列表追加新条目，每次调用使用副本
+    cases.append(("reformat_references/250_refs", lambda: reformat_references(section, section_refs, list(existing)), None, 5))
+    cases.append(("reformat_section_headings/long_section", lambda: reformat_section_headings(section), None, 20))
+
+    holder: Dict[str, Conversation] = {}
+
+    def fresh_conversation(iterations: int, gaps_per_iteration: int = 1) -> Callable[[], None]:
+        def setup() -> None:
+            holder["conversation"] = make_conversation(iterations, gaps_per_iteration)
+        return setup
+
+    warm = make_conversation(10)
+    warm.compile_conversation_history()
+    cases.append(("compile_conversation_history/10_iterations_cached", lambda: warm.compile_conversation_history(), None, 50))
+    cases.append((
+        "compile_conversation_history/10_iterations_cold",
+        lambda: holder["conversation"].compile_conversation_history(), fresh_conversation(10), 1,
+    ))
+    cases.append((
+        "compile_conversation_history/30_iterations_3_gaps_budgeted",
+        lambda: holder["conversation"].compile_conversation_history(THINKING_HISTORY_TOKENS), fresh_conversation(30, 3), 1,
+    ))
+    return cases
+
+
+def check(results: Dict[str, float], thresholds: Dict[str, float]) -> List[str]:
+    """返回超出上限的函数描述；没有上限的基准不检查。"""
+    return [
+        f"{name}: {value:.3f} ms > 上限 {thresholds[name]:.3f} ms（{value / thresholds[name]:.1f}倍）"
+        for name, value in results.items()
+        if name in thresholds and value > thresholds[name]
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="热路径辅助函数的微基准")
+    parser.add_argument("--check", action="store_true", help="与 helper_thresholds.json 比较，超出上限时以状态1退出")
+    parser.add_argument("--update-thresholds", action="store_true", help="按实测值乘以余量重写 helper_thresholds.json")
+    parser.add_argument("--headroom", type=float, default=3.0, help="重写上限时使用的余量倍数")
+    parser.add_argument("--only", type=str, default="", help="只运行名称以此开头的基准")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    args = parser.parse_args()
+
+    results = {}
+    for name, func, setup, number in build_cases():
+        if name.startswith(args.only):
+            results[name] = round(measure(func, setup, number=number), 3)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, value in results.items():
+            print(f"{name:<60} {value:>10.3f} ms")
+
+    if args.update_thresholds:
+        thresholds = {}
+        if os.path.exists(THRESHOLDS_PATH):
+            with open(THRESHOLDS_PATH, encoding="utf-8") as f:
+                thresholds = json.load(f)
+        thresholds.update({name: round(value * args.headroom, 3) for name, value in results.items()})
+        with open(THRESHOLDS_PATH, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(thresholds.items())), f, indent=2)
+            f.write("\n")
+        print(f"已更新 {THRESHOLDS_PATH}")
+
+    if args.check:
+        with open(THRESHOLDS_PATH, encoding="utf-8") as f:
+            thresholds = json.load(f)
+        failures = check(results, thresholds)
+        if failures:
+            print("\n!!! 以下辅助函数慢于基线上限 !!!", file=sys.stderr)
+            for failure in failures:
+                print(f"  {failure}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\n全部 {len(results)} 个基准均在上限之内")
+
+
+if __name__ == "__main__":
+    main()
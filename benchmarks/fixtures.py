@@ -0,0 +1,109 @@
+"""
+基准测试使用的合成数据：接近真实抓取结果的大型中英文HTML页面、含花括号的长LLM输出、带大量引用的报告章节和研究日志消息。
+"""
+
+import json
+import random
+
+_ENGLISH_WORDS = (
+    "market revenue growth quantum computing company product customer analysis report "
+    "research platform service strategy investment technology data model industry "
+    "pricing competitor regulation supply chain forecast annual quarterly share"
+).split()
+_CHINESE_PHRASES = (
+    "市场规模 持续增长 用户体验 品牌形象 社交媒体 传播效果 营销活动 行业报告 "
+    "数据显示 同比增长 竞争格局 产品创新 渠道策略 消费者 线上线下 服务质量"
+).split()
+
+
+def _english_sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(_ENGLISH_WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+
+def _chinese_sentence(rng: random.Random) -> str:
+    return "，".join(rng.choice(_CHINESE_PHRASES) for _ in range(rng.randint(4, 10))) + "。"
+
+
+def make_html(lang: str = "en", paragraphs: int = 400, links: int = 150, seed: int = 0) -> str:
+    """生成包含导航、脚本、嵌套列表和大量正文段落的HTML页面。"""
+    rng = random.Random(seed)
+    sentence = _english_sentence if lang == "en" else _chinese_sentence
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Benchmark page</title>",
+        "<script>" + "var tracking = {};" * 200 + "</script><style>p { margin: 0 }</style></head><body>",
+        "<header><nav><ul>",
+    ]
+    parts += [f"<li><a href='/section/{i}'>Section {i}</a></li>" for i in range(20)]
+    parts.append("</ul></nav></header><main>")
+    for i in range(paragraphs):
+        if i % 25 == 0:
+            parts.append(f"<h2>{sentence(rng)}</h2>")
+        if i % 10 == 0:
+            parts.append("<ul>" + "".join(f"<li><p>{sentence(rng)}</p></li>" for _ in range(3)) + "</ul>")
+        body = " ".join(sentence(rng) for _ in range(rng.randint(2, 5)))
+        parts.append(f"<div class='c'><p>{body} <a href='/article/{rng.randint(0, links)}'>more</a> <b>{sentence(rng)}</b></p></div>")
+    parts.append("</main><footer>")
+    parts += [f"<a href='https://other-{i}.example.com/page'>partner {i}</a>" for i in range(links // 5)]
+    parts.append("</footer></body></html>")
+    return "".join(parts)
+
+
+def make_llm_output(lang: str = "en", kind: str = "embedded", items: int = 60, seed: int = 0) -> str:
+    """
+    生成包含JSON的长LLM输出：
+    - json：整段输出就是JSON
+    - fenced：一段说明文字之后是 ```json 代码块
+    - embedded：JSON夹在说明文字中间，字符串值中含有成对的花括号（例如模板占位符）
+    """
+    rng = random.Random(seed)
+    sentence = _english_sentence if lang == "en" else _chinese_sentence
+    payload = {
+        "research_complete": False,
+        "outstanding_gaps": [f"{sentence(rng)} {{placeholder_{i}}} {sentence(rng)}" for i in range(items)],
+        "details": [{"id": i, "note": sentence(rng), "extra": {"score": rng.random(), "tags": ["{a}", "{b}"]}} for i in range(items)],
+    }
+    body = json.dumps(payload, ensure_ascii=False, indent=2)
+    prose = "\n\n".join(" ".join(sentence(rng) for _ in range(6)) for _ in range(items // 4))
+    if kind == "json":
+        return body
+    if kind == "fenced":
+        return f"{prose}\n\n```json\n{body}\n```\n\n{prose}"
+    return f"{prose}\n\n{body}\n\n{prose}"
+
+
+def make_report_section(references: int = 200, paragraphs: int = 120, seed: int = 0):
+    """
+    生成一个长报告章节及其参考文献列表，返回 (章节markdown, 章节参考文献, 报告已有参考文献)。
+    已有参考文献中约一半的URL与本章节重复，用于覆盖重新编号和去重两种路径。
+    """
+    rng = random.Random(seed)
+    section_refs = [f"[{i + 1}] https://source-{seed}-{i}.example.com/article/{i}" for i in range(references)]
+    existing = [f"[{i + 1}] https://source-{seed}-{i * 2}.example.com/article/{i * 2}" for i in range(references)]
+    lines = ["# Section title"]
+    for i in range(paragraphs):
+        if i % 15 == 0:
+            lines.append(f"{'#' * rng.randint(2, 4)} Subsection {i // 15}")
+        cites = " ".join(f"[{rng.randint(1, references)}]" for _ in range(rng.randint(1, 4)))
+        sentence = _english_sentence(rng) if i % 2 else _chinese_sentence(rng)
+        lines.append(f"{sentence} {_english_sentence(rng)} {cites}")
+    return "\n\n".join(lines), section_refs, existing
+
+
+def make_log_messages(count: int = 200, seed: int = 0) -> list:
+    """生成研究流程中各类日志消息的混合：带标签的事件（含大块JSON和报告草稿）和没有标签的普通消息。"""
+    rng = random.Random(seed)
+    tags = ["iteration", "agent-select", "processing", "search", "search-result", "scrape", "report-draft", "thought", "findings"]
+    messages = []
+    for i in range(count):
+        if i % 5 == 4:
+            messages.append(f"迭代研究者在 0 分钟和 {i} 秒后完成，经过 3 次迭代。")
+            continue
+        tag = tags[i % len(tags)]
+        if tag == "search-result":
+            body = json.dumps([{"url": f"https://example.com/{j}", "title": _english_sentence(rng), "description": _chinese_sentence(rng)} for j in range(30)], ensure_ascii=False)
+        elif tag == "report-draft":
+            body = "\n\n".join(_chinese_sentence(rng) for _ in range(200))
+        else:
+            body = " ".join(_english_sentence(rng) for _ in range(3))
+        messages.append(f"<{tag}>{body}</{tag}>")
+    return messages
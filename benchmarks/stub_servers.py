@@ -0,0 +1,315 @@
+"""
+端到端基准使用的本地桩服务器：OpenAI兼容的聊天补全接口、形如 api.bochaai.com 的搜索接口和静态网站。
+
+三个服务运行在独立线程的事件循环中，不占用被测研究流程的事件循环，因此测得的事件循环延迟只来自研究代码本身。
+聊天补全接口按系统提示（即代理的 instructions）识别调用的代理，用真实的输出模型构造响应，
+保证 KnowledgeGapOutput、AgentSelectionPlan、ReportPlan 等输出始终能通过解析；每次调用等待可配置的延迟。
+
+先启动桩服务器得到端口，再据此设置模型和搜索地址的环境变量并导入 deep_researcher；
+聊天补全桩在收到第一个请求时才导入代理定义。
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from benchmarks.fixtures import make_html
+
+_GAP_WORDS = (
+    "市场规模 竞争格局 用户画像 价格策略 渠道分布 政策法规 技术路线 融资情况 "
+    "供应链 品牌认知 海外市场 盈利模式 人才结构 专利布局 行业标准 客户留存"
+).split()
+
+
+def _text_content(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+class StubLLM:
+    """按代理返回合法输出的聊天补全桩，并统计每个代理的调用次数。"""
+
+    def __init__(self, latency: float = 0.05, sections: int = 3, tasks_per_gap: int = 2, agent_latency: Optional[Dict[str, float]] = None):
+        self.latency = latency
+        self.agent_latency = dict(agent_latency or {})
+        self.sections = sections
+        self.tasks_per_gap = tasks_per_gap
+        self.calls: Counter = Counter()
+        self.tokens: Counter = Counter()
+        self._sequence = 0
+        self._agents_by_instructions: Optional[Dict[str, str]] = None
+
+    def _agent_name(self, system: str) -> str:
+        if self._agents_by_instructions is None:
+            # 延迟导入：模型地址等环境变量要在桩服务器启动、端口确定之后才能设置
+            from deep_researcher.agents.knowledge_gap_agent import knowledge_gap_agent
+            from deep_researcher.agents.long_writer_agent import long_writer_agent
+            from deep_researcher.agents.planner_agent import planner_agent
+            from deep_researcher.agents.proofreader_agent import proofreader_agent
+            from deep_researcher.agents.reflection_agent import reflection_agent
+            from deep_researcher.agents.thinking_agent import thinking_agent
+            from deep_researcher.agents.tool_agents import TOOL_AGENTS
+            from deep_researcher.agents.tool_selector_agent import tool_selector_agent
+            from deep_researcher.agents.writer_agent import writer_agent
+            from deep_researcher.tools.web_search import filter_agent
+
+            agents = [
+                knowledge_gap_agent, long_writer_agent, planner_agent, proofreader_agent, reflection_agent,
+                thinking_agent, tool_selector_agent, writer_agent, filter_agent, *TOOL_AGENTS.values(),
+            ]
+            self._agents_by_instructions = {agent.instructions: agent.name for agent in agents}
+        return self._agents_by_instructions.get(system, "UnknownAgent")
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.tokens.clear()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        messages = body.get("messages", [])
+        system = next((_text_content(m) for m in messages if m.get("role") == "system"), "")
+        agent = self._agent_name(system)
+        self.calls[agent] += 1
+        self._sequence += 1
+        sequence = self._sequence
+        await asyncio.sleep(self.agent_latency.get(agent, self.latency))
+
+        user = next((_text_content(m) for m in reversed(messages) if m.get("role") == "user"), "")
+        tool_outputs = [_text_content(m) for m in messages if m.get("role") == "tool"]
+        message = self._respond(agent, sequence, user, tool_outputs, bool(body.get("tools")))
+
+        prompt_tokens = sum(len(_text_content(m)) for m in messages) // 4
+        completion_tokens = len(message.get("content") or json.dumps(message.get("tool_calls", ""))) // 4
+        self.tokens["prompt"] += prompt_tokens
+        self.tokens["completion"] += completion_tokens
+        return web.json_response({
+            "id": f"chatcmpl-stub-{sequence}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    @staticmethod
+    def _gaps(start: int, count: int = 3) -> List[str]:
+        return [
+            f"{_GAP_WORDS[(start + i) % len(_GAP_WORDS)]}与{_GAP_WORDS[(start + 3 * i + 1) % len(_GAP_WORDS)]}的最新数据"
+            for i in range(count)
+        ]
+
+    def _respond(self, agent: str, sequence: int, user: str, tool_outputs: List[str], has_tools: bool) -> Dict[str, Any]:
+        from deep_researcher.agents.knowledge_gap_agent import KnowledgeGapOutput
+        from deep_researcher.agents.long_writer_agent import LongWriterOutput
+        from deep_researcher.agents.planner_agent import ReportPlan, ReportPlanSection
+        from deep_researcher.agents.reflection_agent import ReflectionOutput
+        from deep_researcher.agents.tool_agents import ToolAgentOutput
+        from deep_researcher.agents.tool_selector_agent import AgentSelectionPlan, AgentTask
+        from deep_researcher.tools.web_search import SearchResults, WebpageSnippet
+
+        if agent == "WebSearchAgent" and has_tools and not tool_outputs:
+            # 查询带上序号，使每次工具调用都发出独立的搜索请求，而不是被进行中请求合并
+            query = " ".join(_GAP_WORDS[(sequence + i) % len(_GAP_WORDS)] for i in range(2)) + f" {sequence}"
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_stub_{sequence}",
+                    "type": "function",
+                    "function": {"name": "web_search", "arguments": json.dumps({"query": query}, ensure_ascii=False)},
+                }],
+            }
+
+        urls = list(dict.fromkeys(re.findall(r"https?://[\w.:\-]+/site/[\w\-]+\.html", "\n".join(tool_outputs) or user)))
+        if agent == "PlannerAgent":
+            output = ReportPlan(
+                background_context="基准测试使用的背景上下文。" * 20,
+                report_outline=[
+                    ReportPlanSection(title=f"第{i + 1}章 {_GAP_WORDS[i % len(_GAP_WORDS)]}", key_question=f"{_GAP_WORDS[i % len(_GAP_WORDS)]}的现状如何？")
+                    for i in range(self.sections)
+                ],
+                report_title="基准测试报告",
+            )
+        elif agent == "KnowledgeGapAgent":
+            output = KnowledgeGapOutput(research_complete=False, outstanding_gaps=self._gaps(sequence))
+        elif agent == "ReflectionAgent":
+            output = ReflectionOutput(thought="继续收集数据。" * 10, research_complete=False, outstanding_gaps=self._gaps(sequence))
+        elif agent == "ToolSelectorAgent":
+            gap = user.split("要解决的知识差距：", 1)[-1].strip().split("\n", 1)[0].strip()
+            output = AgentSelectionPlan(tasks=[
+                AgentTask(gap=gap, agent="WebSearchAgent", query=f"{gap} {i}") for i in range(self.tasks_per_gap)
+            ])
+        elif agent in ("WebSearchAgent", "SiteCrawlerAgent"):
+            output = ToolAgentOutput(
+                output="\n\n".join(f"根据搜索结果，相关数据持续增长 [{url}]。" * 5 for url in urls[:5]) or "未找到相关结果",
+                sources=urls[:5],
+            )
+        elif agent == "SearchFilterAgent":
+            output = SearchResults(results_list=[WebpageSnippet(url=url, title="", description="") for url in urls])
+        elif agent == "LongWriterAgent":
+            output = LongWriterOutput(
+                next_section_markdown="## 章节\n\n" + "数据显示市场持续增长 [1]，竞争加剧 [2]。\n\n" * 10,
+                references=[f"[1] https://example.com/{sequence}/a", f"[2] https://example.com/{sequence}/b"],
+            )
+        else:
+            # ThinkingAgent、WriterAgent、ProofreaderAgent 输出纯文本
+            return {"role": "assistant", "content": "## 小结\n\n" + "研究发现市场规模持续增长 [1]。\n\n" * 20}
+        return {"role": "assistant", "content": output.model_dump_json()}
+
+
+class StubSearch:
+    """形如 api.bochaai.com/v1/web-search 的搜索接口，结果指向静态网站桩。"""
+
+    def __init__(self, site_url: str, latency: float = 0.02, results: int = 8):
+        self.site_url = site_url
+        self.latency = latency
+        self.results = results
+        self.calls = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        query = body.get("query", "")
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        slug = f"{zlib.crc32(query.encode('utf-8')):08x}"
+        value = [
+            {
+                "id": f"https://api.bochaai.com/v1/#WebPages.{i}",
+                "name": f"{query} - 第{i + 1}条结果",
+                "url": f"{self.site_url}/site/{slug}-{i}.html",
+                "displayUrl": f"{self.site_url}/site/{slug}-{i}.html",
+                "snippet": f"{query}的相关报道。",
+                "summary": f"{query}的相关报道和数据分析。",
+                "siteName": "基准测试站点",
+                "siteIcon": "",
+                "datePublished": "2024-01-01T00:00:00+08:00",
+                "dateLastCrawled": "2024-01-01T00:00:00Z",
+                "cachedPageUrl": None,
+                "language": None,
+                "isFamilyFriendly": None,
+                "isNavigational": None,
+            }
+            for i in range(self.results)
+        ]
+        return web.json_response({
+            "code": 200,
+            "log_id": f"stub-{self.calls}",
+            "msg": None,
+            "data": {
+                "_type": "SearchResponse",
+                "queryContext": {"originalQuery": query},
+                "webPages": {
+                    "webSearchUrl": "",
+                    "totalEstimatedMatches": self.results,
+                    "value": value,
+                    "someResultsRemoved": False,
+                },
+                "images": None,
+                "videos": None,
+            },
+        })
+
+
+class StubSite:
+    """返回合成中英文HTML页面的静态网站，页面内容由路径决定。"""
+
+    def __init__(self, latency: float = 0.01, paragraphs: int = 120):
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.calls = 0
+        self._pages: Dict[str, bytes] = {}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if name not in self._pages:
+            seed = zlib.crc32(name.encode("utf-8"))
+            self._pages[name] = make_html("en" if seed % 2 else "zh", paragraphs=self.paragraphs, links=40, seed=seed).encode("utf-8")
+        return web.Response(body=self._pages[name], content_type="text/html", charset="utf-8")
+
+
+class StubServers:
+    """在后台线程中启动三个桩服务器。用作上下文管理器，退出时关闭。"""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="bench-stub-servers", daemon=True)
+        self._runners: List[web.AppRunner] = []
+        self.llm: Optional[StubLLM] = None
+        self.search: Optional[StubSearch] = None
+        self.site: Optional[StubSite] = None
+
+    def start(
+        self,
+        llm_latency: float = 0.05,
+        search_latency: float = 0.02,
+        page_latency: float = 0.01,
+        results_per_search: int = 8,
+        page_paragraphs: int = 120,
+        **llm_options,
+    ) -> Dict[str, str]:
+        """启动三个服务，返回 {"llm": 聊天补全基础地址, "search": 搜索接口地址, "site": 网站基础地址}。"""
+        self._thread.start()
+        self.site = StubSite(latency=page_latency, paragraphs=page_paragraphs)
+        site_url = self._serve(web.get("/site/{name}", self.site.handle))
+        self.search = StubSearch(site_url, latency=search_latency, results=results_per_search)
+        search_url = self._serve(web.post("/v1/web-search", self.search.handle)) + "/v1/web-search"
+        self.llm = StubLLM(latency=llm_latency, **llm_options)
+        llm_url = self._serve(web.post("/v1/chat/completions", self.llm.handle)) + "/v1"
+        return {"llm": llm_url, "search": search_url, "site": site_url}
+
+    def _serve(self, route) -> str:
+        async def start() -> str:
+            app = web.Application(client_max_size=64 * 1024 * 1024)
+            app.add_routes([route])
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            self._runners.append(runner)
+            host, port = runner.addresses[0][:2]
+            return f"http://{host}:{port}"
+        return asyncio.run_coroutine_threadsafe(start(), self._loop).result()
+
+    def reset(self, **llm_options) -> None:
+        """清零各服务的调用计数，并可修改聊天补全桩的选项（如 sections）。"""
+        async def reset():
+            self.llm.reset()
+            for name, value in llm_options.items():
+                setattr(self.llm, name, value)
+            self.search.calls = 0
+            self.site.calls = 0
+        asyncio.run_coroutine_threadsafe(reset(), self._loop).result()
+
+    def close(self) -> None:
+        async def cleanup():
+            for runner in self._runners:
+                await runner.cleanup()
+        if self._thread.is_alive():
+            asyncio.run_coroutine_threadsafe(cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def __enter__(self) -> "StubServers":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,7 +1,10 @@
 from typing import Any, Callable, Optional
 from agents import Agent, Runner, RunResult,set_tracing_disabled
 from agents.run_context import TContext
-from ..utils.logging import log_message
+from ..utils.logging import log_local
+from ..utils.metrics import span
+from ..utils.usage import model_name
+from .response_cache import response_cache
 set_tracing_disabled(True)
 
 class ResearchAgent(Agent[TContext]):
@@ -50,18 +53,29 @@ class ResearchRunner(Runner):
     @classmethod
     async def run(cls, *args, **kwargs) -> RunResult:
         """运行代理并在适用的情况下使用自定义解析器处理其输出"""
-        print(f"关键字参数 (kwargs): {kwargs}")
-        print(f"参数 (args): {args}")
+        log_local(lambda: f"关键字参数 (kwargs): {kwargs}")
+        log_local(lambda: f"参数 (args): {args}")
 
         
-        # 获取起始代理
+        # 获取起始代理和输入
         starting_agent = kwargs.get('starting_agent') or args[0]
-   
-        # 调用原始run方法
-        result = await Runner.run(*args, **kwargs)
-        
-        # 如果起始代理是ResearchAgent类型，解析输出
-        if isinstance(starting_agent, ResearchAgent):
-            return await starting_agent.parse_output(result)
+        input = kwargs['input'] if 'input' in kwargs else args[1]
+
+        async with span("agent", starting_agent.name, input=input) as current:
+            # 相同的请求优先使用LLM响应缓存（按代理设置的模式，默认关闭）
+            result = await response_cache.get(starting_agent, input)
+            if result is None:
+                # 调用原始run方法
+                result = await Runner.run(*args, **kwargs)
+                await response_cache.put(starting_agent, input, result)
+                # 把这次调用的token用量记到运行的用量统计上（缓存命中不消耗token）
+                context = kwargs.get('context')
+                if getattr(context, 'usage', None) is not None:
+                    context.usage.record(starting_agent.name, model_name(starting_agent), result, section=context.section)
+            
+            # 如果起始代理是ResearchAgent类型，解析输出
+            if isinstance(starting_agent, ResearchAgent):
+                result = await starting_agent.parse_output(result)
+            current.set_output(result.final_output)
         
         return result
\ No newline at end of file
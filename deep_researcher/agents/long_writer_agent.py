@@ -25,7 +25,7 @@ from .utils.parse_output import create_type_parser
 from datetime import datetime
 from pydantic import BaseModel, Field
 from .proofreader_agent import ReportDraft
-from typing import List, Tuple, Dict
+from typing import List, Optional, Tuple, Dict
 import re
 from ..utils.logging import TraceInfo  # 添加这个导入
 
@@ -86,6 +86,7 @@ async def write_next_section(
     report_draft: str,
     next_section_title: str,
     next_section_draft: str,
+    trace_info: Optional[TraceInfo] = None,
 ) -> LongWriterOutput:
     """编写报告的下一部分"""
 
@@ -110,6 +111,7 @@ async def write_next_section(
     result = await ResearchRunner.run(
         long_writer_agent,
         user_message,
+        context=trace_info,
     )
 
     return result.final_output_as(LongWriterOutput)
@@ -119,6 +121,7 @@ async def write_report(
     original_query: str,
     report_title: str,
     report_draft: ReportDraft,
+    trace_info: Optional[TraceInfo] = None,
 ) -> str:
     """通过迭代编写每个部分来编写最终报告"""
 
@@ -128,7 +131,7 @@ async def write_report(
 
     for section in report_draft.sections:
         # 生成每个部分的最终草稿，并将其与相应的参考文献一起添加到报告中
-        next_section_draft = await write_next_section(original_query, final_draft, section.section_title, section.section_content)
+        next_section_draft = await write_next_section(original_query, final_draft, section.section_title, section.section_content, trace_info=trace_info)
         section_markdown, all_references = reformat_references(
             next_section_draft.next_section_markdown,
             next_section_draft.references,
@@ -0,0 +1,70 @@
+"""
+把 thinking_agent 的反思和 knowledge_gap_agent 的差距评估合并为一次调用的代理。
+
+该代理接受与两者相同的输入（原始查询、背景上下文和研究历史），然后：
+1. 反思到目前为止的研究过程（对应 ThinkingAgent 的输出）
+2. 评估发现是否足够完整以结束研究循环
+3. 如果不是，确定最多3个需要按顺序解决的知识差距
+4. 返回一个ReflectionOutput对象
+
+两次调用合并为一次后，每次迭代少一次LLM往返，研究历史也只在提示中出现一次。
+"""
+
+from pydantic import BaseModel, Field
+from typing import List
+from .baseclass import ResearchAgent
+from ..llm_client import reasoning_model, model_supports_structured_output
+from datetime import datetime
+from .utils.parse_output import create_type_parser
+from ..utils.logging import TraceInfo
+
+
+class ReflectionOutput(BaseModel):
+    thought: str = Field(..., description="对研究过程的反思和下一步的想法")
+    research_complete: bool = Field(..., description="研究是否足够完整以结束循环")
+    outstanding_gaps: List[str] = Field(default_factory=list, description="待解决的知识差距列表")
+
+
+INSTRUCTIONS = f"""
+你是一位研究专家，负责管理迭代研究过程并评估研究的当前状态。今天的日期是{datetime.now().strftime("%Y-%m-%d")}。
+
+你获得的内容：
+1. 原始研究查询以及一些支持性背景上下文
+2. 你在研究过程中迄今为止所做的任务、行动、发现和思考的历史记录（在第一次迭代中，这将为空）
+
+你的任务分为两步：
+
+第一步：反思到目前为止的研究过程，写入 thought 字段。你的想法应包括对以下问题的反思：
+- 你从上一次迭代中学到了什么？
+- 你想探索哪些新领域，或者想深入研究哪些现有主题？
+- 你能够在上一次迭代中检索到你正在寻找的信息吗？如果不能，我们应该改变方法还是转向下一个主题？
+- 是否有任何信息相互矛盾或冲突？
+以简洁、非正式的意识流形式写出，集中在最近的迭代以及它如何影响下一次迭代。
+如果这是第一次迭代，说明我们在第一次迭代中需要收集哪些信息以开始。不要生成最终报告的草稿。
+
+第二步：根据发现和你的反思，评估研究在回答原始查询方面的完整性：
+- research_complete: 布尔值，发现是否足够完整以结束研究循环
+- outstanding_gaps: 如果研究未完成，列出需要按顺序解决的最多3个知识差距，这些应与原始查询相关
+
+我们的目标是进行非常深入和彻底的研究。差距要具体并包括相关信息，因为它将传递给另一个代理处理，而不需要额外的上下文。
+
+仅输出JSON并遵循以下JSON模式。不要输出其他任何内容。我将使用Pydantic解析，因此仅输出有效的JSON：
+{ReflectionOutput.model_json_schema()}
+
+示例输出格式：
+{{
+    "thought": "对研究过程的反思",
+    "research_complete": false,
+    "outstanding_gaps": ["差距1的具体描述", "差距2的具体描述"]
+}}
+"""
+
+selected_model = reasoning_model
+
+reflection_agent = ResearchAgent[TraceInfo](
+    name="ReflectionAgent",
+    instructions=INSTRUCTIONS,
+    model=selected_model,
+    output_type=ReflectionOutput if model_supports_structured_output(selected_model) else None,
+    output_parser=create_type_parser(ReflectionOutput) if not model_supports_structured_output(selected_model) else None
+)
@@ -0,0 +1,185 @@
+"""
+ResearchRunner.run 的LLM响应缓存。
+
+规划器对同一查询重新运行、对相同结果再次过滤、开发时重跑同一任务，都会发出完全相同的LLM请求。
+此缓存以代理名称、模型、指令哈希、输入和工具定义（以及输出类型的模式）为键，把最终输出保存在SQLite中，
+按有效期（TTL）过期，按总大小以LRU淘汰。命中时不调用模型，返回的 RunResult 只有 final_output，
+raw_responses 为空（不消耗token）。
+
+缓存模式可以按代理设置：
+- off：不读不写（默认）
+- read-write：命中时返回缓存，未命中时调用模型并写入
+- read-only：只读取已有的缓存，不写入新结果（例如用固定的缓存重现一次运行）
+
+默认模式由 LLM_CACHE_MODE 设置，LLM_CACHE_AGENT_MODES 按代理覆盖，例如 "WriterAgent=off,ThinkingAgent=read-only"。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from agents import Agent, FunctionTool, RunResult
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from ..utils.cache_store import SQLiteCacheStore
+
+load_dotenv()
+
+CACHE_MODES = ("off", "read-write", "read-only")
+
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off")
+LLM_CACHE_AGENT_MODES = os.getenv("LLM_CACHE_AGENT_MODES", "")
+LLM_CACHE_PATH = os.path.expanduser(os.getenv("LLM_CACHE_PATH", "~/.cache/deep_researcher/llm_cache.sqlite3"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # 响应有效期（秒）
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def parse_agent_modes(spec: str) -> Dict[str, str]:
+    """解析 "AgentA=off,AgentB=read-only" 形式的按代理缓存模式。"""
+    modes = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, mode = (part.strip() for part in item.split("=", 1))
+        if mode not in CACHE_MODES:
+            raise ValueError(f"未知的LLM缓存模式：{mode}，可选：{', '.join(CACHE_MODES)}")
+        modes[name] = mode
+    return modes
+
+
+class ResponseCache:
+    """以请求内容为键的LLM最终输出缓存。"""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl: int = LLM_CACHE_TTL,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        mode: str = LLM_CACHE_MODE,
+        agent_modes: Optional[Dict[str, str]] = None,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"未知的LLM缓存模式：{mode}，可选：{', '.join(CACHE_MODES)}")
+        self.ttl = ttl
+        self.mode = mode
+        self.agent_modes: Dict[str, str] = dict(agent_modes if agent_modes is not None else parse_agent_modes(LLM_CACHE_AGENT_MODES))
+        self.store = SQLiteCacheStore(path, max_bytes=max_bytes, table="responses")
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "uncacheable": 0,
+        }
+
+    def mode_for(self, agent: Agent) -> str:
+        return self.agent_modes.get(agent.name, self.mode)
+
+    def set_mode(self, agent_name: str, mode: str) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"未知的LLM缓存模式：{mode}，可选：{', '.join(CACHE_MODES)}")
+        self.agent_modes[agent_name] = mode
+
+    @staticmethod
+    def make_key(agent: Agent, input: Any) -> Optional[str]:
+        """由代理名称、模型、指令哈希、输入、工具定义和输出类型生成缓存键；指令是动态函数时返回None（不可缓存）。"""
+        if not isinstance(agent.instructions, (str, type(None))):
+            return None
+        model = agent.model
+        tools = [
+            [tool.name, tool.description, tool.params_json_schema] if isinstance(tool, FunctionTool) else repr(tool)
+            for tool in agent.tools
+        ]
+        output_type = agent.output_type
+        output_schema = output_type.model_json_schema() if isinstance(output_type, type) and issubclass(output_type, BaseModel) else repr(output_type)
+        payload = json.dumps(
+            [
+                agent.name,
+                model if isinstance(model, (str, type(None))) else [type(model).__name__, getattr(model, "model", repr(model))],
+                hashlib.sha256((agent.instructions or "").encode("utf-8")).hexdigest(),
+                input,
+                tools,
+                output_schema,
+            ],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=repr,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, agent: Agent, input: Any) -> Optional[RunResult]:
+        """返回缓存的运行结果，未命中（或该代理未启用缓存）时返回None。"""
+        if self.mode_for(agent) == "off":
+            return None
+        key = self.make_key(agent, input)
+        if key is None:
+            self.counters["uncacheable"] += 1
+            return None
+        try:
+            row = await asyncio.to_thread(self.store.get, key)
+        except Exception as e:
+            print(f"读取LLM响应缓存出错: {str(e)}")
+            row = None
+        if row is None or time.time() - row[1] >= self.ttl:
+            self.counters["misses"] += 1
+            return None
+        try:
+            final_output = self._decode(agent, row[0])
+        except Exception as e:
+            print(f"解析LLM响应缓存出错: {str(e)}")
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return RunResult(
+            input=input,
+            new_items=[],
+            raw_responses=[],
+            final_output=final_output,
+            input_guardrail_results=[],
+            output_guardrail_results=[],
+            _last_agent=agent,
+        )
+
+    async def put(self, agent: Agent, input: Any, result: RunResult) -> None:
+        if self.mode_for(agent) != "read-write":
+            return
+        key = self.make_key(agent, input)
+        value = self._encode(result.final_output)
+        if key is None or value is None:
+            self.counters["uncacheable"] += 1
+            return
+        try:
+            await asyncio.to_thread(self.store.put, key, value)
+            self.counters["stores"] += 1
+        except Exception as e:
+            print(f"写入LLM响应缓存出错: {str(e)}")
+
+    @staticmethod
+    def _encode(final_output: Any) -> Optional[bytes]:
+        if isinstance(final_output, BaseModel):
+            record = {"kind": "model", "value": final_output.model_dump(mode="json")}
+        else:
+            record = {"kind": "json", "value": final_output}
+        try:
+            return json.dumps(record, ensure_ascii=False).encode("utf-8")
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _decode(agent: Agent, value: bytes) -> Any:
+        record = json.loads(value)
+        if record["kind"] == "model":
+            return agent.output_type.model_validate(record["value"])
+        return record["value"]
+
+    def stats(self) -> Dict[str, float]:
+        stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache()
@@ -1,13 +1,16 @@
 import asyncio
 import time
+from dataclasses import replace
 from fastapi import WebSocket
-from .iterative_research import IterativeResearcher
+from .iterative_research import GAPS_PER_ITERATION, REFLECTION_MODE, SPECULATIVE_GAPS, IterativeResearcher
 from .agents.planner_agent import planner_agent, ReportPlan, ReportPlanSection
 from .agents.proofreader_agent import ReportDraftSection, ReportDraft, proofreader_agent
 from .agents.long_writer_agent import write_report
 from .agents.baseclass import ResearchRunner
 from typing import List
 from .utils.logging import TraceInfo, log_message
+from .utils.metrics import span
+from .utils.usage import COST_BUDGET, TOKEN_BUDGET, UsageTracker, format_usage
 
 class DeepResearcher:
     """
@@ -18,18 +21,30 @@ class DeepResearcher:
             max_iterations: int = 5,
             max_time_minutes: int = 10,
             verbose: bool = True,
-            tracing: bool = False
+            tracing: bool = False,
+            reflection_mode: str = REFLECTION_MODE,
+            gaps_per_iteration: int = GAPS_PER_ITERATION,
+            speculative_gaps: int = SPECULATIVE_GAPS,
+            token_budget: int = TOKEN_BUDGET,
+            cost_budget: float = COST_BUDGET,
         ):
         self.max_iterations = max_iterations
         self.max_time_minutes = max_time_minutes
         self.verbose = verbose
         self.tracing = tracing
+        self.reflection_mode = reflection_mode
+        self.gaps_per_iteration = gaps_per_iteration
+        self.speculative_gaps = speculative_gaps
+        # 整个运行（所有章节共享）的token和费用预算，0表示不限制
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
         self.trace_info = TraceInfo(trace_id="0")   
 
     async def run(self, query: str ,trace_info:TraceInfo) -> str:
         """运行深度研究工作流"""
         start_time = time.time()
-        self.trace_info = trace_info
+        # 所有章节共用一个用量统计，预算对整个运行生效
+        self.trace_info = replace(trace_info, usage=UsageTracker(token_budget=self.token_budget, cost_budget=self.cost_budget))
         print(f"_build_report_plan: {query}")
         # 首先构建报告计划，概述章节并编译与查询相关的任何背景上下文
         report_plan: ReportPlan = await self._build_report_plan(query)
@@ -40,23 +55,34 @@ class DeepResearcher:
         # 从原始报告计划和每个章节的草稿创建最终报告
         final_report: str = await self._create_final_report(query, report_plan, research_results)
 
+        usage = self.trace_info.usage
+        by_section = "\n".join(f"{title}：{format_usage(totals)}" for title, totals in usage.by_section.items())
+        await log_message(
+            f"本次运行共用 {format_usage(usage.total)}\n{by_section}",
+            self.trace_info,
+            additional_data={"usage": usage.summary()},
+            event="usage-summary",
+        )
+
         elapsed_time = time.time() - start_time
-        await log_message(f"DeepResearcher 在 {int(elapsed_time // 60)} 分钟和 {int(elapsed_time % 60)} 秒内完成",self.trace_info)
+        await log_message(f"DeepResearcher 在 {int(elapsed_time // 60)} 分钟和 {int(elapsed_time % 60)} 秒内完成", self.trace_info, event="info")
 
         return final_report
 
     async def _build_report_plan(self, query: str) -> ReportPlan:
         """构建初始报告计划，包括报告大纲（章节和关键问题）和背景上下文"""
         
-        await log_message("<plan-start> 构建报告大纲 </plan-start>" ,self.trace_info)
+        await log_message("构建报告大纲" ,self.trace_info, event="plan-start")
         user_message = f"QUERY: {query}"
                  
-        result = await ResearchRunner.run(
-            planner_agent,
-            user_message,
-            context = self.trace_info
-        )
-        report_plan = result.final_output_as(ReportPlan)
+        async with span("phase", "plan", input=user_message) as current:
+            result = await ResearchRunner.run(
+                planner_agent,
+                user_message,
+                context = self.trace_info
+            )
+            report_plan = result.final_output_as(ReportPlan)
+            current.set_output(report_plan)
 
         if self.verbose:
             num_sections = len(report_plan.report_outline)
@@ -65,10 +91,10 @@ class DeepResearcher:
                 message_log += f"\n\n以下背景上下文已包含在报告构建中：\n{report_plan.background_context}"
             else:
                 message_log += "\n\n报告构建中未提供背景上下文。\n"
-            await log_message(f"<plan-section>已创建包含 {num_sections} 个章节的报告计划：\n{message_log}</plan-section>",self.trace_info)
+            await log_message(f"已创建包含 {num_sections} 个章节的报告计划：\n{message_log}",self.trace_info, event="plan-section")
 
         
-        await log_message(f"<plan-end> 完整报告计划:\n{report_plan.model_dump_json(indent=2)}</plan-end>",self.trace_info)
+        await log_message(f"完整报告计划:\n{report_plan.model_dump_json(indent=2)}",self.trace_info, event="plan-end")
         return report_plan
 
     async def _run_research_loops(
@@ -76,26 +102,33 @@ class DeepResearcher:
         report_plan: ReportPlan
     ) -> List[str]:
         """对于给定的 ReportPlan，为每个章节并发运行研究循环并收集结果"""
+        queued_at = time.perf_counter()
+
         async def run_research_for_section(section: ReportPlanSection):
             iterative_researcher = IterativeResearcher(
                 max_iterations=self.max_iterations,
                 max_time_minutes=self.max_time_minutes,
                 verbose=self.verbose,
-                tracing=False
+                tracing=False,
+                reflection_mode=self.reflection_mode,
+                gaps_per_iteration=self.gaps_per_iteration,
+                speculative_gaps=self.speculative_gaps,
             )
             args = {
                 "query": section.key_question,
-                "trace_info": self.trace_info,
+                "trace_info": replace(self.trace_info, section=section.title),
                 "output_length": "",
                 "output_instructions": "",
                 "background_context": report_plan.background_context,
             }
             
             # 仅在启用跟踪时使用自定义跨度
-            await log_message("=== 初始化研究循环 ===",self.trace_info)
-            await log_message(f"<research-start> 开始研究章节: {section.title} - 关键问题: {section.key_question}</research-start>",self.trace_info)
-            result = await iterative_researcher.run(**args)
-            await log_message(f"<research-end> 完成章节研究: {section.title}</research-end>",self.trace_info)
+            await log_message("=== 初始化研究循环 ===", self.trace_info, event="info")
+            await log_message(f"开始研究章节: {section.title} - 关键问题: {section.key_question}",self.trace_info, event="research-start")
+            async with span("phase", "section", input=section.key_question, queued_at=queued_at) as current:
+                result = await iterative_researcher.run(**args)
+                current.set_output(result)
+            await log_message(f"完成章节研究: {section.title}",self.trace_info, event="research-end")
             return result
         
         
@@ -104,7 +137,7 @@ class DeepResearcher:
             *(run_research_for_section(section) for section in report_plan.report_outline)
         )
         for i, result in enumerate(research_results):
-                await log_message(f"<research-result> 章节 {i+1} 研究结果:\n{result}</research-result>",self.trace_info)
+                await log_message(f"章节 {i+1} 研究结果:\n{result}",self.trace_info, event="research-result")
         return research_results
 
     async def _create_final_report(
@@ -116,7 +149,7 @@ class DeepResearcher:
     ) -> str:
         """从原始报告计划和每个章节的草稿创建最终报告"""
     
-        await log_message(f"<report-create>=== 构建最终报告 ===</report-create>",self.trace_info)
+        await log_message("=== 构建最终报告 ===",self.trace_info, event="report-create")
         # 每个章节是一个包含该章节 markdown 的字符串
         # 从中我们需要构建一个 ReportDraft 对象，以提供给最终校对代理
         report_draft = ReportDraft(
@@ -131,19 +164,21 @@ class DeepResearcher:
             )
 
         
-        if use_long_writer:
-            await log_message(f"<report-draft>使用 LongWriter 处理报告草稿：\n{report_draft.model_dump_json(indent=2)}</report-draft>",self.trace_info)
-            final_output = await write_report(query, report_plan.report_title, report_draft)
-        else:
-            user_prompt = f"QUERY:\n{query}\n\nREPORT DRAFT:\n{report_draft.model_dump_json()}"
-            # 运行校对代理以生成最终报告
-            final_report = await ResearchRunner.run(
-                proofreader_agent,
-                user_prompt,
-                context = self.trace_info
-            )
-            final_output = final_report.final_output
+        async with span("phase", "final_report", input=report_draft) as current:
+            if use_long_writer:
+                await log_message(f"使用 LongWriter 处理报告草稿：\n{report_draft.model_dump_json(indent=2)}",self.trace_info, event="report-draft")
+                final_output = await write_report(query, report_plan.report_title, report_draft, trace_info=self.trace_info)
+            else:
+                user_prompt = f"QUERY:\n{query}\n\nREPORT DRAFT:\n{report_draft.model_dump_json()}"
+                # 运行校对代理以生成最终报告
+                final_report = await ResearchRunner.run(
+                    proofreader_agent,
+                    user_prompt,
+                    context = self.trace_info
+                )
+                final_output = final_report.final_output
+            current.set_output(final_output)
 
-        await log_message(f"<report-finish>最终报告已完成</report-finish>",self.trace_info)
+        await log_message("最终报告已完成",self.trace_info, event="report-finish")
 
         return final_output
\ No newline at end of file
@@ -1,45 +1,112 @@
 from __future__ import annotations
 import asyncio
+import os
 import time
-from typing import Dict, List, Optional
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
 from .agents.baseclass import ResearchRunner
 from .agents.writer_agent import writer_agent
 from .agents.knowledge_gap_agent import KnowledgeGapOutput, knowledge_gap_agent
 from .agents.tool_selector_agent import AgentTask, AgentSelectionPlan, tool_selector_agent
 from .agents.thinking_agent import thinking_agent
+from .agents.reflection_agent import ReflectionOutput, reflection_agent
 from .agents.tool_agents import TOOL_AGENTS, ToolAgentOutput
-from pydantic import BaseModel, Field
-from .utils.logging import log_message,TraceInfo
+from pydantic import BaseModel, Field, PrivateAttr
+from .utils.logging import log_local, log_message, TraceInfo
+from .utils.metrics import span
+from .utils.simhash import SimHashIndex
+from .utils.speculation import SpeculativeScheduler
+from .utils.context_window import (
+    BRIEF, FULL, GAP_HISTORY_TOKENS, SELECTOR_HISTORY_TOKENS, THINKING_HISTORY_TOKENS, window_history,
+)
+from .utils.tokens import estimate_tokens
+from .utils.usage import COST_BUDGET, TOKEN_BUDGET, UsageTracker, format_usage
 import json
 
+# 反思步骤的模式：split 依次调用 thinking_agent 和 knowledge_gap_agent；fused 由 reflection_agent 一次完成
+REFLECTION_MODES = ("split", "fused")
+REFLECTION_MODE = os.getenv("REFLECTION_MODE", "split")
+# 每次迭代并发解决的知识差距数量（取差距评估返回的前K个），1表示每次迭代只解决第一个差距
+GAPS_PER_ITERATION = int(os.getenv("GAPS_PER_ITERATION", "1"))
+# 每次迭代为评估返回的后续差距投机启动的研究任务数量，0表示不投机执行
+SPECULATIVE_GAPS = int(os.getenv("SPECULATIVE_GAPS", "0"))
+
+class GapData(BaseModel):
+    """同一次迭代中并发解决的单个知识差距的数据。"""
+    gap: str = Field(description="要解决的差距")
+    tool_calls: List[str] = Field(description="为该差距进行的工具调用", default_factory=list)
+    findings: List[str] = Field(description="该差距的工具调用收集的发现", default_factory=list)
+    sources: List[str] = Field(description="发现引用的来源", default_factory=list)
+
+
 class IterationData(BaseModel):
     """单次研究循环迭代的数据。"""
     gap: str = Field(description="迭代中解决的差距", default_factory=list)
     tool_calls: List[str] = Field(description="进行的工具调用", default_factory=list)
     findings: List[str] = Field(description="从工具调用中收集的发现", default_factory=list)
     thought: List[str] = Field(description="对迭代成功和下一步进行反思的思考", default_factory=list)
+    sources: List[str] = Field(description="发现引用的来源", default_factory=list)
+    gaps: List[GapData] = Field(description="并发解决多个差距时每个差距各自的数据", default_factory=list)
 
 
 class Conversation(BaseModel):
     """用户与迭代研究者之间的对话。"""
     history: List[IterationData] = Field(description="研究循环每次迭代的数据", default_factory=list)
+    # 每次迭代按详细程度缓存的渲染片段及其token数，空字典表示需要重新渲染；只有被 set_latest_* 修改的迭代才会重新渲染
+    _segments: List[Dict[str, Tuple[str, int]]] = PrivateAttr(default_factory=list)
 
     def add_iteration(self, iteration_data: Optional[IterationData] = None):
         if iteration_data is None:
             iteration_data = IterationData()
         self.history.append(iteration_data)
+        self._mark_latest_dirty()
     
     def set_latest_gap(self, gap: str):
         self.history[-1].gap = gap
+        self._mark_latest_dirty()
 
     def set_latest_tool_calls(self, tool_calls: List[str]):
         self.history[-1].tool_calls = tool_calls
+        self._mark_latest_dirty()
 
     def set_latest_findings(self, findings: List[str]):
         self.history[-1].findings = findings
+        self._mark_latest_dirty()
+
+    def set_latest_sources(self, sources: List[str]):
+        self.history[-1].sources = sources
+        self._mark_latest_dirty()
 
     def set_latest_thought(self, thought: str):
         self.history[-1].thought = thought
+        self._mark_latest_dirty()
+
+    def set_latest_gaps(self, gaps: List[str]):
+        """记录本次迭代并发解决的多个差距，第一个差距同时作为迭代的 gap。"""
+        self.history[-1].gap = gaps[0]
+        self.history[-1].gaps = [GapData(gap=gap) for gap in gaps]
+        self._mark_latest_dirty()
+
+    def set_latest_gap_results(self, gap_index: int, tool_calls: List[str], findings: List[str], sources: List[str]):
+        """记录本次迭代中第 gap_index 个差距的工具调用和发现，并汇总到迭代的发现中。"""
+        iteration_data = self.history[-1]
+        gap_data = iteration_data.gaps[gap_index]
+        gap_data.tool_calls, gap_data.findings, gap_data.sources = tool_calls, findings, sources
+        iteration_data.tool_calls = [call for data in iteration_data.gaps for call in data.tool_calls]
+        iteration_data.findings = [finding for data in iteration_data.gaps for finding in data.findings]
+        iteration_data.sources = list(dict.fromkeys(source for data in iteration_data.gaps for source in data.sources))
+        self._mark_latest_dirty()
+
+    def _mark_latest_dirty(self):
+        self._sync_segments()
+        if self._segments:
+            self._segments[-1] = {}
+
+    def _sync_segments(self):
+        """使片段缓存与history的长度一致（例如history被直接赋值或追加时）。"""
+        if len(self._segments) > len(self.history):
+            del self._segments[len(self.history):]
+        self._segments.extend({} for _ in range(len(self.history) - len(self._segments)))
 
     def get_latest_gap(self) -> str:
         return self.history[-1].gap
@@ -56,45 +123,92 @@ class Conversation(BaseModel):
     def get_all_findings(self) -> List[str]:
         return [finding for iteration_data in self.history for finding in iteration_data.findings]
 
-    def compile_conversation_history(self) -> str:
-        """将对话历史编译成字符串。"""
-        conversation = ""
-        for iteration_num, iteration_data in enumerate(self.history):
-            conversation += f"[迭代 {iteration_num + 1}]\n\n"
-            if iteration_data.thought:
-                conversation += f"{self.get_thought_string(iteration_num)}\n\n"
-            if iteration_data.gap:
-                conversation += f"{self.get_task_string(iteration_num)}\n\n"
-            if iteration_data.tool_calls:
-                conversation += f"{self.get_action_string(iteration_num)}\n\n"
-            if iteration_data.findings:
-                conversation += f"{self.get_findings_string(iteration_num)}\n\n"
-
-        return conversation
+    def compile_conversation_history(self, token_budget: int = 0, include_findings: bool = True) -> str:
+        """
+        将对话历史编译成字符串。已渲染且未修改的迭代直接复用缓存的片段，最后一次拼接。
+        token_budget 大于0时，较早的迭代压缩为摘要以满足预算，见 utils.context_window。
+        """
+        if token_budget > 0 or not include_findings:
+            return window_history(self, token_budget, include_findings=include_findings)
+        self._sync_segments()
+        return "".join(self.segment(iteration_num, FULL)[0] for iteration_num in range(len(self.history)))
+
+    def segment(self, iteration_num: int, detail: str = FULL) -> Tuple[str, int]:
+        """返回单次迭代在给定详细程度下的渲染片段及其token数，未修改的迭代使用缓存。"""
+        self._sync_segments()
+        cached = self._segments[iteration_num]
+        if detail not in cached:
+            text = self.render_iteration(iteration_num, detail)
+            cached[detail] = (text, estimate_tokens(text))
+        return cached[detail]
+
+    def render_iteration(self, iteration_num: int, detail: str = FULL) -> str:
+        """
+        渲染单次迭代的历史片段。summary 不含发现正文，brief 只保留任务和来源。
+        并发解决多个差距的迭代按差距分别渲染任务、行动和发现。
+        """
+        iteration_data = self.history[iteration_num]
+        parts = [f"[迭代 {iteration_num + 1}]\n\n"]
+        if iteration_data.thought and detail != BRIEF:
+            parts.append(f"{self.get_thought_string(iteration_num)}\n\n")
+        for block in iteration_data.gaps or [iteration_data]:
+            if block.gap:
+                parts.append(f"{self.format_task(block.gap)}\n\n")
+            if block.tool_calls and detail != BRIEF:
+                parts.append(f"{self.format_action(block.tool_calls)}\n\n")
+            if block.findings and detail == FULL:
+                parts.append(f"{self.format_findings(block.findings)}\n\n")
+            elif block.sources and detail != FULL:
+                parts.append(f"{self.format_sources(block.sources)}\n\n")
+        return "".join(parts)
+
+    @staticmethod
+    def format_task(gap: str) -> str:
+        return f"<task>\n解决这个知识差距：{gap}\n</task>"
+
+    @staticmethod
+    def format_action(tool_calls: List[str]) -> str:
+        return f"<action>\n{Conversation.action_content(tool_calls)}\n</action>"
+
+    @staticmethod
+    def action_content(tool_calls: List[str]) -> str:
+        joined_calls = '\n'.join(tool_calls)
+        return f"调用以下工具来解决知识差距：\n{joined_calls}"
+
+    @staticmethod
+    def format_findings(findings: List[str]) -> str:
+        joined_findings = '\n\n'.join(findings)
+        return f"<findings>\n{joined_findings}\n</findings>"
+
+    @staticmethod
+    def format_sources(sources: List[str]) -> str:
+        joined_sources = '\n'.join(sources)
+        return f"<sources>\n{joined_sources}\n</sources>"
     
     def get_task_string(self, iteration_num: int) -> str:
         """获取当前迭代的任务。"""
         if self.history[iteration_num].gap:
-            return f"<task>\n解决这个知识差距：{self.history[iteration_num].gap}\n</task>"
+            return self.format_task(self.history[iteration_num].gap)
         return ""
     
     def get_action_string(self, iteration_num: int) -> str:
         """获取当前迭代的行动。"""
         if self.history[iteration_num].tool_calls:
-            joined_calls = '\n'.join(self.history[iteration_num].tool_calls)
-            return (
-                "<action>\n调用以下工具来解决知识差距：\n"
-                f"{joined_calls}\n</action>"
-            )
+            return self.format_action(self.history[iteration_num].tool_calls)
         return ""
         
     def get_findings_string(self, iteration_num: int) -> str:
         """获取当前迭代的发现。"""
         if self.history[iteration_num].findings:
-            joined_findings = '\n\n'.join(self.history[iteration_num].findings)
-            return f"<findings>\n{joined_findings}\n</findings>"
+            return self.format_findings(self.history[iteration_num].findings)
         return ""
     
+    def get_sources_string(self, iteration_num: int) -> str:
+        """获取当前迭代发现所引用的来源。"""
+        if self.history[iteration_num].sources:
+            return self.format_sources(self.history[iteration_num].sources)
+        return ""
+
     def get_thought_string(self, iteration_num: int) -> str:
         """获取当前迭代的思考。"""
         if self.history[iteration_num].thought:
@@ -127,7 +241,14 @@ class IterativeResearcher:
         max_time_minutes: int = 10,
         verbose: bool = True,
         tracing: bool = False,
+        reflection_mode: str = REFLECTION_MODE,
+        gaps_per_iteration: int = GAPS_PER_ITERATION,
+        speculative_gaps: int = SPECULATIVE_GAPS,
+        token_budget: int = TOKEN_BUDGET,
+        cost_budget: float = COST_BUDGET,
     ):
+        if reflection_mode not in REFLECTION_MODES:
+            raise ValueError(f"未知的反思模式：{reflection_mode}，可选：{', '.join(REFLECTION_MODES)}")
         self.max_iterations: int = max_iterations
         self.max_time_minutes: int = max_time_minutes
         self.start_time: float = None
@@ -137,6 +258,17 @@ class IterativeResearcher:
         self.verbose: bool = verbose
         self.tracing: bool = tracing
         self.trace_info: TraceInfo = TraceInfo(trace_id="default")
+        self.page_index: SimHashIndex = SimHashIndex()  # 各次迭代已返回的页面指纹，用于丢弃重复页面
+        self.reflection_mode: str = reflection_mode
+        self.gaps_per_iteration: int = max(gaps_per_iteration, 1)
+        self.speculative_gaps: int = max(speculative_gaps, 0)
+        # 为后续差距提前执行的工具选择和执行，结果为 (工具调用, 工具输出, 投机任务的页面指纹索引)
+        self.speculation: SpeculativeScheduler[Tuple[List[str], Dict[str, ToolAgentOutput], SimHashIndex]] = SpeculativeScheduler()
+        # 反思步骤的累计统计，用于对比两种模式的耗时和token用量
+        self.reflection_stats: Dict[str, float] = {"calls": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0}
+        # 运行的token预算，仅在上下文没有携带用量统计（独立运行）时使用；DeepResearcher 的章节使用其共享的统计和预算
+        self.token_budget: int = token_budget
+        self.cost_budget: float = cost_budget
         
     async def run(
             self, 
@@ -149,61 +281,208 @@ class IterativeResearcher:
         """为给定查询运行深度研究工作流。"""
         self.start_time = time.time()
         self.trace_info = trace_info
+        owns_usage = trace_info.usage is None
+        if owns_usage:
+            self.trace_info = replace(trace_info, usage=UsageTracker(token_budget=self.token_budget, cost_budget=self.cost_budget))
 
-        await log_message(f"<iteration-flow> 开始迭代研究工作流\n{query}\n</iteration-flow>",self.trace_info)
+        await log_message(f"开始迭代研究工作流\n{query}",self.trace_info, event="iteration-flow")
         
         # 迭代研究循环
-        while self.should_continue and self._check_constraints():
+        while self.should_continue and await self._check_constraints():
             self.iteration += 1
-            await log_message(f"<iteration>\n=== 开始迭代 {self.iteration} :\n查询：{query}\n背景：{background_context}</iteration>",self.trace_info)
+            await log_message(f"=== 开始迭代 {self.iteration} :\n查询：{query}\n背景：{background_context}",self.trace_info, event="iteration")
 
             # 为此迭代设置空白的 IterationData
             self.conversation.add_iteration()
 
-            # 1. 生成观察
-            observations: str = await self._generate_observations(query, background_context=background_context)
-
-            # 2. 评估研究中的当前差距
-            evaluation: KnowledgeGapOutput = await self._evaluate_gaps(query, background_context=background_context)
+            # 1-2. 生成观察并评估研究中的当前差距
+            evaluation: KnowledgeGapOutput = await self._reflect(query, background_context=background_context)
             
             # 检查是否应继续或中断循环
             if not evaluation.research_complete:
-                next_gap = evaluation.outstanding_gaps[0]
-
-                # 3. 选择代理来解决知识差距
-                selection_plan: AgentSelectionPlan = await self._select_agents(next_gap, query, background_context=background_context)
-
-                # 4. 运行选定的代理以收集信息
-                print(f"选择计划: {selection_plan}")
-                results: Dict[str, ToolAgentOutput] = await self._execute_tools(selection_plan.tasks)
+                gaps = evaluation.outstanding_gaps[:self.gaps_per_iteration]
+                # 为本次迭代不处理的后续差距投机启动研究，与本次的工具执行和下一次的反思重叠
+                self._speculate(evaluation.outstanding_gaps, len(gaps), query, background_context=background_context)
+                if len(gaps) > 1:
+                    # 3-4. 为前K个知识差距并发选择代理并执行工具
+                    results: Dict[str, ToolAgentOutput] = await self._research_gaps(gaps, query, background_context=background_context)
+                elif (speculated := await self._take_speculation(gaps[0])) is not None:
+                    # 3-4. 之前投机执行的相似差距已有工具调用和发现
+                    tool_calls, results = speculated
+                    await log_message(f"=== 使用投机执行的结果解决知识差距：{gaps[0]} ===",self.trace_info, event="agent-select")
+                    self.conversation.set_latest_tool_calls(tool_calls)
+                    await log_message(Conversation.action_content(self.conversation.get_latest_tool_calls()), self.trace_info, event="action")
+                    findings, sources = self._collect_findings(results)
+                    self.conversation.set_latest_findings(findings)
+                    self.conversation.set_latest_sources(sources)
+                else:
+                    next_gap = evaluation.outstanding_gaps[0]
+
+                    # 3. 选择代理来解决知识差距
+                    selection_plan: AgentSelectionPlan = await self._select_agents(next_gap, query, background_context=background_context)
+
+                    # 4. 运行选定的代理以收集信息
+                    log_local(lambda: f"选择计划: {selection_plan}")
+                    results: Dict[str, ToolAgentOutput] = await self._execute_tools(selection_plan.tasks)
             else:
                 self.should_continue = False
-                await log_message("=== 迭代研究者标记为完成 - 正在完成输出 ===",self.trace_info)
+                await log_message("=== 迭代研究者标记为完成 - 正在完成输出 ===", self.trace_info, event="info")
+
+            await self._log_usage()
         
+        self.speculation.cancel_all()
+        if self.speculative_gaps:
+            speculation_stats = self.speculation.stats()
+            await log_message(
+                f"投机执行：启动 {speculation_stats['started']} 个，置信度不足跳过 {speculation_stats['low_confidence']} 个，"
+                f"命中 {speculation_stats['hits']} 个，"
+                f"取消 {speculation_stats['cancelled']} 个，与其他阶段重叠 {speculation_stats['overlap_seconds']:.2f} 秒，"
+                f"命中后等待 {speculation_stats['wait_seconds']:.2f} 秒",
+                self.trace_info,
+                additional_data=speculation_stats,
+                event="speculation-stats",
+            )
+
         # 创建最终报告
         report = await self._create_final_report(query, length=output_length, instructions=output_instructions)
         
+        stats = self.reflection_stats
+        await log_message(
+            f"反思模式 {self.reflection_mode}：共 {stats['calls']} 次LLM调用，"
+            f"耗时 {stats['seconds']:.2f} 秒，输入 {stats['input_tokens']} tokens，输出 {stats['output_tokens']} tokens",
+            self.trace_info,
+            additional_data={"reflection_mode": self.reflection_mode, **stats},
+            event="reflection-stats",
+        )
+
+        usage = self.trace_info.usage
+        if owns_usage:
+            await log_message(
+                f"本次运行共用 {format_usage(usage.total)}",
+                self.trace_info,
+                additional_data={"usage": usage.summary()},
+                event="usage-summary",
+            )
+
         elapsed_time = time.time() - self.start_time
-        await log_message(f"迭代研究者在 {int(elapsed_time // 60)} 分钟和 {int(elapsed_time % 60)} 秒后完成，经过 {self.iteration} 次迭代。",self.trace_info)
+        await log_message(f"迭代研究者在 {int(elapsed_time // 60)} 分钟和 {int(elapsed_time % 60)} 秒后完成，经过 {self.iteration} 次迭代。", self.trace_info, event="info")
         
 
         return report
     
-    def _check_constraints(self) -> bool:
-        """检查是否超出了我们的约束（最大迭代次数或时间）。"""
+    async def _check_constraints(self) -> bool:
+        """检查是否超出了我们的约束（最大迭代次数、时间或token/费用预算）。"""
         if self.iteration >= self.max_iterations:
-            log_message("\n=== 结束研究循环 ===",self.trace_info)
-            log_message(f"达到最大迭代次数（{self.max_iterations}）",self.trace_info)
+            await log_message("\n=== 结束研究循环 ===", self.trace_info, event="info")
+            await log_message(f"达到最大迭代次数（{self.max_iterations}）", self.trace_info, event="info")
             return False
         
         elapsed_minutes = (time.time() - self.start_time) / 60
         if elapsed_minutes >= self.max_time_minutes:
-            log_message("\n=== 结束研究循环 ===",self.trace_info)
-            log_message(f"达到最大时间（{self.max_time_minutes} 分钟）",self.trace_info)
+            await log_message("\n=== 结束研究循环 ===", self.trace_info, event="info")
+            await log_message(f"达到最大时间（{self.max_time_minutes} 分钟）", self.trace_info, event="info")
+            return False
+
+        exceeded = self.trace_info.usage.exceeded() if self.trace_info.usage else None
+        if exceeded:
+            await log_message("\n=== 结束研究循环 ===", self.trace_info, event="info")
+            await log_message(exceeded, self.trace_info, event="info")
             return False
         
         return True
+
+    async def _log_usage(self) -> None:
+        """通过SSE发送本章节和整个运行到目前为止的token用量。"""
+        usage = self.trace_info.usage
+        section = self.trace_info.section
+        scope = f"章节“{section}”" if section is not None else "本次运行"
+        await log_message(
+            f"第 {self.iteration} 次迭代后{scope}已用 {format_usage(usage.section(section))}"
+            f"{f'，整个运行已用 {format_usage(usage.total)}' if section is not None else ''}",
+            self.trace_info,
+            additional_data={
+                "iteration": self.iteration,
+                "section": section,
+                "section_usage": usage.section(section).as_dict(),
+                "run_usage": usage.total.as_dict(),
+            },
+            event="token-usage",
+        )
     
+    async def _reflect(self, query: str, background_context: str = "") -> KnowledgeGapOutput:
+        """按所选模式运行反思步骤（观察和差距评估），并记录该步骤的耗时。"""
+        started = time.perf_counter()
+        async with span("phase", "reflect") as current:
+            if self.reflection_mode == "fused":
+                evaluation = await self._reflect_fused(query, background_context=background_context)
+            else:
+                await self._generate_observations(query, background_context=background_context)
+                evaluation = await self._evaluate_gaps(query, background_context=background_context)
+            current.set_output(evaluation)
+        self.reflection_stats["seconds"] += time.perf_counter() - started
+        return evaluation
+
+    def _record_usage(self, result) -> None:
+        """把一次反思调用的token用量累加到 reflection_stats。"""
+        self.reflection_stats["calls"] += 1
+        for response in result.raw_responses:
+            self.reflection_stats["input_tokens"] += response.usage.input_tokens or 0
+            self.reflection_stats["output_tokens"] += response.usage.output_tokens or 0
+
+    async def _reflect_fused(self, query: str, background_context: str = "") -> KnowledgeGapOutput:
+        """通过一次调用同时生成观察和评估知识差距。"""
+
+        background = f"背景上下文：\n{background_context}" if background_context else ""
+
+        input_str = f"""
+        当前迭代次数：{self.iteration}
+        已用时间：{(time.time() - self.start_time) / 60:.2f} 分钟，最大 {self.max_time_minutes} 分钟
+
+        原始查询：
+        {query}
+
+        {background}
+
+        行动、发现和思考的历史：
+        {self.conversation.compile_conversation_history(THINKING_HISTORY_TOKENS) or "没有之前的行动、发现或思考可用。"}
+        """
+        await log_message(f"反思并评估知识差距\n{input_str}",self.trace_info, event="evaluate_gaps")
+        result = await ResearchRunner.run(
+            reflection_agent,
+            input_str,
+            context=self.trace_info
+        )
+        self._record_usage(result)
+
+        try:
+            reflection = result.final_output_as(ReflectionOutput)
+        except Exception as e:
+            await log_message(f"反思结果解析错误: {str(e)}", self.trace_info, event="info")
+            reflection = ReflectionOutput(
+                thought="",
+                research_complete=False,
+                outstanding_gaps=["无法解析知识差距评估结果"]
+            )
+
+        self.conversation.set_latest_thought(reflection.thought)
+        await log_message(self.conversation.get_latest_thought(), self.trace_info, event="thought")
+
+        evaluation = await self._check_gaps(KnowledgeGapOutput(
+            research_complete=reflection.research_complete,
+            outstanding_gaps=reflection.outstanding_gaps,
+        ))
+        if not evaluation.research_complete:
+            self.conversation.set_latest_gap(evaluation.outstanding_gaps[0])
+            await log_message(f"解决这个知识差距：{self.conversation.get_latest_gap()}", self.trace_info, event="task")
+        return evaluation
+
+    async def _check_gaps(self, evaluation: KnowledgeGapOutput) -> KnowledgeGapOutput:
+        """模型回答研究未完成却没有给出任何知识差距时，没有可继续研究的内容，按研究完成处理。"""
+        if evaluation.research_complete or evaluation.outstanding_gaps:
+            return evaluation
+        await log_message("差距评估未给出任何知识差距，按研究完成处理", self.trace_info, level="warning", event="info")
+        return KnowledgeGapOutput(research_complete=True, outstanding_gaps=[])
+
     async def _evaluate_gaps(
         self, 
         query: str,
@@ -223,31 +502,33 @@ class IterativeResearcher:
         {background}
 
         行动、发现和思考的历史：
-        {self.conversation.compile_conversation_history() or "没有之前的行动、发现或思考可用。"}        
+        {self.conversation.compile_conversation_history(GAP_HISTORY_TOKENS, include_findings=False) or "没有之前的行动、发现或思考可用。"}
         """
-        await log_message(f"<evaluate_gaps>评估知识差距\n{input_str}\n</evaluate_gaps>",self.trace_info)
+        await log_message(f"评估知识差距\n{input_str}",self.trace_info, event="evaluate_gaps")
         result = await ResearchRunner.run(
             knowledge_gap_agent,
             input_str,
             context = self.trace_info
         )
+        self._record_usage(result)
         
         try:
             evaluation = result.final_output_as(KnowledgeGapOutput)
         except Exception as e:
-            await log_message(f"知识差距评估解析错误: {str(e)}",self.trace_info)
+            await log_message(f"知识差距评估解析错误: {str(e)}", self.trace_info, event="info")
             evaluation = KnowledgeGapOutput(
                 research_complete=False,
                 outstanding_gaps=["无法解析知识差距评估结果"]
             )
 
+        evaluation = await self._check_gaps(evaluation)
         if not evaluation.research_complete:
             next_gap = evaluation.outstanding_gaps[0]
             self.conversation.set_latest_gap(next_gap)
             """<task>
             解决这个知识差距：{next_gap}
             </task>"""
-            await log_message(self.conversation.latest_task_string(),self.trace_info)
+            await log_message(f"解决这个知识差距：{self.conversation.get_latest_gap()}", self.trace_info, event="task")
         
         return evaluation
     
@@ -258,6 +539,25 @@ class IterativeResearcher:
         background_context: str = ""
     ) -> AgentSelectionPlan:
         """选择代理来解决已识别的知识差距。"""
+        selection_plan = await self._plan_agents(gap, query, background_context=background_context)
+
+        # 将工具调用添加到对话中
+        self.conversation.set_latest_tool_calls(self._format_tool_calls(selection_plan.tasks))
+        """
+        <action>
+        调用以下工具来解决知识差距：
+        """
+        await log_message(Conversation.action_content(self.conversation.get_latest_tool_calls()), self.trace_info, event="action")
+        
+        return selection_plan
+
+    async def _plan_agents(
+        self, 
+        gap: str, 
+        query: str,
+        background_context: str = ""
+    ) -> AgentSelectionPlan:
+        """调用工具选择代理为知识差距生成代理任务，不修改对话。"""
         
         background = f"背景上下文：\n{background_context}" if background_context else ""
 
@@ -272,66 +572,158 @@ class IterativeResearcher:
 
         
         行动、发现和思考的历史：
-        {self.conversation.compile_conversation_history() or "没有之前的行动、发现或思考可用。"}
+        {self.conversation.compile_conversation_history(SELECTOR_HISTORY_TOKENS, include_findings=False) or "没有之前的行动、发现或思考可用。"}
         """
-        await log_message(f"<agent-select>\n=== 选择代理以解决知识差距：{gap} ===</agent-select>",self.trace_info)
-        result = await ResearchRunner.run(
-            tool_selector_agent,
-            input_str,
-            context = self.trace_info
-        )
-        
-        selection_plan = result.final_output_as(AgentSelectionPlan)
+        await log_message(f"=== 选择代理以解决知识差距：{gap} ===",self.trace_info, event="agent-select")
+        async with span("phase", "select_agents", input=input_str) as current:
+            result = await ResearchRunner.run(
+                tool_selector_agent,
+                input_str,
+                context = self.trace_info
+            )
+            selection_plan = result.final_output_as(AgentSelectionPlan)
+            current.set_output(selection_plan)
         
+        return selection_plan
 
-        # 将工具调用添加到对话中
-        self.conversation.set_latest_tool_calls([
-            f"[Agent] {task.agent} [Query] {task.query} [Entity] {task.entity_website if task.entity_website else 'null'}" for task in selection_plan.tasks
-        ])
+    @staticmethod
+    def _format_tool_calls(tasks: List[AgentTask]) -> List[str]:
+        return [
+            f"[Agent] {task.agent} [Query] {task.query} [Entity] {task.entity_website if task.entity_website else 'null'}" for task in tasks
+        ]
+
+    async def _research_gaps(
+        self,
+        gaps: List[str],
+        query: str,
+        background_context: str = ""
+    ) -> Dict[str, ToolAgentOutput]:
+        """为多个知识差距并发选择代理并执行工具，每个差距的工具调用和发现分别记录。"""
+        self.conversation.set_latest_gaps(gaps)
+        await log_message(f"=== 并发解决 {len(gaps)} 个知识差距 ===",self.trace_info, event="agent-select")
+
+        async def research_gap(gap_index: int, gap: str) -> Dict[str, ToolAgentOutput]:
+            speculated = await self._take_speculation(gap)
+            tool_calls, results = speculated or await self._research_gap(gap, query, background_context=background_context)
+            await log_message(Conversation.action_content(tool_calls), self.trace_info, event="action")
+            findings, sources = self._collect_findings(results)
+            self.conversation.set_latest_gap_results(gap_index, tool_calls, findings, sources)
+            return results
+
+        gap_results = await asyncio.gather(*(research_gap(gap_index, gap) for gap_index, gap in enumerate(gaps)))
+        return {key: output for results in gap_results for key, output in results.items()}
+    
+    async def _research_gap(
+        self,
+        gap: str,
+        query: str,
+        background_context: str = "",
+        page_index: Optional[SimHashIndex] = None,
+    ) -> Tuple[List[str], Dict[str, ToolAgentOutput]]:
+        """为一个知识差距选择代理并执行工具，返回工具调用和工具输出，不修改对话。"""
+        selection_plan = await self._plan_agents(gap, query, background_context=background_context)
+        results = await self._run_tools(selection_plan.tasks, page_index=page_index)
+        return self._format_tool_calls(selection_plan.tasks), results
+
+    def _speculate(self, outstanding_gaps: List[str], start: int, query: str, background_context: str = "") -> None:
         """
-        <action>
-        调用以下工具来解决知识差距：
+        取消与最新评估无关的投机任务，并为 outstanding_gaps[start:] 中的前 speculative_gaps 个差距启动投机研究，
+        只启动在连续多次评估中出现、有把握会被选中的差距（见 SpeculativeScheduler.confident）。
         """
-        await log_message(self.conversation.latest_action_string(),self.trace_info)
-        
-        return selection_plan
-    
+        if not self.speculative_gaps:
+            return
+        self.speculation.observe(outstanding_gaps)
+        self.speculation.retain(outstanding_gaps)
+        for gap in outstanding_gaps[start:start + self.speculative_gaps]:
+            if self.speculation.is_speculated(gap) or not self.speculation.confident(gap):
+                continue
+            # 投机任务在已返回页面指纹的副本上去重：被取消的任务抓取的页面不会使之后的正常抓取被当作重复丢弃，
+            # 结果被采用时再把其页面指纹合并回 self.page_index
+            self.speculation.start(gap, lambda gap=gap, page_index=self.page_index.copy(): self._speculative_research(
+                gap, query, page_index, background_context=background_context
+            ))
+
+    async def _speculative_research(
+        self, gap: str, query: str, page_index: SimHashIndex, background_context: str = ""
+    ) -> Tuple[List[str], Dict[str, ToolAgentOutput], SimHashIndex]:
+        tool_calls, results = await self._research_gap(gap, query, background_context=background_context, page_index=page_index)
+        return tool_calls, results, page_index
+
+    async def _take_speculation(self, gap: str) -> Optional[Tuple[List[str], Dict[str, ToolAgentOutput]]]:
+        """取出与差距匹配的投机结果，并把其返回页面的指纹合并到 self.page_index，供之后的迭代去重。"""
+        speculated = await self.speculation.take(gap)
+        if speculated is None:
+            return None
+        tool_calls, results, page_index = speculated
+        self.page_index.merge(page_index)
+        return tool_calls, results
+
     async def _execute_tools(self, tasks: List[AgentTask]) -> Dict[str, ToolAgentOutput]:
         """并发执行选定的工具以收集信息。"""
-        # 为每个代理创建一个任务
-        async_tasks = []
-        for task in tasks:
-            async_tasks.append(self._run_agent_task(task))
-        
-        # 并发运行所有任务
-        num_completed = 0
-        results = {}
-        for future in asyncio.as_completed(async_tasks):
-            gap, agent_name, result = await future
-            print(f"Tool call for {agent_name}: {result}")
-            results[f"{agent_name}_{gap}"] = result
-            num_completed += 1
-            await log_message(f"<processing>\n{agent_name}执行进度：{num_completed}/{len(async_tasks)}\n</processing>",self.trace_info)
+        results = await self._run_tools(tasks)
 
         # 将工具输出的发现添加到对话中
-        findings = []
-        for tool_output in results.values():
-            findings.append(tool_output.output)
+        findings, sources = self._collect_findings(results)
         self.conversation.set_latest_findings(findings)
+        self.conversation.set_latest_sources(sources)
 
         return results
+
+    async def _run_tools(self, tasks: List[AgentTask], page_index: Optional[SimHashIndex] = None) -> Dict[str, ToolAgentOutput]:
+        """并发执行工具任务并返回各任务的输出，不修改对话。"""
+        async with span("phase", "run_tools", input=tasks) as current:
+            # 为每个代理创建一个任务
+            queued_at = time.perf_counter()
+            async_tasks = []
+            for task in tasks:
+                async_tasks.append(self._run_agent_task(task, page_index=page_index, queued_at=queued_at))
+            
+            # 并发运行所有任务
+            num_completed = 0
+            results = {}
+            for future in asyncio.as_completed(async_tasks):
+                gap, agent_name, result = await future
+                log_local(lambda: f"Tool call for {agent_name}: {result}")
+                results[f"{agent_name}_{gap}"] = result
+                num_completed += 1
+                await log_message(f"{agent_name}执行进度：{num_completed}/{len(async_tasks)}",self.trace_info, event="processing")
+            current.set_output(list(results.values()))
+        return results
+
+    @staticmethod
+    def _collect_findings(results: Dict[str, ToolAgentOutput]) -> Tuple[List[str], List[str]]:
+        """从工具输出中收集发现和去重后的来源。"""
+        findings = []
+        sources = []
+        for tool_output in results.values():
+            findings.append(tool_output.output)
+            sources.extend(source for source in tool_output.sources if source not in sources)
+        return findings, sources
     
-    async def _run_agent_task(self, task: AgentTask) -> tuple[str, str, ToolAgentOutput]:
+    async def _run_agent_task(
+        self,
+        task: AgentTask,
+        page_index: Optional[SimHashIndex] = None,
+        queued_at: Optional[float] = None,
+    ) -> tuple[str, str, ToolAgentOutput]:
         """Run a single agent task and return the result."""
+        async with span("tool", task.agent, input=task.query, queued_at=queued_at) as current:
+            gap, agent_name, output = await self._execute_agent_task(task, page_index)
+            current.set_output(output)
+        return gap, agent_name, output
+
+    async def _execute_agent_task(self, task: AgentTask, page_index: Optional[SimHashIndex]) -> tuple[str, str, ToolAgentOutput]:
         try:
             agent_name = task.agent
             agent = TOOL_AGENTS.get(agent_name)
             if agent:
-                await log_message(f"<function_tool_web_search>\n_run_agent_task执行WebSearchAgent搜索: {task.query}\n实体网站: {task.entity_website if task.entity_website else 'null'}\n</function_tool_web_search>", self.trace_info)
+                await log_message(f"_run_agent_task执行WebSearchAgent搜索: {task.query}\n实体网站: {task.entity_website if task.entity_website else 'null'}", self.trace_info, event="function_tool_web_search")
+                # 任务的查询和差距随上下文传给工具，用于从抓取的页面中筛选相关段落和去重
+                context = replace(self.trace_info, task_query=task.query, task_gap=task.gap, page_index=page_index or self.page_index)
                 result = await ResearchRunner.run(
                     agent,
                     task.model_dump_json(),
-                    context=self.trace_info
+                    context=context
                 )
                 # Extract ToolAgentOutput from RunResult
                 output = result.final_output_as(ToolAgentOutput)
@@ -345,7 +737,7 @@ class IterativeResearcher:
         except Exception as e:
             import traceback
             error_msg = f"执行 {task.agent} 解决差距 '{task.gap}' 时出错：{str(e)}\n{traceback.format_exc()}"
-            await log_message(f"<web_search_error>\n{error_msg}\n</web_search_error>", self.trace_info)
+            await log_message(error_msg, self.trace_info, event="web_search_error")
             error_output = ToolAgentOutput(
                 output=f"Error executing {task.agent} for gap '{task.gap}': {str(e)}",
                 sources=[]
@@ -365,19 +757,20 @@ class IterativeResearcher:
         {background}
 
         行动、发现和思考的历史：
-        {self.conversation.compile_conversation_history() or "没有之前的行动、发现或思考可用。"}
+        {self.conversation.compile_conversation_history(THINKING_HISTORY_TOKENS) or "没有之前的行动、发现或思考可用。"}
         """
         result = await ResearchRunner.run(
             thinking_agent,
             input_str,
             context=self.trace_info
         )
+        self._record_usage(result)
 
         # 将观察添加到对话中
         observations = result.final_output
         self.conversation.set_latest_thought(observations)
         """获取最新的思考。<thought>"""
-        await log_message(self.conversation.latest_thought_string(),self.trace_info)
+        await log_message(self.conversation.get_latest_thought(), self.trace_info, event="thought")
         return observations
 
     async def _create_final_report(
@@ -387,7 +780,7 @@ class IterativeResearcher:
         instructions: str = ""
         ) -> str:
         """从完成的草稿创建最终响应。"""
-        await log_message("=== 起草最终响应 ===",self.trace_info)
+        await log_message("=== 起草最终响应 ===", self.trace_info, event="info")
 
         length_str = f"* 完整响应应约为 {length}。\n" if length else ""
         instructions_str = f"* {instructions}" if instructions else ""
@@ -404,13 +797,15 @@ class IterativeResearcher:
         {all_findings}
         """
 
-        result = await ResearchRunner.run(
-            writer_agent,
-            input_str,
-            context = self.trace_info
-        )
+        async with span("phase", "section_report", input=input_str) as current:
+            result = await ResearchRunner.run(
+                writer_agent,
+                input_str,
+                context = self.trace_info
+            )
+            current.set_output(result.final_output)
         
-        await log_message("迭代研究者成功创建最终响应",self.trace_info)
+        await log_message("迭代研究者成功创建最终响应", self.trace_info, event="info")
         
         return result.final_output
     
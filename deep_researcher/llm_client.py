@@ -1,8 +1,9 @@
 import os
 from typing import Union
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from agents import OpenAIChatCompletionsModel, OpenAIResponsesModel, set_tracing_export_api_key, set_tracing_disabled
 from dotenv import load_dotenv
+from .utils.cassette import CassetteTransport
 
 load_dotenv(override=True)
 
@@ -85,6 +86,7 @@ else:
 reasoning_client = AsyncOpenAI(
     api_key=provider_mapping[REASONING_MODEL_PROVIDER]["api_key"],
     base_url=provider_mapping[REASONING_MODEL_PROVIDER]["base_url"],
+    http_client=DefaultAsyncHttpxClient(transport=CassetteTransport()),
 )
 
 reasoning_model = provider_mapping[REASONING_MODEL_PROVIDER]["model"](
@@ -97,6 +99,7 @@ reasoning_model = provider_mapping[REASONING_MODEL_PROVIDER]["model"](
 main_client = AsyncOpenAI(
     api_key=provider_mapping[MAIN_MODEL_PROVIDER]["api_key"],
     base_url=provider_mapping[MAIN_MODEL_PROVIDER]["base_url"],
+    http_client=DefaultAsyncHttpxClient(transport=CassetteTransport()),
 )
 
 main_model = provider_mapping[MAIN_MODEL_PROVIDER]["model"](
@@ -109,6 +112,7 @@ main_model = provider_mapping[MAIN_MODEL_PROVIDER]["model"](
 fast_client = AsyncOpenAI(
     api_key=provider_mapping[FAST_MODEL_PROVIDER]["api_key"],
     base_url=provider_mapping[FAST_MODEL_PROVIDER]["base_url"],
+    http_client=DefaultAsyncHttpxClient(transport=CassetteTransport()),
 )
 
 fast_model = provider_mapping[FAST_MODEL_PROVIDER]["model"](
@@ -1,7 +1,8 @@
 import asyncio
 import argparse
-from .iterative_research import IterativeResearcher
+from .iterative_research import GAPS_PER_ITERATION, REFLECTION_MODE, REFLECTION_MODES, SPECULATIVE_GAPS, IterativeResearcher
 from .deep_research import DeepResearcher
+from .tools import close_tool_resources
 from typing import Literal
 from dotenv import load_dotenv
 
@@ -25,6 +26,12 @@ async def main() -> None:
                        help="向控制台打印状态更新")
     parser.add_argument("--tracing", action="store_true",
                        help="为研究启用跟踪（仅对OpenAI模型有效）")
+    parser.add_argument("--reflection-mode", type=str, choices=REFLECTION_MODES, default=REFLECTION_MODE,
+                       help="反思步骤的模式：split 分两次调用思考和差距评估，fused 合并为一次调用")
+    parser.add_argument("--gaps-per-iteration", type=int, default=GAPS_PER_ITERATION,
+                       help="每次迭代并发解决的知识差距数量")
+    parser.add_argument("--speculative-gaps", type=int, default=SPECULATIVE_GAPS,
+                       help="每次迭代为后续差距提前投机执行的研究任务数量（0为关闭）")
     
     args = parser.parse_args()
     
@@ -34,12 +41,27 @@ async def main() -> None:
     print(f"开始对以下内容进行深度研究：{query}")
     print(f"最大迭代次数：{args.max_iterations}，最大时间：{args.max_time} 分钟")
     
+    try:
+        report = await _run_research(args, query)
+    finally:
+        # 关闭共享的HTTP连接池等工具层资源
+        await close_tool_resources()
+
+    print("\n=== 最终报告 ===")
+    print(report)
+
+
+async def _run_research(args: argparse.Namespace, query: str) -> str:
+    """按所选模式运行研究并返回报告。"""
     if args.model == "deep":
         manager = DeepResearcher(
             max_iterations=args.max_iterations,
             max_time_minutes=args.max_time,
             verbose=args.verbose,
-            tracing=args.tracing
+            tracing=args.tracing,
+            reflection_mode=args.reflection_mode,
+            gaps_per_iteration=args.gaps_per_iteration,
+            speculative_gaps=args.speculative_gaps,
         )
         report = await manager.run(query)
     else:
@@ -47,16 +69,17 @@ async def main() -> None:
             max_iterations=args.max_iterations,
             max_time_minutes=args.max_time,
             verbose=args.verbose,
-            tracing=args.tracing
+            tracing=args.tracing,
+            reflection_mode=args.reflection_mode,
+            gaps_per_iteration=args.gaps_per_iteration,
+            speculative_gaps=args.speculative_gaps,
         )
         report = await manager.run(
             query, 
             output_length=args.output_length, 
             output_instructions=args.output_instructions
         )
-
-    print("\n=== 最终报告 ===")
-    print(report)
+    return report
 
 # 命令行入口点
 def cli_entry():
@@ -1,9 +1,172 @@
+"""
+研究运行的SSE事件通道。
+
+每个运行（trace_id）一个通道，通道保存最近 SSE_BUFFER_SIZE 个、总计不超过 SSE_BUFFER_BYTES 字节的带递增编号的事件（环形缓冲区）：
+- /api/research 在启动运行之前打开通道，客户端连接之前发布的事件（例如报告计划）不会丢失
+- 订阅者按编号从缓冲区读取，可以用 Last-Event-ID 从断开处继续
+- 发布从不等待订阅者：内存只取决于缓冲区的长度和字节上限，与订阅者多少和读取快慢无关
+- 读取慢的订阅者积压超过 SSE_COALESCE_BACKLOG 个事件时，积压中的低优先级事件（进度、抓取等）每种只保留最新一个；
+  落后超过整个缓冲区时，丢失的事件以一个 sse-gap 事件告知
+- 只有不低于 SSE_LEVEL 的事件才进入通道（默认 info）：通道在运行开始前就已打开，
+  否则调试级别的大负载（完整搜索结果、过滤提示词、逐个链接的爬取事件）在每次运行中都会被构造和缓冲
+- 运行结束后发布 complete 事件并关闭通道，经过 SSE_CHANNEL_GRACE_SECONDS 后由定时器删除（服务空闲时也会清理）
+"""
+
 import asyncio
-from typing import Dict, List
+import itertools
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple, Union
+
+from dotenv import load_dotenv
+
+from .utils.log_writer import LEVELS
+from .utils.metrics import metrics, payload_size
+
+load_dotenv()
+
+SSE_BUFFER_SIZE = int(os.getenv("SSE_BUFFER_SIZE", "1000"))  # 每个运行保留的事件数
+SSE_BUFFER_BYTES = int(os.getenv("SSE_BUFFER_BYTES", str(8 * 1024 * 1024)))  # 每个运行缓冲事件的总字节数上限
+SSE_LEVEL = os.getenv("SSE_LEVEL", "info").lower()  # 发送给客户端的最低事件级别
+if SSE_LEVEL not in LEVELS:
+    raise ValueError(f"未知的SSE级别：{SSE_LEVEL}，可选：{', '.join(LEVELS)}")
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_CHANNEL_GRACE_SECONDS = float(os.getenv("SSE_CHANNEL_GRACE_SECONDS", "300"))  # 运行结束后保留通道的时间
+SSE_COALESCE_BACKLOG = int(os.getenv("SSE_COALESCE_BACKLOG", "100"))  # 订阅者积压超过此数时合并低优先级事件
+SSE_LOW_PRIORITY_EVENTS = frozenset(
+    event.strip() for event in os.getenv(
+        "SSE_LOW_PRIORITY_EVENTS",
+        "processing,scrape,search,search-filter,function_tool_web_search,function_tool_client,token-usage",
+    ).split(",") if event.strip()
+)
+
+# (编号, 事件类型, 数据)
+Event = Tuple[int, str, dict]
+# 等待超时、没有新事件时 SSESubscription.next 返回的标记
+HEARTBEAT = "heartbeat"
+
+
+class SSEChannel:
+    """一个运行的事件环形缓冲区，按事件数和总字节数（数据的JSON大小）两个上限淘汰最早的事件。"""
+
+    def __init__(self, trace_id: str, buffer_size: int = SSE_BUFFER_SIZE, buffer_bytes: int = SSE_BUFFER_BYTES):
+        self.trace_id = trace_id
+        self.buffer_size = buffer_size
+        self.buffer_bytes = buffer_bytes
+        self.events: Deque[Event] = deque()
+        self.buffered_bytes = 0
+        self._sizes: Deque[int] = deque()
+        self.last_id = 0
+        self.closed_at: Optional[float] = None
+        self.subscribers = 0
+        self._waiters: Set[asyncio.Future] = set()
+
+    @property
+    def closed(self) -> bool:
+        return self.closed_at is not None
+
+    def append(self, event: str, data: dict) -> int:
+        self.last_id += 1
+        size = payload_size(data)
+        self.events.append((self.last_id, event, data))
+        self._sizes.append(size)
+        self.buffered_bytes += size
+        # 至少保留最新的一个事件，单个事件超过字节上限时也能送达
+        while len(self.events) > 1 and (len(self.events) > self.buffer_size or self.buffered_bytes > self.buffer_bytes):
+            self.events.popleft()
+            self.buffered_bytes -= self._sizes.popleft()
+        self._wake()
+        return self.last_id
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed_at = time.monotonic()
+            self._wake()
+
+    def events_after(self, last_id: int) -> Tuple[List[Event], int]:
+        """返回编号大于 last_id 的缓冲事件，以及因缓冲区溢出而读不到的事件数。"""
+        if not self.events or last_id >= self.last_id:
+            return [], 0
+        first_id = self.events[0][0]
+        missed = max(first_id - last_id - 1, 0)
+        start = max(last_id - first_id + 1, 0)
+        return list(itertools.islice(self.events, start, None)), missed
+
+    async def wait(self, timeout: float) -> bool:
+        """等待新事件或通道关闭，超时返回 False。"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(waiter)
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+
+class SSESubscription:
+    """一个客户端连接对通道的读取位置。"""
+
+    def __init__(self, channel: SSEChannel, last_event_id: int = 0):
+        self.channel = channel
+        self.last_id = last_event_id
+        self._pending: Deque[Union[Event, Tuple[None, str, dict]]] = deque()
+
+    async def next(self, heartbeat: float = SSE_HEARTBEAT_SECONDS):
+        """
+        返回下一个事件 (编号, 事件类型, 数据)；heartbeat 秒内没有新事件时返回 HEARTBEAT；
+        通道已关闭且事件已全部读完时返回 None。
+        """
+        while not self._pending:
+            self._fill()
+            if self._pending:
+                break
+            if self.channel.closed:
+                return None
+            if not await self.channel.wait(heartbeat):
+                return HEARTBEAT
+        item = self._pending.popleft()
+        if item[0] is not None:
+            self.last_id = item[0]
+        return item
+
+    def _fill(self) -> None:
+        events, missed = self.channel.events_after(self.last_id)
+        if missed:
+            SSEManager.counters["missed"] += missed
+            self._pending.append((None, "sse-gap", {"message": f"连接落后，{missed} 个较早的事件已被丢弃", "missed": missed}))
+            self.last_id += missed
+        if len(events) > SSE_COALESCE_BACKLOG:
+            events = coalesce(events)
+        self._pending.extend(events)
+
+
+def coalesce(events: List[Event]) -> List[Event]:
+    """低优先级事件每种只保留最后一个，其他事件全部保留，顺序不变。"""
+    latest: Dict[str, int] = {}
+    for index, (_, event, _) in enumerate(events):
+        if event in SSE_LOW_PRIORITY_EVENTS:
+            latest[event] = index
+    kept = [
+        item for index, item in enumerate(events)
+        if item[1] not in SSE_LOW_PRIORITY_EVENTS or latest[item[1]] == index
+    ]
+    SSEManager.counters["coalesced"] += len(events) - len(kept)
+    return kept
+
 
 class SSEManager:
     _instance = None
-    channels: Dict[str, asyncio.Queue] = {}
+    channels: Dict[str, SSEChannel] = {}
+    counters: Dict[str, int] = {"published": 0, "missed": 0, "coalesced": 0, "cleaned": 0}
 
     def __new__(cls):
         if cls._instance is None:
@@ -11,19 +174,101 @@ class SSEManager:
         return cls._instance
 
     @classmethod
-    async def publish(cls, trace_id: str, event: str, data: dict):
-        if trace_id in cls.channels:
-            await cls.channels[trace_id].put({
-                "event": event,
-                "data": data
-            })
+    def open(cls, trace_id: str) -> SSEChannel:
+        """为一个运行打开通道（已存在时直接返回），之后发布的事件都会被缓冲。"""
+        cls.cleanup()
+        if trace_id not in cls.channels:
+            cls.channels[trace_id] = SSEChannel(trace_id)
+        return cls.channels[trace_id]
 
     @classmethod
-    def subscribe(cls, trace_id: str) -> asyncio.Queue:
-        cls.channels[trace_id] = asyncio.Queue()
-        return cls.channels[trace_id]
+    def has_channel(cls, trace_id: str) -> bool:
+        """运行是否有仍在接收事件的通道。"""
+        channel = cls.channels.get(trace_id)
+        return channel is not None and not channel.closed
+
+    @classmethod
+    def accepts(cls, trace_id: str, level: str = "info") -> bool:
+        """运行有仍在接收事件的通道，且级别不低于 SSE_LEVEL。"""
+        return LEVELS.get(level, LEVELS["info"]) >= LEVELS[SSE_LEVEL] and cls.has_channel(trace_id)
+
+    @classmethod
+    def available(cls, trace_id: str, last_event_id: int = 0) -> bool:
+        """通道存在，且运行仍在进行或还有编号大于 last_event_id 的事件可读。"""
+        cls.cleanup()
+        channel = cls.channels.get(trace_id)
+        return channel is not None and (not channel.closed or last_event_id < channel.last_id)
+
+    @classmethod
+    async def publish(cls, trace_id: str, event: str, data: dict) -> Optional[int]:
+        """把事件追加到运行的缓冲区，返回事件编号；没有通道时丢弃并返回 None。"""
+        channel = cls.channels.get(trace_id)
+        if channel is None or channel.closed:
+            return None
+        cls.counters["published"] += 1
+        return channel.append(event, data)
 
     @classmethod
-    def unsubscribe(cls, trace_id: str):
-        if trace_id in cls.channels:
-            del cls.channels[trace_id]
\ No newline at end of file
+    async def close(cls, trace_id: str, data: Optional[dict] = None) -> None:
+        """
+        运行结束：发布 complete 事件并关闭通道，订阅者读完剩余事件后结束。
+        SSE_CHANNEL_GRACE_SECONDS 后通道由定时器删除，不依赖之后是否还有请求触发 cleanup。
+        """
+        channel = cls.channels.get(trace_id)
+        if channel is None or channel.closed:
+            return
+        channel.append("complete", {"message": "研究运行已结束", "trace_id": trace_id, "timestamp": time.time(), **(data or {})})
+        channel.close()
+        asyncio.get_running_loop().call_later(SSE_CHANNEL_GRACE_SECONDS, cls._remove, trace_id, channel)
+
+    @classmethod
+    def _remove(cls, trace_id: str, channel: SSEChannel) -> None:
+        # 同一 trace_id 可能已经重新打开了新的通道，只删除定时器对应的那个
+        if cls.channels.get(trace_id) is channel:
+            del cls.channels[trace_id]
+            cls.counters["cleaned"] += 1
+
+    @classmethod
+    def subscribe(cls, trace_id: str, last_event_id: int = 0) -> SSESubscription:
+        """从编号 last_event_id 之后开始读取（0表示从缓冲区开头），通道不存在时打开。"""
+        channel = cls.open(trace_id)
+        channel.subscribers += 1
+        return SSESubscription(channel, last_event_id)
+
+    @classmethod
+    def unsubscribe(cls, subscription: SSESubscription) -> None:
+        subscription.channel.subscribers -= 1
+
+    @classmethod
+    def cleanup(cls, now: Optional[float] = None) -> int:
+        """删除结束超过 SSE_CHANNEL_GRACE_SECONDS 的通道（定时器没有执行时的兜底，例如事件循环已退出），返回删除的数量。"""
+        now = time.monotonic() if now is None else now
+        expired = [
+            trace_id for trace_id, channel in cls.channels.items()
+            if channel.closed and now - channel.closed_at >= SSE_CHANNEL_GRACE_SECONDS
+        ]
+        for trace_id in expired:
+            del cls.channels[trace_id]
+        cls.counters["cleaned"] += len(expired)
+        return len(expired)
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return {
+            **cls.counters,
+            "channels": len(cls.channels),
+            "open_channels": sum(not channel.closed for channel in cls.channels.values()),
+            "subscribers": sum(channel.subscribers for channel in cls.channels.values()),
+            "buffered_events": sum(len(channel.events) for channel in cls.channels.values()),
+            "buffered_bytes": sum(channel.buffered_bytes for channel in cls.channels.values()),
+        }
+
+
+def collect_sse_metrics():
+    """/metrics 输出时读取SSE通道的统计。"""
+    stats = SSEManager.stats()
+    yield ("deep_researcher_sse", "SSE通道、订阅者、缓冲事件数以及合并和丢失的事件数", "gauge",
+           [({"stat": name}, value) for name, value in stats.items()])
+
+
+metrics.register_collector(collect_sse_metrics)
@@ -1,2 +1,43 @@
-from .web_search import web_search
+from .web_search import web_search, fetch_flight, search_flight
 from .crawl_website import crawl_website
+from .http_client import HTTPClient
+from .page_cache import page_cache
+from .search_cache import search_cache
+from .extraction import extraction_engine
+from ..agents.response_cache import response_cache
+from ..utils.cassette import save_active_cassette
+from ..utils.metrics import metrics
+
+
+async def close_tool_resources() -> None:
+    """关闭工具层持有的进程级资源（共享HTTP连接池、提取进程池等）并保存录制的磁带，在应用或命令行退出时调用。"""
+    await HTTPClient.close()
+    extraction_engine.shutdown()
+    page_cache.store.close()
+    search_cache.store.close()
+    response_cache.store.close()
+    save_active_cassette()
+
+
+def collect_cache_metrics():
+    """/metrics 输出时读取各缓存、进行中请求合并和连接池的现有统计。"""
+    caches = {
+        "page": page_cache.stats(),
+        "search": search_cache.stats(),
+        "llm": response_cache.stats(),
+    }
+    hits = {name: stats.get("hits", stats.get("memory_hits", 0) + stats.get("disk_hits", 0)) for name, stats in caches.items()}
+    yield ("deep_researcher_cache_hit_ratio", "缓存命中率", "gauge",
+           [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()])
+    yield ("deep_researcher_cache_hits", "缓存命中次数", "gauge",
+           [({"cache": name}, hits[name]) for name in caches])
+    yield ("deep_researcher_cache_misses", "缓存未命中次数", "gauge",
+           [({"cache": name}, stats["misses"]) for name, stats in caches.items()])
+    flights = {flight.name: flight.stats() for flight in (search_flight, fetch_flight)}
+    yield ("deep_researcher_singleflight_deduplicated", "合并到进行中相同请求的调用次数", "gauge",
+           [({"operation": name}, stats["deduplicated"]) for name, stats in flights.items()])
+    yield ("deep_researcher_http_pool", "共享HTTP连接池的计数器和当前连接数", "gauge",
+           [({"stat": name}, value) for name, value in HTTPClient.pool_stats().items()])
+
+
+metrics.register_collector(collect_cache_metrics)
@@ -0,0 +1,191 @@
+"""
+基于优先级前沿队列的并发网站爬虫，供 crawl_website 工具使用。
+
+- 多个页面并发抓取，同时遵守单域名的并发上限和请求间隔（礼貌性限制）
+- 前沿队列按层级排序：导航/页眉链接与所在页面同层，正文链接进入下一层，保持与原广度优先爬取相同的优先级
+- URL经过规范化（去掉片段和跟踪参数、统一末尾斜杠）后记入已访问集合，同一页面只抓取一次
+- 每个页面只下载、解析一次：一次解析同时得到正文和链接，直接作为爬取结果返回，不再通过 scrape_urls 重新下载
+- 提供任务查询时，先通过 robots.txt 和站点地图选出与查询最相关的页面作为种子直接抓取（见 sitemap.py），
+  之后沿链接发现的页面同样遵守 robots.txt 的 Disallow 规则
+
+10个页面的爬取耗时大致取决于首页加下一层中最慢的页面，而不是所有页面耗时之和。
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from dotenv import load_dotenv
+
+from .extraction import extraction_engine
+from .http_client import HTTPClient
+from .sitemap import SITEMAP_SEEDING, SITEMAP_TIMEOUT, sitemap_seeder
+from .url_utils import canonicalize_url
+from .web_search import CONTENT_LENGTH_LIMIT, PageFetchError, ScrapeResult, fetch_page_content, is_valid_url
+from ..utils.logging import TraceInfo, log_local, log_message
+
+load_dotenv()
+
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "6"))  # 单次爬取的并发页面数
+CRAWL_PER_DOMAIN_CONCURRENCY = int(os.getenv("CRAWL_PER_DOMAIN_CONCURRENCY", "4"))  # 同一域名的并发请求上限
+CRAWL_DOMAIN_DELAY = float(os.getenv("CRAWL_DOMAIN_DELAY", "0"))  # 同一域名相邻两次请求开始的最小间隔（秒）
+CRAWL_PAGE_TIMEOUT = 30
+
+
+def site_host(url: str) -> str:
+    """返回用于判断是否同站的主机名（小写，忽略www.前缀）。"""
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainLimiter:
+    """单域名的并发和请求间隔限制。"""
+
+    def __init__(self, concurrency: int, delay: float):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._delay = delay
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._delay > 0:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._delay
+            if start > now:
+                await asyncio.sleep(start - now)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+class SiteCrawler:
+    """从起始URL开始、在同一站点内并发爬取最多max_pages个页面。"""
+
+    def __init__(
+        self,
+        starting_url: str,
+        trace_info: Optional[TraceInfo] = None,
+        max_pages: int = 10,
+        concurrency: int = CRAWL_CONCURRENCY,
+        per_domain_concurrency: int = CRAWL_PER_DOMAIN_CONCURRENCY,
+        domain_delay: float = CRAWL_DOMAIN_DELAY,
+        query: str = "",
+        use_sitemap: bool = SITEMAP_SEEDING,
+    ):
+        if not starting_url.startswith(('http://', 'https://')):
+            starting_url = 'http://' + starting_url
+        self.starting_url = starting_url
+        self.trace_info = trace_info or TraceInfo(trace_id="default")
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.per_domain_concurrency = per_domain_concurrency
+        self.domain_delay = domain_delay
+        self.query = query
+        self.use_sitemap = use_sitemap
+        self.host = site_host(starting_url)
+        self._frontier: List[Tuple[int, int, str]] = []
+        self._sequence = itertools.count()
+        self._seen: Set[str] = set()
+        self._limiters: Dict[str, DomainLimiter] = {}
+        self._robots: Optional[RobotFileParser] = None
+
+    def enqueue(self, url: str, level: int) -> bool:
+        """将URL加入前沿队列；不同站、受限文件类型、robots.txt禁止或已见过的URL会被忽略。"""
+        if site_host(url) != self.host or not is_valid_url(url):
+            return False
+        if self._robots is not None and not self._robots.can_fetch("*", url):
+            return False
+        canonical = canonicalize_url(url)
+        if canonical in self._seen:
+            return False
+        self._seen.add(canonical)
+        heapq.heappush(self._frontier, (level, next(self._sequence), canonical))
+        return True
+
+    async def crawl(self) -> List[ScrapeResult]:
+        """运行爬取，按完成顺序返回成功抓取的页面。"""
+        # 种子按相关性顺序排在首页之前；种子足够多时不再需要从首页逐层发现页面
+        for url in await self._discover_seeds():
+            self.enqueue(url, 0)
+        self.enqueue(self.starting_url, 0)
+        results: List[ScrapeResult] = []
+        pending: Dict[asyncio.Task, int] = {}
+
+        while True:
+            while (self._frontier and len(pending) < self.concurrency
+                   and len(results) + len(pending) < self.max_pages):
+                level, _, url = heapq.heappop(self._frontier)
+                pending[asyncio.create_task(self._visit(url))] = level
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                level = pending.pop(task)
+                visited = task.result()
+                if visited is None:
+                    continue
+                result, nav_links, body_links = visited
+                results.append(result)
+                # 导航链接与当前页面同层（优先），正文链接进入下一层
+                new_nav = sum(self.enqueue(link, level) for link in nav_links)
+                new_body = sum(self.enqueue(link, level + 1) for link in body_links)
+                await log_message(
+                    f"已爬取 {result.url}：新发现 {new_nav} 个导航链接、{new_body} 个正文链接",
+                    self.trace_info,
+                    level="debug",
+                    event="scrape",
+                )
+
+        return results
+
+    async def _discover_seeds(self) -> List[str]:
+        """从robots.txt和站点地图中选出与查询最相关的页面；未提供查询或发现失败时返回空列表。"""
+        if not self.query or not self.use_sitemap:
+            return []
+        try:
+            seeds = await asyncio.wait_for(
+                sitemap_seeder.seeds(self.starting_url, self.query, self.max_pages), SITEMAP_TIMEOUT
+            )
+        except Exception as e:
+            log_local(f"读取{self.starting_url}的站点地图时出错: {str(e)}", level="warning")
+            return []
+        self._robots = seeds.robots
+        if seeds.urls:
+            await log_message(
+                f"从站点地图的 {seeds.candidates} 个页面中选出 {len(seeds.urls)} 个与查询相关的页面",
+                self.trace_info,
+                event="scrape",
+            )
+        return seeds.urls
+
+    async def _visit(self, url: str) -> Optional[Tuple[ScrapeResult, List[str], List[str]]]:
+        """抓取并解析单个页面，失败时返回None。"""
+        limiter = self._limiters.setdefault(
+            site_host(url), DomainLimiter(self.per_domain_concurrency, self.domain_delay)
+        )
+        try:
+            async with limiter:
+                page = await fetch_page_content(HTTPClient.get_session(), url, timeout=CRAWL_PAGE_TIMEOUT)
+            extracted = await extraction_engine.extract(page.html, url, with_links=True)
+        except PageFetchError as e:
+            log_local(f"爬取{url}时返回HTTP {e.status}", level="warning")
+            return None
+        except Exception as e:
+            log_local(f"爬取{url}时出错: {str(e)}", level="warning")
+            return None
+
+        result = ScrapeResult(
+            url=url,
+            title=extracted.title,
+            description="",
+            text=extracted.text[:CONTENT_LENGTH_LIMIT],
+        )
+        return result, extracted.nav_links, extracted.body_links
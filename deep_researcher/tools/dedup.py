@@ -0,0 +1,67 @@
+"""
+抓取结果的近重复页面消除。
+
+搜索结果中经常出现同一篇文章的转载、镜像站和分页变体，scrape_urls 会把它们全部保留，LLM 反复阅读相同的文本。
+页面用 SimHash 指纹（见 utils.simhash）比较，分两步进行（见 web_search.refine_scrape_results）：
+1. 段落筛选之前，find_near_duplicates 把每个页面的全文与同一次搜索中排名更靠前的页面
+   以及本次研究已返回的页面比较，只检查、不登记，被筛掉的页面不会影响之后的搜索
+2. 段落筛选之后，drop_near_duplicates 登记实际返回给代理的正文的指纹；
+   返回的正文与之前已返回的正文近重复时丢弃该页面
+索引中因此只有代理真正读到的文本，被筛选丢弃或只保留了几个段落的页面不会在之后的迭代中被误判为重复。
+"""
+
+from typing import List, Sequence, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+from ..utils.simhash import SimHashIndex, simhash
+
+PageT = TypeVar("PageT", bound=BaseModel)  # 带有 url、text 字段的抓取结果（ScrapeResult）
+
+
+def find_near_duplicates(
+    results: Sequence[PageT],
+    index: SimHashIndex,
+) -> Tuple[List[PageT], List[Tuple[PageT, str]]]:
+    """
+    按顺序检查页面，返回 (保留的页面, [(被丢弃的页面, 与之重复的页面URL)])，不修改 index。
+    与 index 中已返回的页面或本批中更靠前的保留页面近重复的页面被丢弃；正文过短无法计算指纹的页面总是保留。
+    """
+    batch = SimHashIndex(index.max_distance)
+    kept: List[PageT] = []
+    duplicates: List[Tuple[PageT, str]] = []
+    for result in results:
+        signature = simhash(result.text)
+        if signature is None:
+            kept.append(result)
+            continue
+        original = index.find(signature) or batch.add_if_new(signature, result.url)
+        if original is None:
+            kept.append(result)
+        else:
+            duplicates.append((result, original))
+    index.counters["duplicates"] += len(duplicates)
+    return kept, duplicates
+
+
+def drop_near_duplicates(
+    results: Sequence[PageT],
+    index: SimHashIndex,
+) -> Tuple[List[PageT], List[Tuple[PageT, str]]]:
+    """
+    按顺序检查页面，返回 (保留的页面, [(被丢弃的页面, 与之重复的已有页面URL)])。
+    保留的页面会登记到索引中，因此应传入实际返回给代理的页面；正文过短无法计算指纹的页面（例如错误提示）总是保留。
+    """
+    kept: List[PageT] = []
+    duplicates: List[Tuple[PageT, str]] = []
+    for result in results:
+        signature = simhash(result.text)
+        if signature is None:
+            kept.append(result)
+            continue
+        original = index.add_if_new(signature, result.url)
+        if original is None:
+            kept.append(result)
+        else:
+            duplicates.append((result, original))
+    return kept, duplicates
@@ -0,0 +1,152 @@
+"""
+HTML提取引擎。
+
+extract_page 直接基于 lxml 对文档只遍历一次，同时得到正文文本（与 html_to_text 的提取规则一致）、
+页面标题以及按导航/正文区分的链接，爬虫和抓取不再需要对同一页面分别解析。
+
+ExtractionEngine 在有界进程池中运行 extract_page：解析是CPU密集型且受GIL限制的工作，
+放在默认线程池或事件循环线程上运行时，50个页面同时到达会卡住事件循环，进而拖慢服务器中所有研究运行的SSE推送。
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from dotenv import load_dotenv
+from lxml import etree
+
+load_dotenv()
+
+EXTRACTION_PROCESSES = int(os.getenv("EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))  # 0表示不使用进程池
+EXTRACTION_INLINE_BYTES = int(os.getenv("EXTRACTION_INLINE_BYTES", "16384"))  # 小于此大小的页面直接在当前线程解析
+
+# 与 html_to_text 相同的正文标签
+TEXT_TAGS = frozenset(('h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'li', 'blockquote'))
+NAV_TAGS = frozenset(('nav', 'header'))
+# 这些标签内的文本不属于页面正文
+SKIP_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+
+
+@dataclass
+class ExtractedPage:
+    """一次解析得到的页面内容。"""
+    text: str = ""
+    title: str = ""
+    nav_links: List[str] = field(default_factory=list)
+    body_links: List[str] = field(default_factory=list)
+
+
+def extract_page(html: str, base_url: str = "", with_links: bool = False) -> ExtractedPage:
+    """
+    解析HTML并在一次遍历中提取正文文本、标题和（可选的）链接。
+
+    正文规则与 html_to_text 一致：按文档顺序输出每个正文标签内去除首尾空白后拼接的文本，
+    嵌套的正文标签（例如 li 中的 p）会各自输出一行。
+    链接按出现顺序去重，位于 nav/header 内的归为导航链接，其余归为正文链接。
+    """
+    if not html or not html.strip():
+        return ExtractedPage()
+    try:
+        root = etree.fromstring(html.encode("utf-8", errors="replace"), etree.HTMLParser(encoding="utf-8"))
+    except (etree.ParserError, ValueError):
+        return ExtractedPage()
+    if root is None:
+        return ExtractedPage()
+
+    blocks: List[Optional[str]] = []  # 按正文标签开始的顺序占位，标签结束时填入文本
+    open_blocks: List[List[str]] = []  # 当前所在的所有正文标签的文本缓冲区（由外到内）
+    open_slots: List[int] = []
+    skip_depth = 0
+    nav_depth = 0
+    title = ""
+    nav_links: Dict[str, None] = {}
+    body_links: Dict[str, None] = {}
+
+    def add_text(piece: Optional[str]) -> None:
+        if piece and open_blocks and not skip_depth:
+            piece = piece.strip()
+            if piece:
+                for buffer in open_blocks:
+                    buffer.append(piece)
+
+    for event, element in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        tag = element.tag
+        if not isinstance(tag, str):
+            # 注释和处理指令本身不是文本，但其后的tail属于外层元素
+            add_text(element.tail)
+            continue
+
+        if event == "start":
+            if tag in SKIP_TEXT_TAGS:
+                skip_depth += 1
+            elif tag in NAV_TAGS:
+                nav_depth += 1
+            elif tag == "title" and not title:
+                title = (element.text or "").strip()
+            elif with_links and tag == "a":
+                href = element.get("href")
+                if href:
+                    link = urljoin(base_url, href.strip())
+                    (nav_links if nav_depth else body_links).setdefault(link, None)
+
+            if tag in TEXT_TAGS:
+                open_slots.append(len(blocks))
+                blocks.append(None)
+                open_blocks.append([])
+            add_text(element.text)
+        else:
+            if tag in TEXT_TAGS:
+                blocks[open_slots.pop()] = "".join(open_blocks.pop())
+            if tag in SKIP_TEXT_TAGS:
+                skip_depth -= 1
+            elif tag in NAV_TAGS:
+                nav_depth -= 1
+            add_text(element.tail)
+
+    return ExtractedPage(
+        text="\n".join(block for block in blocks if block),
+        title=title,
+        nav_links=list(nav_links),
+        body_links=[link for link in body_links if link not in nav_links],
+    )
+
+
+class ExtractionEngine:
+    """在有界进程池中运行 extract_page 的提取引擎。"""
+
+    def __init__(self, max_workers: int = EXTRACTION_PROCESSES, inline_bytes: int = EXTRACTION_INLINE_BYTES):
+        self.max_workers = max_workers
+        self.inline_bytes = inline_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def extract(self, html: str, base_url: str = "", with_links: bool = False) -> ExtractedPage:
+        """提取页面内容。小页面直接解析（进程间传输的开销高于解析本身），其余交给进程池。"""
+        if len(html) < self.inline_bytes:
+            return extract_page(html, base_url, with_links)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), extract_page, html, base_url, with_links)
+        except BrokenProcessPool:
+            # 工作进程异常退出（例如被OOM终止）时重建进程池，本次改用线程池完成
+            print("HTML提取进程池已损坏，正在重建")
+            self.shutdown()
+            return await loop.run_in_executor(None, extract_page, html, base_url, with_links)
+
+    def shutdown(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _executor(self) -> Optional[Executor]:
+        if self.max_workers <= 0:
+            return None  # 使用事件循环的默认线程池
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+
+extraction_engine = ExtractionEngine()
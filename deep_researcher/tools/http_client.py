@@ -0,0 +1,131 @@
+"""
+工具层共享的HTTP客户端。
+
+进程内所有出站HTTP请求（搜索API、页面抓取、网站爬取）共用一个 aiohttp.ClientSession，
+从而复用keep-alive连接和DNS缓存，并统一控制全局与单主机的连接上限，
+避免每次搜索、每批抓取、每个爬取页面都重新进行DNS解析、TCP和TLS握手。
+
+会话随FastAPI应用或命令行入口的生命周期创建和关闭（参见 HTTPClient.close）。
+"""
+
+import asyncio
+import os
+import ssl
+import time
+from typing import Dict, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from ..utils.cassette import CassetteSession, active_cassette
+from ..utils.metrics import FETCH_QUEUE_SECONDS, FETCH_SECONDS
+
+load_dotenv()
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "200"))  # 全局最大并发连接数
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "16"))  # 单主机最大并发连接数
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))  # DNS缓存时间（秒）
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))  # 空闲连接保持时间（秒）
+
+# 抓取的网站证书质量参差不齐，因此不校验证书，并允许较旧的密码套件
+ssl_context = ssl.create_default_context()
+ssl_context.check_hostname = False
+ssl_context.verify_mode = ssl.CERT_NONE
+ssl_context.set_ciphers('DEFAULT:@SECLEVEL=1')
+
+
+class HTTPClient:
+    """进程级共享的 aiohttp 会话及其连接池指标。"""
+
+    _session: Optional[aiohttp.ClientSession] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    stats: Dict[str, int] = {
+        "requests": 0,
+        "request_errors": 0,
+        "connections_created": 0,
+        "connections_reused": 0,
+        "connections_queued": 0,
+        "dns_cache_hits": 0,
+        "dns_cache_misses": 0,
+    }
+
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        """返回当前事件循环上的共享会话，必要时延迟创建。启用了录制/回放磁带时返回包装后的会话。"""
+        loop = asyncio.get_running_loop()
+        if cls._session is None or cls._session.closed or cls._loop is not loop:
+            # 会话绑定在创建它的事件循环上（例如多次调用 asyncio.run 的脚本），循环变化时需要重建
+            cls._session = cls._create_session()
+            cls._loop = loop
+        cassette = active_cassette()
+        if cassette is not None:
+            return CassetteSession(cls._session, cassette)
+        return cls._session
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭共享会话及其连接池。"""
+        session, cls._session, cls._loop = cls._session, None, None
+        if session is not None and not session.closed:
+            await session.close()
+
+    @classmethod
+    def pool_stats(cls) -> Dict[str, int]:
+        """返回连接池计数器以及当前活跃/空闲连接数。"""
+        stats = dict(cls.stats)
+        connector = cls._session.connector if cls._session is not None and not cls._session.closed else None
+        stats["limit"] = HTTP_POOL_LIMIT
+        stats["limit_per_host"] = HTTP_POOL_LIMIT_PER_HOST
+        stats["connections_in_use"] = len(getattr(connector, "_acquired", ())) if connector else 0
+        stats["connections_idle"] = sum(len(conns) for conns in getattr(connector, "_conns", {}).values()) if connector else 0
+        return stats
+
+    @classmethod
+    def _create_session(cls) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[cls._trace_config()])
+
+    @classmethod
+    def _trace_config(cls) -> aiohttp.TraceConfig:
+        """通过 aiohttp 的请求追踪钩子累计连接池指标和按主机的请求耗时。"""
+        def counter(name: str):
+            async def increment(session, trace_config_ctx, params):
+                cls.stats[name] += 1
+            return increment
+
+        # 按主机记录请求耗时（到收到响应头为止）和等待连接池空闲连接的时间
+        async def request_start(session, trace_config_ctx, params):
+            trace_config_ctx.host = params.url.host or ""
+            trace_config_ctx.started = time.perf_counter()
+            trace_config_ctx.queue_wait = 0.0
+
+        async def connection_queued_start(session, trace_config_ctx, params):
+            trace_config_ctx.queued = time.perf_counter()
+
+        async def connection_queued_end(session, trace_config_ctx, params):
+            trace_config_ctx.queue_wait += time.perf_counter() - trace_config_ctx.queued
+
+        async def request_finished(session, trace_config_ctx, params):
+            FETCH_SECONDS.observe(time.perf_counter() - trace_config_ctx.started, host=trace_config_ctx.host)
+            FETCH_QUEUE_SECONDS.observe(trace_config_ctx.queue_wait, host=trace_config_ctx.host)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(counter("requests"))
+        trace_config.on_request_exception.append(counter("request_errors"))
+        trace_config.on_connection_create_end.append(counter("connections_created"))
+        trace_config.on_connection_reuseconn.append(counter("connections_reused"))
+        trace_config.on_connection_queued_start.append(counter("connections_queued"))
+        trace_config.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        trace_config.on_request_start.append(request_start)
+        trace_config.on_connection_queued_start.append(connection_queued_start)
+        trace_config.on_connection_queued_end.append(connection_queued_end)
+        trace_config.on_request_end.append(request_finished)
+        trace_config.on_request_exception.append(request_finished)
+        return trace_config
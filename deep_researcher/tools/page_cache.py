@@ -0,0 +1,143 @@
+"""
+抓取页面的持久化磁盘缓存。
+
+位于 fetch_and_process_url 和网站爬虫之前，以规范化URL为键，同时保存原始HTML和提取出的文本，
+避免同一批供应商、新闻页面在不同章节或不同研究运行中被反复下载和解析。
+
+- 新鲜期（PAGE_CACHE_TTL）内直接命中，不发起请求
+- 过期但带有 ETag/Last-Modified 的条目通过条件请求重新验证，返回304时继续使用缓存内容
+- 总大小超过 PAGE_CACHE_MAX_BYTES 时按LRU淘汰
+"""
+
+import asyncio
+import json
+import os
+import time
+import zlib
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+from ..utils.cache_store import SQLiteCacheStore
+from ..utils.logging import log_local
+from .url_utils import canonicalize_url
+
+load_dotenv()
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PAGE_CACHE_PATH = os.path.expanduser(os.getenv("PAGE_CACHE_PATH", "~/.cache/deep_researcher/page_cache.sqlite3"))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", str(6 * 3600)))  # 无需重新验证即可直接使用的时间（秒）
+PAGE_CACHE_MAX_AGE = int(os.getenv("PAGE_CACHE_MAX_AGE", str(7 * 24 * 3600)))  # 超过此时间的条目直接丢弃（秒）
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class CachedPage(BaseModel):
+    """缓存的页面内容及其重新验证信息。"""
+    url: str = Field(description="页面的URL")
+    html: str = Field(description="页面的原始HTML")
+    text: Optional[str] = Field(default=None, description="html_to_text 的提取结果，尚未提取时为None")
+    etag: Optional[str] = Field(default=None, description="响应的ETag头")
+    last_modified: Optional[str] = Field(default=None, description="响应的Last-Modified头")
+    fetched_at: float = Field(default_factory=time.time, description="最近一次下载或验证的时间")
+    truncated: bool = Field(default=False, description="html是否只是流式抓取时读取的页面开头部分")
+
+    def is_fresh(self, ttl: int) -> bool:
+        return time.time() - self.fetched_at < ttl
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """构造条件请求头，用于重新验证过期的条目。"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """以规范化URL为键、压缩存储在SQLite中的页面缓存。"""
+
+    def __init__(
+        self,
+        path: str = PAGE_CACHE_PATH,
+        ttl: int = PAGE_CACHE_TTL,
+        max_age: int = PAGE_CACHE_MAX_AGE,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES,
+        enabled: bool = PAGE_CACHE_ENABLED,
+    ):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.enabled = enabled
+        self.store = SQLiteCacheStore(path, max_bytes=max_bytes, table="pages")
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "stores": 0,
+            "bytes_saved": 0,
+        }
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        """返回缓存的页面（可能已过期，由调用方决定是否重新验证），不存在时返回None。"""
+        if not self.enabled:
+            return None
+        key = canonicalize_url(url)
+        try:
+            return await asyncio.to_thread(self._load, key)
+        except Exception as e:
+            log_local(f"读取页面缓存出错 {url}: {str(e)}", level="warning")
+            return None
+
+    async def put(self, page: CachedPage) -> None:
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._save, canonicalize_url(page.url), page)
+            self.counters["stores"] += 1
+        except Exception as e:
+            log_local(f"写入页面缓存出错 {page.url}: {str(e)}", level="warning")
+
+    async def revalidated(self, page: CachedPage) -> None:
+        """条件请求返回304后调用：刷新条目的新鲜期并计为命中。"""
+        page.fetched_at = time.time()
+        self.counters["revalidated"] += 1
+        self.record_hit(page)
+        if self.enabled:
+            try:
+                await asyncio.to_thread(self.store.touch, canonicalize_url(page.url), page.fetched_at)
+            except Exception as e:
+                log_local(f"更新页面缓存出错 {page.url}: {str(e)}", level="warning")
+
+    def record_miss(self) -> None:
+        self.counters["misses"] += 1
+
+    def record_hit(self, page: CachedPage) -> None:
+        self.counters["hits"] += 1
+        self.counters["bytes_saved"] += len(page.html.encode("utf-8"))
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中/节省字节数等计数器。"""
+        stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _load(self, key: str) -> Optional[CachedPage]:
+        row = self.store.get(key)
+        if row is None:
+            return None
+        value, stored_at = row
+        if time.time() - stored_at > self.max_age:
+            self.store.delete(key)
+            return None
+        page = CachedPage.model_validate(json.loads(zlib.decompress(value)))
+        page.fetched_at = stored_at
+        return page
+
+    def _save(self, key: str, page: CachedPage) -> None:
+        value = zlib.compress(page.model_dump_json().encode("utf-8"), 6)
+        self.store.put(key, value, stored_at=page.fetched_at)
+
+
+page_cache = PageCache()
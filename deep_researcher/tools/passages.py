@@ -0,0 +1,162 @@
+"""
+抓取结果的段落筛选。
+
+fetch_and_process_url 把每个页面截断为前 CONTENT_LENGTH_LIMIT 个字符，web_search 一次最多返回50个页面，
+也就是最多50万个字符、大部分与任务无关的文本被放进搜索代理的一次提示中。
+select_passages 位于抓取和工具返回结果之间：
+1. 将每个页面切分为约 PASSAGE_TOKENS 个token的段落（按正文块拼接，过长的块按句子切分）
+2. 以所有页面的全部段落为语料，用BM25对段落与任务查询、知识差距和搜索词打分。
+   段落不做完整分词：拉丁词项只在一次单词切分中按集合查找，中日韩双字直接用 str.count 计数
+3. 按分数从高到低把段落装入全局token预算（SCRAPE_TOKEN_BUDGET），单个页面最多占预算的 PAGE_BUDGET_SHARE
+4. 匹配查询的段落不足预算的 PASSAGE_MIN_MATCH_SHARE 时（例如中文差距对英文页面、同义词或音译），
+   剩余预算依次装入各页面开头的段落，而不是丢弃抓取成功的页面
+5. 每个页面只保留被选中的段落，按原文顺序拼接
+
+预算按token（见 utils.tokens.estimate_tokens）而不是字符计算，中文和英文页面得到同样公平的份额。
+"""
+
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Sequence, TypeVar
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from .relevance import bm25_from_counts
+from ..utils.terms import is_cjk, tokenize_terms
+from ..utils.tokens import estimate_tokens
+
+load_dotenv()
+
+SCRAPE_TOKEN_BUDGET = int(os.getenv("SCRAPE_TOKEN_BUDGET", "12000"))  # 一次工具调用返回的页面正文总token数，0表示不筛选
+PASSAGE_TOKENS = int(os.getenv("PASSAGE_TOKENS", "150"))  # 每个段落的目标token数
+PAGE_BUDGET_SHARE = float(os.getenv("PAGE_BUDGET_SHARE", "0.25"))  # 单个页面最多占用的预算比例
+# 匹配查询的段落少于此比例的预算时，用各页面开头的段落补足剩余预算
+PASSAGE_MIN_MATCH_SHARE = float(os.getenv("PASSAGE_MIN_MATCH_SHARE", "0.1"))
+PASSAGE_SEPARATOR = "\n...\n"
+
+PageT = TypeVar("PageT", bound=BaseModel)  # 带有 text 字段的抓取结果（ScrapeResult）
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;])|(?<=\.)\s+")
+
+
+@dataclass
+class Passage:
+    page: int
+    position: int
+    text: str
+    tokens: int
+
+
+def split_passages(text: str, target_tokens: int = PASSAGE_TOKENS) -> List[Passage]:
+    """按正文块（行）把页面文本拼接为约target_tokens个token的段落，超长的块按句子切分。"""
+    pieces: List[tuple] = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        tokens = estimate_tokens(line)
+        if tokens <= target_tokens:
+            pieces.append((line, tokens))
+        else:
+            pieces.extend(
+                (sentence.strip(), estimate_tokens(sentence)) for sentence in _SENTENCE_END.split(line) if sentence.strip()
+            )
+
+    passages: List[Passage] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece, tokens in pieces:
+        if current and current_tokens + tokens > target_tokens:
+            passages.append(Passage(page=0, position=len(passages), text="\n".join(current), tokens=current_tokens))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        passages.append(Passage(page=0, position=len(passages), text="\n".join(current), tokens=current_tokens))
+    return passages
+
+
+class TermCounter:
+    """统计文本中查询词项的出现次数：拉丁词项按整词匹配，中日韩双字按子串计数（重叠的双字各自计数）。"""
+
+    _WORD = re.compile(r"[0-9a-z]+")
+
+    def __init__(self, terms: Sequence[str]):
+        self.words = {term for term in terms if not is_cjk(term)}
+        self.cjk_terms = [term for term in set(terms) if is_cjk(term)]
+
+    def count(self, text: str) -> Counter:
+        text = text.casefold()
+        counts = Counter(word for word in self._WORD.findall(text) if word in self.words) if self.words else Counter()
+        for term in self.cjk_terms:
+            occurrences = text.count(term)
+            if occurrences:
+                counts[term] = occurrences
+        return counts
+
+
+def select_passages(
+    results: Sequence[PageT],
+    queries: Sequence[str],
+    budget: int = SCRAPE_TOKEN_BUDGET,
+    page_share: float = PAGE_BUDGET_SHARE,
+    min_match_share: float = PASSAGE_MIN_MATCH_SHARE,
+) -> List[PageT]:
+    """
+    从所有页面中选出与查询最相关的段落，总token数不超过budget；
+    匹配的段落少于 budget * min_match_share 时，剩余预算按页面轮流装入各页面开头的段落。
+    返回仍按原页面顺序排列，只包含至少有一个段落被选中的页面；budget<=0或没有查询词时原样返回。
+    """
+    query_terms = [term for query in queries if query for term in tokenize_terms(query)]
+    if budget <= 0 or not query_terms or not results:
+        return list(results)
+
+    passages: List[Passage] = []
+    for page, result in enumerate(results):
+        for passage in split_passages(result.text):
+            passage.page = page
+            passages.append(passage)
+    if not passages:
+        return list(results)
+
+    counter = TermCounter(query_terms)
+    frequencies = [counter.count(passage.text) for passage in passages]
+    scores = bm25_from_counts(query_terms, frequencies, [passage.tokens for passage in passages])
+    page_limit = max(PASSAGE_TOKENS, int(budget * page_share))
+    page_tokens = [0] * len(results)
+    remaining = budget
+    smallest = min(passage.tokens for passage in passages)
+    selected: List[Passage] = []
+    taken = [False] * len(passages)
+
+    def take(order) -> None:
+        nonlocal remaining
+        for index in order:
+            passage = passages[index]
+            if remaining < smallest:
+                break
+            if taken[index] or passage.tokens > remaining or page_tokens[passage.page] + passage.tokens > page_limit:
+                continue
+            taken[index] = True
+            selected.append(passage)
+            page_tokens[passage.page] += passage.tokens
+            remaining -= passage.tokens
+
+    # 分数相同时优先靠前的段落（页面开头通常是摘要）
+    take(i for i in sorted(range(len(passages)), key=lambda i: (-scores[i], passages[i].position)) if scores[i] > 0)
+    if budget - remaining < budget * min_match_share:
+        # 查询词几乎没有出现在页面中，多半是用词不同而不是页面无关：按页面轮流补入开头的段落
+        take(sorted(range(len(passages)), key=lambda i: (passages[i].position, passages[i].page)))
+
+    by_page: List[List[Passage]] = [[] for _ in results]
+    for passage in selected:
+        by_page[passage.page].append(passage)
+    trimmed = []
+    for page, result in enumerate(results):
+        if by_page[page]:
+            text = PASSAGE_SEPARATOR.join(p.text for p in sorted(by_page[page], key=lambda p: p.position))
+            trimmed.append(result.model_copy(update={"text": text}))
+    return trimmed
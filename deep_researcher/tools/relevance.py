@@ -0,0 +1,258 @@
+"""
+不依赖LLM的搜索结果相关性排序，作为 SerperClient._filter_results 的快速路径。
+
+原先每次搜索都要把全部50条结果交给 filter_agent 做一次额外的LLM往返，才能开始抓取页面。
+LocalRanker 在几毫秒内对标题、摘要和URL打分：
+- BM25：以本次搜索的全部结果为语料计算IDF，标题权重加倍
+- 字符n-gram包含度：查询的字符n-gram（拉丁文字为3-gram，中日韩文字为2-gram）在结果中出现的比例，
+  对中文查询和词形变化（battery/batteries）同样有效
+- 实体/域名匹配：查询中出现域名（例如 "Acme Inc, acme.com"）时，结果域名与之相同或为其子域名的加分，
+  仿冒的相似域名（acme.net、acrne.com：域名主体相同或只差一两个字符）不保留，但算作拿不准的结果，
+  由 auto 策略交给过滤代理复核；Next.js、Node.js 这类框架名不当作域名
+
+SEARCH_FILTER_POLICY 决定何时仍调用LLM过滤：always（总是）、never（从不）、
+auto（仅当本地排序的置信度低于 SEARCH_FILTER_CONFIDENCE 时）。
+"""
+
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from urllib.parse import unquote, urlsplit
+
+from dotenv import load_dotenv
+
+from ..utils.terms import is_cjk, tokenize_terms
+
+load_dotenv()
+
+FILTER_POLICIES = ("always", "never", "auto")
+
+
+def check_filter_policy(policy: str) -> str:
+    if policy not in FILTER_POLICIES:
+        raise ValueError(f"未知的搜索过滤策略：{policy}，可选：{', '.join(FILTER_POLICIES)}")
+    return policy
+
+
+SEARCH_FILTER_POLICY = check_filter_policy(os.getenv("SEARCH_FILTER_POLICY", "auto").lower())
+SEARCH_FILTER_MIN_SCORE = float(os.getenv("SEARCH_FILTER_MIN_SCORE", "0.2"))  # 低于此分数的结果视为无关
+SEARCH_FILTER_CONFIDENCE = float(os.getenv("SEARCH_FILTER_CONFIDENCE", "0.7"))  # auto策略下跳过LLM过滤所需的置信度
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+DECISION_MARGIN = 0.1  # 分数与阈值相差不到此值的结果视为"拿不准"
+DOMAIN_MATCH_BONUS = 0.3
+
+_DOMAIN_PATTERN = re.compile(r"\b(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z]{2,}\b")
+# 形如域名但其实是框架或文件名的后缀（Next.js、Node.js、Vue.js），不存在这样的顶级域名
+_NON_DOMAIN_SUFFIXES = frozenset(("js",))
+_SITE_PREFIX = re.compile(r"^(?:site:|https?://)")
+# 常见的两段式公共后缀，用于确定域名主体（acme.com.cn -> acme）
+_TWO_PART_SUFFIXES = frozenset((
+    "com.cn", "net.cn", "org.cn", "gov.cn", "edu.cn", "ac.cn", "com.hk", "com.tw", "co.uk", "ac.uk", "org.uk",
+    "co.jp", "ne.jp", "or.jp", "com.au", "net.au", "org.au", "co.kr", "com.sg", "com.br", "co.in", "co.nz",
+))
+
+
+@dataclass
+class ScoredResult:
+    """单条搜索结果的打分明细。"""
+    index: int
+    score: float
+    bm25: float = 0.0
+    ngram: float = 0.0
+    domain_match: Optional[bool] = None  # True：官方域名；False：仿冒的相似域名；None：无法判断
+
+
+@dataclass
+class RankingOutcome:
+    """本地排序的结果：保留的结果下标（按分数从高到低）、拿不准的下标以及整体置信度。"""
+    kept: List[int] = field(default_factory=list)
+    uncertain: List[int] = field(default_factory=list)
+    scored: List[ScoredResult] = field(default_factory=list)
+    confidence: float = 0.0
+
+
+def host_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def domain_label(host: str) -> str:
+    """返回域名主体，例如 "news.acme.com" -> "acme"、"acme.com.cn" -> "acme"。"""
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in _TWO_PART_SUFFIXES:
+        return labels[-3]
+    return labels[-2] if len(labels) >= 2 else host
+
+
+def _is_domain(match: str) -> bool:
+    return match.rsplit(".", 1)[-1] not in _NON_DOMAIN_SUFFIXES
+
+
+def query_domains(query: str) -> Set[str]:
+    """提取查询中出现的域名（包括 site: 操作符的值），"next.js" 这类框架名除外。"""
+    domains = set()
+    for token in unicodedata.normalize("NFKC", query).casefold().split():
+        token = _SITE_PREFIX.sub("", token)
+        for match in _DOMAIN_PATTERN.findall(token):
+            if _is_domain(match):
+                domains.add(match[4:] if match.startswith("www.") else match)
+    return domains
+
+
+def strip_domains(text: str) -> str:
+    """把文本中的域名替换为空格，框架名保留为普通词项。"""
+    return _DOMAIN_PATTERN.sub(lambda match: " " if _is_domain(match.group()) else match.group(), text)
+
+
+def char_ngrams(text: str) -> Set[str]:
+    """字符n-gram集合：中日韩字符取2-gram，其余字符取3-gram（按不含空白的连续片段切分）。"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    grams: Set[str] = set()
+    for run in re.findall(r"\w+", text):
+        size = 2 if is_cjk(run) else 3
+        if len(run) <= size:
+            grams.add(run)
+        else:
+            grams.update(run[i:i + size] for i in range(len(run) - size + 1))
+    return grams
+
+
+class LocalRanker:
+    """基于BM25、字符n-gram和域名匹配的搜索结果排序器。"""
+
+    def __init__(self, min_score: float = SEARCH_FILTER_MIN_SCORE):
+        self.min_score = min_score
+
+    def rank(self, query: str, results: List[Dict[str, str]]) -> RankingOutcome:
+        """
+        对搜索结果（包含 url/title/description 的字典）打分。
+        保留分数不低于 min_score 的结果，置信度为明确保留或明确剔除的结果所占的比例。
+        """
+        if not results:
+            return RankingOutcome(confidence=1.0)
+        domains = query_domains(query)
+        # 域名本身不参与文本匹配，否则 "acme.com" 会让所有提到acme的结果得分相同
+        text_query = strip_domains(unicodedata.normalize("NFKC", query).casefold())
+        query_terms = list(dict.fromkeys(tokenize_terms(text_query)))
+        query_grams = char_ngrams(text_query)
+
+        documents = [self._document_terms(result) for result in results]
+        bm25 = bm25_scores(query_terms, documents)
+
+        scored: List[ScoredResult] = []
+        for index, result in enumerate(results):
+            haystack = " ".join((result.get("title") or "", result.get("description") or "", _url_text(result.get("url") or "")))
+            ngram = len(query_grams & char_ngrams(haystack)) / len(query_grams) if query_grams else 0.0
+            entry = ScoredResult(index=index, score=0.5 * bm25[index] + 0.5 * ngram, bm25=bm25[index], ngram=ngram)
+            if domains:
+                entry.domain_match = _match_domain(host_of(result.get("url") or ""), domains)
+                if entry.domain_match is True:
+                    entry.score += DOMAIN_MATCH_BONUS
+                elif entry.domain_match is False:
+                    entry.score = 0.0
+            scored.append(entry)
+
+        outcome = RankingOutcome(scored=scored)
+        clear = 0
+        for entry in sorted(scored, key=lambda item: -item.score):
+            if entry.score >= self.min_score:
+                outcome.kept.append(entry.index)
+            # 仿冒域名不保留，但是否真的仿冒交给过滤代理判断，因此不计入明确的结果
+            if entry.domain_match is not False and abs(entry.score - self.min_score) >= DECISION_MARGIN:
+                clear += 1
+            else:
+                outcome.uncertain.append(entry.index)
+        outcome.confidence = clear / len(scored) if outcome.kept else 0.0
+        return outcome
+
+    @staticmethod
+    def _document_terms(result: Dict[str, str]) -> List[str]:
+        title = tokenize_terms(result.get("title") or "")
+        return title + title + tokenize_terms(result.get("description") or "") + tokenize_terms(_url_text(result.get("url") or ""))
+
+
+def bm25_scores(query_terms: List[str], documents: List[List[str]]) -> List[float]:
+    """以给定文档集合为语料计算每个文档的BM25分数，并除以理论上限归一化到[0, 1]左右。"""
+    return bm25_from_counts(query_terms, [Counter(document) for document in documents], [len(document) for document in documents])
+
+
+def bm25_from_counts(query_terms: List[str], frequencies: List[Counter], lengths: List[int]) -> List[float]:
+    """与 bm25_scores 相同，但直接使用每个文档中查询词项的词频和文档长度。"""
+    if not query_terms or not frequencies:
+        return [0.0] * len(frequencies)
+    count = len(frequencies)
+    average_length = sum(lengths) / count or 1.0
+    query_set = set(query_terms)
+    idf = {}
+    for term in query_set:
+        document_frequency = sum(1 for counts in frequencies if counts[term])
+        idf[term] = math.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+    upper_bound = sum(idf.values()) * (BM25_K1 + 1)
+    scores = []
+    for counts, length in zip(frequencies, lengths):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        score = sum(
+            idf[term] * counts[term] * (BM25_K1 + 1) / (counts[term] + norm)
+            for term in query_set if counts[term]
+        )
+        scores.append(min(1.0, score / upper_bound) if upper_bound else 0.0)
+    return scores
+
+
+def _url_text(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.hostname or ''} {unquote(parts.path)}"
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """两个字符串的编辑距离，超过 limit 时提前返回 limit + 1。"""
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for i, char in enumerate(first, 1):
+        current = [i]
+        for j, other in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _lookalike(host_label: str, label: str) -> bool:
+    """域名主体相同（换了后缀）或只差一两个字符（acrne/acme），长度不足3的主体不判断。"""
+    if len(label) < 3:
+        return False
+    limit = 1 if len(label) < 8 else 2
+    return edit_distance(host_label, label, limit) <= limit
+
+
+def _match_domain(host: str, domains: Set[str]) -> Optional[bool]:
+    """结果域名是查询域名或其子域名时返回True，是仿冒的相似域名时返回False，其余返回None。"""
+    if not host:
+        return None
+    for domain in domains:
+        if host == domain or host.endswith("." + domain):
+            return True
+    host_label = domain_label(host)
+    if any(_lookalike(host_label, domain_label(domain)) for domain in domains):
+        return False
+    return None
+
+
+def should_use_llm(policy: str, outcome: RankingOutcome, threshold: float = SEARCH_FILTER_CONFIDENCE) -> bool:
+    """根据过滤策略和本地排序的置信度决定是否还需要调用LLM过滤，未知的策略抛出 ValueError。"""
+    if check_filter_policy(policy) == "never":
+        return False
+    if policy == "always":
+        return True
+    return outcome.confidence < threshold
+
+
+local_ranker = LocalRanker()
@@ -0,0 +1,140 @@
+"""
+SerperClient.search 的搜索结果缓存。
+
+并行章节和重复迭代经常发出相同（或仅大小写、空白、全角半角不同）的查询。
+此缓存以规范化后的查询和请求参数（freshness、count）为键，分两级保存搜索结果：
+进程内LRU（最近使用的结果，无需反序列化磁盘数据）和SQLite（跨进程、跨运行持久化）。
+可选地同时缓存经过 _filter_results 过滤后的结果，以省去过滤代理的LLM调用。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from ..utils.cache_store import SQLiteCacheStore
+
+load_dotenv()
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEARCH_CACHE_PATH = os.path.expanduser(os.getenv("SEARCH_CACHE_PATH", "~/.cache/deep_researcher/search_cache.sqlite3"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))  # 搜索结果有效期（秒）
+SEARCH_CACHE_MEMORY_SIZE = int(os.getenv("SEARCH_CACHE_MEMORY_SIZE", "512"))  # 内存LRU最多保存的条目数
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEARCH_CACHE_FILTERED = os.getenv("SEARCH_CACHE_FILTERED", "false").lower() in ("1", "true", "yes")  # 是否缓存过滤后的结果
+
+_SITE_PATTERN = re.compile(r"\bsite:\s*(\S+)", re.IGNORECASE)
+
+
+def normalize_site(site: str) -> str:
+    """将 site: 操作符的值规范为小写的裸域名，例如 "https://www.Acme.com/" -> "acme.com"。"""
+    site = re.sub(r"^[a-z]+://", "", site.strip().lower())
+    site = site.split("/")[0]
+    if site.startswith("www."):
+        site = site[4:]
+    return site
+
+
+def normalize_query(query: str) -> str:
+    """
+    规范化搜索查询，作为缓存键的一部分：
+    - NFKC规范化（全角字母、数字、空格、标点折叠为半角）并转为小写
+    - 合并连续空白
+    - 提取 site: 操作符，规范化域名后排序放在查询末尾
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    sites = sorted({normalize_site(site) for site in _SITE_PATTERN.findall(query)})
+    terms = " ".join(_SITE_PATTERN.sub(" ", query).split())
+    return " ".join([terms] + [f"site:{site}" for site in sites]).strip()
+
+
+class SearchCache:
+    """两级（内存LRU + SQLite）的搜索结果缓存，值为可JSON序列化的结果列表。"""
+
+    def __init__(
+        self,
+        path: str = SEARCH_CACHE_PATH,
+        ttl: int = SEARCH_CACHE_TTL,
+        memory_size: int = SEARCH_CACHE_MEMORY_SIZE,
+        max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+        enabled: bool = SEARCH_CACHE_ENABLED,
+        cache_filtered: bool = SEARCH_CACHE_FILTERED,
+    ):
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.enabled = enabled
+        self.cache_filtered = cache_filtered
+        self.store = SQLiteCacheStore(path, max_bytes=max_bytes, table="searches")
+        self._memory: "OrderedDict[str, tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+        }
+
+    @staticmethod
+    def make_key(query: str, params: Dict[str, Any], variant: str = "raw") -> str:
+        """由规范化查询、请求参数和结果类型（原始/过滤后）生成缓存键。"""
+        payload = json.dumps([normalize_query(query), params, variant], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, query: str, params: Dict[str, Any], variant: str = "raw") -> Optional[List[Dict[str, Any]]]:
+        if not self.enabled:
+            return None
+        key = self.make_key(query, params, variant)
+        entry = self._memory.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            self._memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return entry[1]
+
+        try:
+            row = await asyncio.to_thread(self.store.get, key)
+        except Exception as e:
+            print(f"读取搜索缓存出错: {str(e)}")
+            row = None
+        if row is not None and time.time() - row[1] < self.ttl:
+            results = json.loads(row[0])
+            self._remember(key, row[1], results)
+            self.counters["disk_hits"] += 1
+            return results
+
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, query: str, params: Dict[str, Any], results: List[Dict[str, Any]], variant: str = "raw") -> None:
+        if not self.enabled:
+            return
+        key = self.make_key(query, params, variant)
+        stored_at = time.time()
+        self._remember(key, stored_at, results)
+        try:
+            value = json.dumps(results, ensure_ascii=False).encode("utf-8")
+            await asyncio.to_thread(self.store.put, key, value, stored_at)
+            self.counters["stores"] += 1
+        except Exception as e:
+            print(f"写入搜索缓存出错: {str(e)}")
+
+    def stats(self) -> Dict[str, float]:
+        stats = dict(self.counters)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, stored_at: float, results: List[Dict[str, Any]]) -> None:
+        self._memory[key] = (stored_at, results)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+
+search_cache = SearchCache()
@@ -0,0 +1,305 @@
+"""
+基于 robots.txt 和 sitemap.xml 的爬取种子发现。
+
+SiteCrawler 原先只能从首页沿链接逐层发现页面，既慢又常常落在导航类的样板页面上。
+给定任务查询时，爬取前先读取站点的 robots.txt（Sitemap 声明和 Disallow 规则）以及站点地图
+（支持站点地图索引和 .gz 压缩），按URL路径与查询的词项重合度以及 lastmod 的新近程度对候选页面排序，
+直接抓取排名靠前的页面。
+
+- 站点地图以流式方式下载和解析（lxml XMLPullParser），不会把几十MB的站点地图整体读入内存
+- 站点地图索引中的子站点地图同样按与查询的相关性排序，只下载最相关的几个
+- robots.txt 和每个站点地图文件的解析结果在进程内按URL缓存 SITEMAP_CACHE_TTL 秒，同一站点的多次爬取不会重复下载
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from dotenv import load_dotenv
+from lxml import etree
+
+from .http_client import HTTPClient
+from ..utils.logging import log_local
+from ..utils.single_flight import SingleFlight
+from ..utils.terms import tokenize_terms
+
+load_dotenv()
+
+SITEMAP_SEEDING = os.getenv("SITEMAP_SEEDING", "true").lower() in ("1", "true", "yes")
+SITEMAP_CACHE_TTL = int(os.getenv("SITEMAP_CACHE_TTL", "3600"))  # robots.txt和站点地图的缓存时间（秒）
+# 获取失败（超时、非200响应）的缓存时间（秒），一次偶然的失败不会让站点在整个 SITEMAP_CACHE_TTL 内失去种子
+SITEMAP_NEGATIVE_TTL = int(os.getenv("SITEMAP_NEGATIVE_TTL", "60"))
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", "8"))  # 每个站点最多下载的站点地图文件数（含索引）
+SITEMAP_MAX_URLS = int(os.getenv("SITEMAP_MAX_URLS", "20000"))  # 每个站点最多考虑的候选URL数
+SITEMAP_MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", str(20 * 1024 * 1024)))  # 单个站点地图最多读取的（解压后）字节数
+SITEMAP_TIMEOUT = float(os.getenv("SITEMAP_TIMEOUT", "10"))  # 种子发现阶段的总超时（秒）
+SITEMAP_CHUNK_BYTES = 64 * 1024
+SITEMAP_CACHE_SIZE = 256
+
+# 查询中不具有区分度的英文虚词
+STOP_TERMS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it", "of",
+    "on", "or", "the", "their", "to", "what", "when", "which", "who", "why", "with", "www", "com", "html", "htm",
+))
+# 很少包含实质内容的页面路径
+_BOILERPLATE_PATH = re.compile(
+    r"/(tag|tags|category|categories|author|page|login|signin|signup|register|cart|checkout|account|"
+    r"search|privacy|terms|cookie|cookies|legal|feed|wp-json)(/|$)",
+    re.IGNORECASE,
+)
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclass
+class SitemapEntry:
+    """站点地图中的一个条目（页面或子站点地图）。"""
+    url: str
+    lastmod: Optional[float] = None  # Unix时间戳
+
+
+@dataclass
+class SitemapDocument:
+    """一个站点地图文件的解析结果。"""
+    pages: List[SitemapEntry] = field(default_factory=list)
+    sitemaps: List[SitemapEntry] = field(default_factory=list)  # 站点地图索引中的子站点地图
+
+
+@dataclass
+class CrawlSeeds:
+    """种子发现的结果：排好序的候选页面以及站点的robots规则（无法获取时为None）。"""
+    urls: List[str] = field(default_factory=list)
+    robots: Optional[RobotFileParser] = None
+    candidates: int = 0  # 站点地图中的候选页面总数
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[float]:
+    """解析W3C日期时间格式的lastmod（例如 2024-05-01、2024-05-01T10:00:00+08:00 或 2024-05-01T02:00:00Z），无法解析时返回None。"""
+    if not value:
+        return None
+    value = value.strip()
+    if value[-1:] in ("Z", "z"):
+        # Python 3.10 的 fromisoformat 不接受 Z 后缀，而大多数站点地图使用它
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _local_name(tag) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+class SitemapParser:
+    """增量解析站点地图XML（urlset 或 sitemapindex，忽略命名空间），已处理的元素会被立即释放。"""
+
+    def __init__(self, base_url: str = ""):
+        self.base_url = base_url
+        self.document = SitemapDocument()
+        self._parser = etree.XMLPullParser(events=("end",), recover=True, resolve_entities=False, no_network=True)
+
+    def feed(self, data: bytes) -> None:
+        self._parser.feed(data)
+        self._process_events()
+
+    def close(self) -> SitemapDocument:
+        try:
+            self._parser.close()
+        except etree.LxmlError:
+            pass
+        self._process_events()
+        return self.document
+
+    @property
+    def size(self) -> int:
+        return len(self.document.pages) + len(self.document.sitemaps)
+
+    def _process_events(self) -> None:
+        for _, element in self._parser.read_events():
+            kind = _local_name(element.tag)
+            if kind not in ("url", "sitemap"):
+                continue
+            loc = lastmod = None
+            for child in element:
+                name = _local_name(child.tag)
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = child.text
+            if loc:
+                entry = SitemapEntry(url=urljoin(self.base_url, loc), lastmod=parse_lastmod(lastmod))
+                (self.document.pages if kind == "url" else self.document.sitemaps).append(entry)
+            # 释放已处理的元素，保持内存占用与站点地图大小无关
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+def query_terms(query: str) -> Set[str]:
+    return {term for term in tokenize_terms(query) if term not in STOP_TERMS}
+
+
+def score_url(url: str, terms: Set[str], lastmod: Optional[float] = None, now: Optional[float] = None) -> Tuple[float, float]:
+    """
+    返回 (相关性, 综合得分)。相关性为查询词项在URL路径中出现的比例；
+    综合得分在此基础上加上lastmod新近程度的奖励（一年衰减到约1/3），并对过深的路径和样板页面扣分。
+    """
+    path = unquote(urlsplit(url).path)
+    path_terms = set(tokenize_terms(path))
+    relevance = len(terms & path_terms) / len(terms) if terms else 0.0
+    score = relevance
+    if lastmod is not None:
+        age_days = max(0.0, ((now or time.time()) - lastmod) / 86400)
+        score += 0.3 * math.exp(-age_days / 365)
+    score -= 0.02 * path.strip("/").count("/")
+    if _BOILERPLATE_PATH.search(path):
+        score -= 0.5
+    return relevance, score
+
+
+def rank_entries(entries: List[SitemapEntry], query: str, limit: int, require_match: bool = True) -> List[str]:
+    """按与查询的相关性对站点地图条目排序，返回前limit个URL；require_match为True时丢弃路径与查询无关的条目。"""
+    terms = query_terms(query)
+    now = time.time()
+    scored = []
+    for index, entry in enumerate(entries):
+        relevance, score = score_url(entry.url, terms, entry.lastmod, now)
+        if require_match and relevance <= 0:
+            continue
+        scored.append((-score, index, entry.url))
+    scored.sort()
+    return [url for _, _, url in scored[:limit]]
+
+
+class SitemapSeeder:
+    """读取robots.txt和站点地图并选出爬取种子，带有按URL的进程内缓存。"""
+
+    def __init__(
+        self,
+        ttl: int = SITEMAP_CACHE_TTL,
+        negative_ttl: int = SITEMAP_NEGATIVE_TTL,
+        max_files: int = SITEMAP_MAX_FILES,
+        max_urls: int = SITEMAP_MAX_URLS,
+        max_bytes: int = SITEMAP_MAX_BYTES,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_files = max_files
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self._cache: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._flight = SingleFlight("sitemap")
+
+    async def seeds(self, starting_url: str, query: str, limit: int) -> CrawlSeeds:
+        """返回与查询最相关的至多limit个页面URL（已按robots规则过滤）以及站点的robots规则。"""
+        parts = urlsplit(starting_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        robots = await self.robots(origin)
+        sitemap_urls = robots.site_maps() if robots is not None else None
+        pages = await self.pages(sitemap_urls or [origin + "/sitemap.xml"], query)
+
+        def allowed(url: str) -> bool:
+            return robots is None or robots.can_fetch("*", url)
+
+        ranked = rank_entries([page for page in pages if allowed(page.url)], query, limit)
+        return CrawlSeeds(urls=ranked, robots=robots, candidates=len(pages))
+
+    async def robots(self, origin: str) -> Optional[RobotFileParser]:
+        """获取并解析站点的robots.txt，不存在或无法获取时返回None（不做任何限制）。"""
+        url = origin + "/robots.txt"
+        return await self._cached(url, lambda: self._load_robots(url))
+
+    async def pages(self, sitemap_urls: List[str], query: str) -> List[SitemapEntry]:
+        """
+        下载站点地图并返回其中的页面条目。遇到站点地图索引时，子站点地图按与查询的相关性排序，
+        总共最多下载 max_files 个文件、收集 max_urls 个页面。
+        """
+        pages: List[SitemapEntry] = []
+        visited: Set[str] = set()
+        level = list(dict.fromkeys(sitemap_urls))
+        while level and len(visited) < self.max_files and len(pages) < self.max_urls:
+            level = [url for url in level if url not in visited][:self.max_files - len(visited)]
+            visited.update(level)
+            documents = await asyncio.gather(*(self.document(url) for url in level))
+            children: List[SitemapEntry] = []
+            for document in documents:
+                if document is None:
+                    continue
+                pages.extend(document.pages[:self.max_urls - len(pages)])
+                children.extend(document.sitemaps)
+            level = rank_entries(children, query, len(children), require_match=False)
+        return pages
+
+    async def document(self, url: str) -> Optional[SitemapDocument]:
+        return await self._cached(url, lambda: self._load_document(url))
+
+    async def _cached(self, url: str, factory):
+        """按URL缓存加载结果；加载失败（返回None）的结果只缓存 negative_ttl 秒。"""
+        entry = self._cache.get(url)
+        if entry is not None and time.time() - entry[0] < (self.ttl if entry[1] is not None else self.negative_ttl):
+            self._cache.move_to_end(url)
+            return entry[1]
+        value = await self._flight.do(url, factory)
+        self._cache[url] = (time.time(), value)
+        self._cache.move_to_end(url)
+        while len(self._cache) > SITEMAP_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return value
+
+    async def _load_robots(self, url: str) -> Optional[RobotFileParser]:
+        try:
+            async with HTTPClient.get_session().get(url, timeout=aiohttp.ClientTimeout(total=SITEMAP_TIMEOUT)) as response:
+                if response.status != 200:
+                    return None
+                text = await response.text(errors="replace")
+        except Exception as e:
+            log_local(f"获取robots.txt出错 {url}: {str(e)}", level="warning")
+            return None
+        robots = RobotFileParser(url)
+        robots.parse(text.splitlines())
+        return robots
+
+    async def _load_document(self, url: str) -> Optional[SitemapDocument]:
+        """流式下载并解析一个站点地图文件，自动识别gzip压缩（按内容的魔数判断，而不是扩展名）。"""
+        parser = SitemapParser(url)
+        decompressor = None
+        bytes_read = 0
+        first = True
+        try:
+            async with HTTPClient.get_session().get(url, timeout=aiohttp.ClientTimeout(total=SITEMAP_TIMEOUT)) as response:
+                if response.status != 200:
+                    return None
+                async for chunk in response.content.iter_chunked(SITEMAP_CHUNK_BYTES):
+                    if first:
+                        first = False
+                        if chunk.startswith(_GZIP_MAGIC):
+                            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    if decompressor is not None:
+                        chunk = decompressor.decompress(chunk, self.max_bytes - bytes_read)
+                    bytes_read += len(chunk)
+                    parser.feed(chunk)
+                    if bytes_read >= self.max_bytes or parser.size >= self.max_urls:
+                        break
+        except Exception as e:
+            log_local(f"获取站点地图出错 {url}: {str(e)}", level="warning")
+            if not parser.size:
+                return None
+        return parser.close()
+
+
+sitemap_seeder = SitemapSeeder()
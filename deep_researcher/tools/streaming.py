@@ -0,0 +1,206 @@
+"""
+抓取页面时的流式读取与增量提取。
+
+fetch_and_process_url 只需要页面开头的 CONTENT_LENGTH_LIMIT 个字符的正文，原先却会完整下载整个页面再丢弃多余部分。
+read_html_stream 先根据 Content-Type / Content-Length 拒绝非HTML或明显过大的响应，
+然后按块读取响应体（最多 SCRAPE_MAX_BYTES 字节），边读边用增量解析器提取正文，
+提取出足够的文本后立即停止下载。
+
+- 压缩：aiohttp 会按 Content-Encoding 自动解压（gzip/deflate，安装 brotli 时还支持br），读到的块已是解压后的数据
+- 字符集：依次使用响应头中的charset、BOM、页面开头的 <meta charset>，最后回退到UTF-8。
+  响应头没有charset时，先缓存开头的 CHARSET_SNIFF_BYTES 字节（或读到 </head>）再判断，
+  iter_chunked 返回的第一个块可能只是一个TCP分段，其中还没有 <meta charset>
+"""
+
+import codecs
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+from lxml import etree
+
+from .extraction import SKIP_TEXT_TAGS, TEXT_TAGS
+
+load_dotenv()
+
+SCRAPE_STREAMING = os.getenv("SCRAPE_STREAMING", "true").lower() in ("1", "true", "yes")
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(2 * 1024 * 1024)))  # 单个页面最多读取的（解压后）字节数
+SCRAPE_ABORT_BYTES = int(os.getenv("SCRAPE_ABORT_BYTES", str(20 * 1024 * 1024)))  # Content-Length超过此值时直接放弃
+SCRAPE_CHUNK_BYTES = 64 * 1024
+CHARSET_SNIFF_BYTES = 4096  # 查找 <meta charset> 的页面开头字节数
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+_HEAD_END = re.compile(rb"</head\s*>", re.IGNORECASE)
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_\-:.]+)""", re.IGNORECASE)
+# 常见的过时字符集标签映射到兼容的超集
+_CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030", "iso-8859-1": "cp1252", "ascii": "utf-8"}
+
+
+class UnsupportedContentError(Exception):
+    """响应不是HTML或体积过大，不值得下载。"""
+    pass
+
+
+@dataclass
+class StreamedPage:
+    html: str
+    text: str
+    truncated: bool  # 是否在读完响应体之前停止
+
+
+def check_html_response(response: aiohttp.ClientResponse) -> None:
+    """根据响应头判断是否是值得下载的HTML页面，否则抛出 UnsupportedContentError。"""
+    content_type = response.headers.get("Content-Type", "")
+    mime = content_type.split(";")[0].strip().lower()
+    if mime and mime not in HTML_CONTENT_TYPES:
+        raise UnsupportedContentError(f"不支持的内容类型 {mime}")
+    if response.content_length is not None and response.content_length > SCRAPE_ABORT_BYTES:
+        raise UnsupportedContentError(f"页面过大（{response.content_length} 字节）")
+
+
+def normalize_charset(charset: Optional[str]) -> Optional[str]:
+    if not charset:
+        return None
+    charset = charset.strip().lower()
+    charset = _CHARSET_ALIASES.get(charset, charset)
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def sniff_charset(response_charset: Optional[str], head: bytes) -> str:
+    """确定页面字符集：响应头 > BOM > <meta charset> > UTF-8。"""
+    charset = normalize_charset(response_charset)
+    if charset:
+        return charset
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    match = _META_CHARSET.search(head[:CHARSET_SNIFF_BYTES])
+    return normalize_charset(match.group(1).decode("ascii", errors="ignore")) if match else "utf-8"
+
+
+class IncrementalTextExtractor:
+    """
+    基于 lxml.etree.HTMLPullParser 的增量正文提取器，提取规则与 extraction.extract_page 相同。
+
+    每个正文标签在开始时按文档顺序占位，在结束（其子树完整）时计算文本；
+    text_length 为从文档开头起连续已完成的正文长度，用于判断是否已经提取到足够的内容。
+    """
+
+    def __init__(self):
+        self._parser = etree.HTMLPullParser(events=("start", "end"))
+        self._blocks: List[Optional[str]] = []
+        self._open_slots: List[int] = []
+        self._prefix_index = 0
+        self.text_length = 0
+
+    def feed(self, data: str) -> None:
+        self._parser.feed(data)
+        self._process_events()
+
+    def close(self) -> None:
+        try:
+            self._parser.close()
+        except etree.LxmlError:
+            pass
+        self._process_events()
+
+    def text(self) -> str:
+        return "\n".join(block for block in self._blocks if block)
+
+    def _process_events(self) -> None:
+        for event, element in self._parser.read_events():
+            if element.tag not in TEXT_TAGS:
+                continue
+            if event == "start":
+                self._open_slots.append(len(self._blocks))
+                self._blocks.append(None)
+            elif self._open_slots:
+                self._blocks[self._open_slots.pop()] = block_text(element)
+        while self._prefix_index < len(self._blocks) and self._blocks[self._prefix_index] is not None:
+            block = self._blocks[self._prefix_index]
+            if block:
+                self.text_length += len(block) + 1
+            self._prefix_index += 1
+
+
+def block_text(element) -> str:
+    """元素子树中去除首尾空白后拼接的文本（不含元素自身的tail、注释以及脚本/样式内容）。"""
+    pieces = []
+    skip_depth = 0
+
+    def add(piece: Optional[str]) -> None:
+        if piece and not skip_depth:
+            piece = piece.strip()
+            if piece:
+                pieces.append(piece)
+
+    for event, node in etree.iterwalk(element, events=("start", "end", "comment", "pi")):
+        if not isinstance(node.tag, str):
+            add(node.tail)
+        elif event == "start":
+            if node.tag in SKIP_TEXT_TAGS:
+                skip_depth += 1
+            add(node.text)
+        else:
+            if node.tag in SKIP_TEXT_TAGS:
+                skip_depth -= 1
+            if node is not element:
+                add(node.tail)
+    return "".join(pieces)
+
+
+async def read_html_stream(
+    response: aiohttp.ClientResponse,
+    text_limit: int,
+    max_bytes: int = SCRAPE_MAX_BYTES,
+) -> StreamedPage:
+    """
+    流式读取HTML响应体并增量提取正文，正文达到text_limit字符或读取达到max_bytes字节时停止。
+    """
+    check_html_response(response)
+    extractor = IncrementalTextExtractor()
+    decoder = None
+    head = b""  # 确定字符集之前缓存的页面开头
+    html_parts: List[str] = []
+    bytes_read = 0
+    truncated = False
+
+    def start_decoder(data: bytes):
+        return codecs.getincrementaldecoder(sniff_charset(response.charset, data))(errors="replace")
+
+    header_charset = normalize_charset(response.charset)
+
+    async for chunk in response.content.iter_chunked(SCRAPE_CHUNK_BYTES):
+        bytes_read += len(chunk)
+        if decoder is None:
+            head += chunk
+            waiting = not header_charset and len(head) < CHARSET_SNIFF_BYTES and not _HEAD_END.search(head)
+            if waiting and bytes_read < max_bytes:
+                continue
+            decoder = start_decoder(head)
+            chunk, head = head, b""
+        decoded = decoder.decode(chunk)
+        html_parts.append(decoded)
+        extractor.feed(decoded)
+        if extractor.text_length >= text_limit or bytes_read >= max_bytes:
+            truncated = not response.content.at_eof()
+            break
+
+    if decoder is None and head:
+        # 整个响应体不足 CHARSET_SNIFF_BYTES 字节
+        decoder = start_decoder(head)
+        html_parts.append(decoder.decode(head))
+        extractor.feed(html_parts[-1])
+    if decoder is not None and not truncated:
+        tail = decoder.decode(b"", final=True)
+        html_parts.append(tail)
+        extractor.feed(tail)
+    extractor.close()
+    return StreamedPage(html="".join(html_parts), text=extractor.text(), truncated=truncated)
@@ -0,0 +1,47 @@
+"""
+URL规范化工具，用于缓存键、去重和爬虫的已访问集合。
+"""
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 不影响页面内容的跟踪参数。只列出明确的广告和邮件跟踪ID：from、ref、spm 等通用名称
+# 在很多网站上决定页面内容（论坛分页 ?from=40、代码仓库分支 ?ref=v2），不能去掉
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "yclid", "dclid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "_hsenc", "_hsmi",
+}
+TRACKING_PARAM_PREFIXES = ("utm_",)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    返回URL的规范形式：
+    - 协议和主机名转为小写，去掉默认端口
+    - 去掉片段（#...）和跟踪参数，其余查询参数按名称排序
+    - 去掉非根路径末尾的斜杠，空路径规范为"/"
+    """
+    url = url.strip()
+    if not url.startswith(("http://", "https://")):
+        url = "http://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
@@ -1,21 +1,36 @@
 import json
 import os
-import ssl
 import aiohttp
 import asyncio
 from agents import function_tool,RunContextWrapper
 from ..agents.baseclass import ResearchAgent, ResearchRunner
 from ..agents.utils.parse_output import create_type_parser
-from typing import List, Union, Optional
+from typing import Callable, List, Union, Optional, Tuple
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from ..llm_client import fast_model, model_supports_structured_output
-from ..utils.logging import TraceInfo, log_message
+from ..utils.logging import TraceInfo, log_local, log_message
+from ..utils.metrics import span
+from .http_client import HTTPClient, ssl_context
+from .page_cache import CachedPage, page_cache
+from .search_cache import normalize_query, search_cache
+from .url_utils import canonicalize_url
+from .extraction import extraction_engine
+from .streaming import SCRAPE_STREAMING, check_html_response, read_html_stream
+from .relevance import SEARCH_FILTER_POLICY, local_ranker, should_use_llm
+from .passages import select_passages
+from .dedup import drop_near_duplicates, find_near_duplicates
+from ..utils.simhash import SimHashIndex
+from ..utils.tokens import estimate_tokens
+from ..utils.single_flight import SingleFlight
 
 load_dotenv()
 CONTENT_LENGTH_LIMIT = 10000  # 将爬取的内容修剪到此长度，以避免大型上下文/令牌限制问题
 SEARCH_PROVIDER = os.getenv("SEARCH_PROVIDER", "serper").lower()
+SEARCH_API_URL = os.getenv("SEARCH_API_URL", "https://api.bochaai.com/v1/web-search")  # 搜索API地址，基准测试中指向本地桩服务器
+SEARCH_PARAMS = {"freshness": "oneYear", "count": 50}  # 搜索API的请求参数，同时作为搜索缓存键的一部分
 
 # ------- 定义类型 -------
 
@@ -34,44 +49,60 @@ class WebpageSnippet(BaseModel):
 class SearchResults(BaseModel):
     results_list: List[WebpageSnippet]
 
+
+class SearchEvents(list):
+    """一次搜索执行过程中的日志事件 (消息, 级别, 事件类型)。合并执行的搜索结束后，由每个调用方发送到自己的运行。"""
+
+    def add(self, message: Union[str, Callable[[], str]], level: str = "info", event: str = "search-result") -> None:
+        self.append((message, level, event))
+
+    async def emit(self, trace_info: TraceInfo) -> None:
+        for message, level, event in self:
+            await log_message(message, trace_info, level=level, event=event)
+
 # ------- 定义工具 -------
 
 # 添加一个模块级变量来存储单例实例
 _serper_client = None
 
+# 进程内的进行中请求表：并发的相同搜索/页面抓取只执行一次
+search_flight = SingleFlight("search")
+fetch_flight = SingleFlight("fetch")
+
 
 @function_tool
 async def web_search(wrapper: RunContextWrapper[TraceInfo], query: str) -> Union[List[ScrapeResult], str]:
     """对给定查询执行网络搜索，并获取URL及其标题、描述和文本内容。"""
-    await log_message(f"<function_tool_web_search>函数开始执行: wrapper={type(wrapper)}, query={query}</function_tool_web_search>", wrapper.context)
+    await log_message(f"函数开始执行: wrapper={type(wrapper)}, query={query}", wrapper.context, event="function_tool_web_search")
     try:
         # 确保参数类型正确
         if not isinstance(wrapper, RunContextWrapper):
-            print(f"警告: wrapper 参数类型不正确，收到: {type(wrapper)}")
+            log_local(f"警告: wrapper 参数类型不正确，收到: {type(wrapper)}", level="warning")
             # 如果第一个参数是字符串，可能是查询参数被错误地放在了第一位
             if isinstance(wrapper, str) and isinstance(query, RunContextWrapper):
                 # 交换参数
                 wrapper, query = query, wrapper
-                print(f"自动交换参数: wrapper={type(wrapper)}, query={query}")
+                log_local(f"自动交换参数: wrapper={type(wrapper)}, query={query}", level="warning")
         
-        print(f"web_search 函数开始执行: wrapper={type(wrapper)}, query={query}")
+        log_local(f"web_search 函数开始执行: wrapper={type(wrapper)}, query={query}")
         
         # 仅当搜索提供商为serper时使用SerperClient
         if SEARCH_PROVIDER == "openai":
             # 对于OpenAI搜索提供商，不应直接调用此函数
             return f"当SEARCH_PROVIDER设置为'openai'时，不使用web_search函数。请检查您的配置。"
         else:
-            print(f"SerperClient当前trace_id：{wrapper.context.trace_id}")
-            await log_message(f"<function_tool_client>函数开始执行: wrapper={type(wrapper)}, query={query}</function_tool_client>", wrapper.context)
-            # SerperClient的延迟初始化
-            serper_client = SerperClient()
-            search_results = await serper_client.search(wrapper, query, filter_for_relevance=True, max_results=50)
-            results = await scrape_urls(search_results)
-            return results
+            log_local(f"SerperClient当前trace_id：{wrapper.context.trace_id}")
+            await log_message(f"函数开始执行: wrapper={type(wrapper)}, query={query}", wrapper.context, event="function_tool_client")
+            async with span("tool", "web_search", input=query) as current:
+                # SerperClient的延迟初始化
+                serper_client = SerperClient()
+                search_results = await serper_client.search(wrapper, query, filter_for_relevance=True, max_results=50)
+                results = await scrape_urls(search_results)
+                refined = await refine_scrape_results(wrapper.context, results, query)
+                current.set_output(refined)
+            return refined
     except Exception as e:
-        error_msg = f"web_search 执行错误: {str(e)}"
-        await log_message(f"<web_search_error>执行错误:{str(e)}</web_search_error>", wrapper.context)
-        print(error_msg)
+        await log_message(f"执行错误:{str(e)}", wrapper.context, level="error", event="web_search_error")
         # 返回用户友好的错误消息
         return f"抱歉，搜索时遇到错误：{str(e)}"
 
@@ -101,13 +132,6 @@ filter_agent = ResearchAgent(
 
 # ------- 定义底层工具逻辑 -------
 
-# 创建共享连接器
-ssl_context = ssl.create_default_context()
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
-ssl_context.set_ciphers('DEFAULT:@SECLEVEL=1')  # 添加此行以允许较旧的密码套件
-
-
 class SerperClient:
     """Serper API的客户端，用于执行Google搜索。"""
 
@@ -117,7 +141,7 @@ class SerperClient:
         if not self.api_key:
             raise ValueError("未提供API密钥。设置SERPER_API_KEY环境变量。")
         
-        self.url = "https://api.bochaai.com/v1/web-search"
+        self.url = SEARCH_API_URL
         self.headers = {
             "Authorization": "Bearer " + self.api_key,
             "Content-Type": "application/json"
@@ -125,56 +149,121 @@ class SerperClient:
 
 
     async def search(self, wrapper: RunContextWrapper[TraceInfo], query: str,filter_for_relevance: bool = True, max_results: int = 50) -> List[WebpageSnippet]:
-        await log_message(f"<search>执行搜索：{query}</search>", wrapper.context)
-        print(f"执行搜索当前wrapper.context.trace_id：{wrapper.context.trace_id},[query]:{query}")
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            print(f"session.post开始:{self.url}")
-            try:
-                async with session.post(
-                    self.url,
-                    headers=self.headers,
-                    json={"query": query, "summary": True,"freshness":"oneYear","count":50}
-                ) as response:
-                    
-                    response.raise_for_status()
-                    results = await response.json()
-                    print(f"API返回结果结构: {json.dumps(list(results.keys()))}")  # 将dict_keys转换为list
-                    
-                    # 检查返回的数据结构
-                    if "data" not in results or "webPages" not in results.get("data", {}) or "value" not in results.get("data", {}).get("webPages", {}):
-                        print(f"API返回结构异常: {json.dumps(str(results)[:500])}")  # 使用str()避免序列化问题
-                        await log_message(f"<search-error>API返回结构异常</search-error>", wrapper.context)
-                        return []
-                    
-                    results_list = [
-                        WebpageSnippet(
-                            url=result.get('url', ''),
-                            title=result.get('name', ''),
-                            description=result.get('summary', '')
-                        )
-                        for result in results["data"]["webPages"]["value"]
-                    ]
-                    
-                    # 将WebpageSnippet对象转换为字典，然后序列化为JSON
-                    serialized_results = [result.model_dump() for result in results_list]
-                    print(f"results_list:{json.dumps(serialized_results, ensure_ascii=False , indent=2)}")
-                    await log_message(f"<search-result>：{json.dumps(serialized_results, ensure_ascii=False)}</search-result>", wrapper.context)      
-                    if not results_list:
-                        return []
-                        
-                    if not filter_for_relevance:
-                        return results_list[:max_results]
-                        
-                    return await self._filter_results(wrapper,results_list, query, max_results=max_results)
-            except Exception as e:
-                error_msg = f"搜索执行错误: {str(e)}"
-                print(error_msg)
-                await log_message(f"<search-error>{error_msg}</search-error>", wrapper.context)
-                return []
+        await log_message(f"执行搜索：{query}", wrapper.context, event="search")
+        log_local(f"执行搜索当前wrapper.context.trace_id：{wrapper.context.trace_id},[query]:{query}")
+        # 其他章节正在执行相同的搜索时，等待其结果而不是重复请求
+        key = (normalize_query(query), filter_for_relevance, max_results)
+        if search_flight.is_inflight(key):
+            await log_message(f"合并到进行中的相同搜索：{query}", wrapper.context, event="search")
+        results, events = await search_flight.do(
+            key, lambda: self._search(wrapper, query, filter_for_relevance, max_results)
+        )
+        # 搜索结果、过滤和错误事件发送到每个调用方自己的运行，而不只是发起执行的那一个
+        await events.emit(wrapper.context)
+        return list(results)
+
+    async def _search(
+        self, wrapper: RunContextWrapper[TraceInfo], query: str, filter_for_relevance: bool, max_results: int
+    ) -> Tuple[List[WebpageSnippet], SearchEvents]:
+        """
+        执行搜索并按需过滤，返回结果和过程中的日志事件。可能由多个调用方共享，因此不直接记录日志；
+        wrapper 只用作过滤代理调用的上下文（用量计入发起执行的运行）。
+        """
+        events = SearchEvents()
+        return await self._search_results(wrapper, events, query, filter_for_relevance, max_results), events
+
+    async def _search_results(
+        self, wrapper: RunContextWrapper[TraceInfo], events: SearchEvents, query: str, filter_for_relevance: bool, max_results: int
+    ) -> List[WebpageSnippet]:
+        filtered_variant = f"filtered:{SEARCH_FILTER_POLICY}:{max_results}"
+        try:
+            # 过滤后的结果命中缓存时，可同时省去搜索API请求和过滤代理的LLM调用
+            if filter_for_relevance and search_cache.cache_filtered:
+                cached = await search_cache.get(query, SEARCH_PARAMS, variant=filtered_variant)
+                if cached is not None:
+                    events.add(f"命中过滤结果缓存：{query}，{len(cached)}条结果")
+                    return [WebpageSnippet.model_validate(result) for result in cached]
+
+            cached = await search_cache.get(query, SEARCH_PARAMS)
+            if cached is not None:
+                results_list = [WebpageSnippet.model_validate(result) for result in cached]
+                events.add(f"命中搜索缓存：{query}，{len(results_list)}条结果")
+            else:
+                results_list = await self._request(events, query)
+                if results_list is None:
+                    return []
+                if results_list:
+                    await search_cache.put(query, SEARCH_PARAMS, [result.model_dump() for result in results_list])
 
-    async def _filter_results(self, wrapper: RunContextWrapper[TraceInfo], results: List[WebpageSnippet], query: str, max_results: int = 50) -> List[WebpageSnippet]:
+            if not results_list:
+                return []
+                
+            if not filter_for_relevance:
+                return results_list[:max_results]
+                
+            filtered = await self._filter_results(wrapper, events, results_list, query, max_results=max_results)
+            if search_cache.cache_filtered and filtered:
+                await search_cache.put(query, SEARCH_PARAMS, [result.model_dump() for result in filtered], variant=filtered_variant)
+            return filtered
+        except Exception as e:
+            error_msg = f"搜索执行错误: {str(e)}"
+            events.add(error_msg, level="error", event="search-error")
+            return []
+
+    async def _request(self, events: SearchEvents, query: str) -> Optional[List[WebpageSnippet]]:
+        """调用搜索API并解析结果，返回结构异常时返回None。"""
+        session = HTTPClient.get_session()
+        log_local(f"session.post开始:{self.url}")
+        async with session.post(
+            self.url,
+            headers=self.headers,
+            json={"query": query, "summary": True, **SEARCH_PARAMS}
+        ) as response:
+            
+            response.raise_for_status()
+            results = await response.json()
+            log_local(lambda: f"API返回结果结构: {json.dumps(list(results.keys()))}")
+            
+            # 检查返回的数据结构
+            if "data" not in results or "webPages" not in results.get("data", {}) or "value" not in results.get("data", {}).get("webPages", {}):
+                log_local(lambda: f"API返回结构异常: {json.dumps(str(results)[:500])}", level="warning")
+                events.add("API返回结构异常", level="warning", event="search-error")
+                return None
+            
+            results_list = [
+                WebpageSnippet(
+                    url=result.get('url', ''),
+                    title=result.get('name', ''),
+                    description=result.get('summary', '')
+                )
+                for result in results["data"]["webPages"]["value"]
+            ]
+            
+            # 完整的结果列表只在调试级别或有SSE订阅者时才序列化，前端把JSON数组渲染为结果列表
+            events.add(
+                lambda: json.dumps([result.model_dump() for result in results_list], ensure_ascii=False),
+                level="debug",
+            )
+            return results_list
+
+    async def _filter_results(
+        self, wrapper: RunContextWrapper[TraceInfo], events: SearchEvents, results: List[WebpageSnippet], query: str, max_results: int = 50
+    ) -> List[WebpageSnippet]:
         serialized_results = [result.model_dump() if isinstance(result, WebpageSnippet) else result for result in results]
+
+        # 先用本地排序器打分，置信度足够时直接采用其结果，省去一次LLM往返
+        outcome = local_ranker.rank(query, serialized_results)
+        if not should_use_llm(SEARCH_FILTER_POLICY, outcome):
+            events.add(
+                f"本地相关性排序保留 {len(outcome.kept)}/{len(results)} 条结果（置信度 {outcome.confidence:.2f}）",
+                event="search-filter",
+            )
+            return [results[index] for index in outcome.kept][:max_results]
+        if SEARCH_FILTER_POLICY == "auto" and outcome.kept:
+            # 置信度不足时只把保留的和拿不准的结果交给过滤代理，明确无关的结果不再发送
+            candidates = set(outcome.kept) | set(outcome.uncertain)
+            results = [result for index, result in enumerate(results) if index in candidates]
+            serialized_results = [serialized_results[index] for index in sorted(candidates)]
         
         user_prompt = f"""
         原始搜索查询: {query}
@@ -185,17 +274,51 @@ class SerperClient:
         返回{max_results}个或更少的搜索结果。
         """
         # 修改这一行，移除花括号
-        await log_message(f"<search-filter>\n过滤搜索结果：{user_prompt}\n</search-filter>", wrapper.context)
+        events.add(f"过滤搜索结果：{user_prompt}", level="debug", event="search-filter")
         try:
             result = await ResearchRunner.run(filter_agent, user_prompt, context=wrapper.context)
             output = result.final_output_as(SearchResults)
             return output.results_list
         except Exception as e:
-            print("过滤结果时出错:", str(e))
+            log_local(f"过滤结果时出错: {str(e)}", level="warning")
             return results[:max_results]
 
 
 
+async def refine_scrape_results(trace_info: TraceInfo, results: List[ScrapeResult], query: str) -> List[ScrapeResult]:
+    """
+    返回给代理之前整理抓取结果：
+    1. 丢弃与本次搜索中排名更靠前的页面或之前已返回的页面近重复的页面（只检查，不登记，见 dedup.py）
+    2. 按任务查询、知识差距和搜索词筛选段落，使正文不超过token预算（见 passages.py）
+    3. 登记实际返回的正文的指纹，返回正文与之前已返回的正文近重复的页面也丢弃
+    这些步骤都是纯CPU工作，放到线程中执行以免在事件循环上连续占用几十毫秒。
+    """
+    index = trace_info.page_index if trace_info.page_index is not None else SimHashIndex()
+    results, duplicates = await asyncio.to_thread(find_near_duplicates, results, index)
+
+    queries = [trace_info.task_query, trace_info.task_gap, query]
+    selected = await asyncio.to_thread(select_passages, results, queries)
+    before = sum(estimate_tokens(result.text) for result in results)
+    after = sum(estimate_tokens(result.text) for result in selected)
+    await log_message(
+        f"段落筛选：{len(results)} 个页面约 {before} 个token，保留 {len(selected)} 个页面约 {after} 个token",
+        trace_info,
+        event="scrape",
+    )
+
+    selected, repeated = await asyncio.to_thread(drop_near_duplicates, selected, index)
+    if duplicates or repeated:
+        # 筛选之前丢弃的页面返回多少正文无从得知，节省的token只按筛选后重复的正文计算
+        saved = sum(estimate_tokens(duplicate.text) for duplicate, _ in repeated)
+        index.counters["tokens_saved"] += saved
+        await log_message(
+            f"去重：丢弃 {len(duplicates) + len(repeated)} 个近重复页面，节省约 {saved} 个token",
+            trace_info,
+            event="scrape",
+        )
+    return selected
+
+
 async def scrape_urls(items: List[WebpageSnippet]) -> List[ScrapeResult]:
     """从提供的URL获取文本内容。
     
@@ -209,19 +332,18 @@ async def scrape_urls(items: List[WebpageSnippet]) -> List[ScrapeResult]:
             - description: 搜索结果的描述
             - text: 搜索结果的完整文本内容
     """
-    connector = aiohttp.TCPConnector(ssl=ssl_context)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        # 创建任务列表以进行并发执行
-        tasks = []
-        for item in items:
-            if item.url:  # 跳过空URL
-                tasks.append(fetch_and_process_url(session, item))
-                
-        # 并发执行所有任务并收集结果
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # 过滤掉错误并返回成功的结果
-        return [r for r in results if isinstance(r, ScrapeResult)]
+    session = HTTPClient.get_session()
+    # 创建任务列表以进行并发执行
+    tasks = []
+    for item in items:
+        if item.url:  # 跳过空URL
+            tasks.append(fetch_and_process_url(session, item))
+            
+    # 并发执行所有任务并收集结果
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # 过滤掉错误并返回成功的结果
+    return [r for r in results if isinstance(r, ScrapeResult)]
 
 
 async def fetch_and_process_url(session: aiohttp.ClientSession, item: WebpageSnippet) -> ScrapeResult:
@@ -236,28 +358,22 @@ async def fetch_and_process_url(session: aiohttp.ClientSession, item: WebpageSni
         )
 
     try:
-        async with session.get(item.url, timeout=8) as response:
-            if response.status == 200:
-                content = await response.text()
-                # 在线程池中运行html_to_text以避免阻塞
-                text_content = await asyncio.get_event_loop().run_in_executor(
-                    None, html_to_text, content
-                )
-                text_content = text_content[:CONTENT_LENGTH_LIMIT]  # 修剪内容以避免超过令牌限制
-                return ScrapeResult(
-                    url=item.url,
-                    title=item.title,
-                    description=item.description,
-                    text=text_content
-                )
-            else:
-                # 不抛出异常，而是返回带有错误消息的WebSearchResult
-                return ScrapeResult(
-                    url=item.url,
-                    title=item.title,
-                    description=item.description,
-                    text=f"获取内容时出错：HTTP {response.status}"
-                )
+        page = await fetch_page_content(session, item.url, timeout=8, extract_text=True)
+        text_content = page.text[:CONTENT_LENGTH_LIMIT]  # 修剪内容以避免超过令牌限制
+        return ScrapeResult(
+            url=item.url,
+            title=item.title,
+            description=item.description,
+            text=text_content
+        )
+    except PageFetchError as e:
+        # 不抛出异常，而是返回带有错误消息的WebSearchResult
+        return ScrapeResult(
+            url=item.url,
+            title=item.title,
+            description=item.description,
+            text=f"获取内容时出错：HTTP {e.status}"
+        )
     except Exception as e:
         # 不抛出异常，而是返回带有错误消息的WebSearchResult
         return ScrapeResult(
@@ -268,9 +384,85 @@ async def fetch_and_process_url(session: aiohttp.ClientSession, item: WebpageSni
         )
 
 
+class PageFetchError(Exception):
+    """页面请求返回非200状态码时抛出。"""
+    def __init__(self, url: str, status: int):
+        self.url = url
+        self.status = status
+        super().__init__(f"获取{url}时返回HTTP {status}")
+
+
+async def fetch_page_content(
+    session: aiohttp.ClientSession,
+    url: str,
+    timeout: float = 8,
+    extract_text: bool = False
+) -> CachedPage:
+    """
+    通过页面缓存获取URL的HTML内容。
+
+    新鲜的缓存条目直接返回；过期但带有ETag/Last-Modified的条目发起条件请求，304时复用缓存内容；
+    其余情况重新下载并写入缓存。extract_text为True时确保返回的页面包含正文提取结果（见 extraction.extract_page）。
+    并发的相同请求（规范化URL相同）只会执行一次。
+    """
+    return await fetch_flight.do(
+        (canonicalize_url(url), extract_text),
+        lambda: _fetch_page_content(session, url, timeout, extract_text)
+    )
+
+
+async def _fetch_page_content(
+    session: aiohttp.ClientSession,
+    url: str,
+    timeout: float,
+    extract_text: bool
+) -> CachedPage:
+    cached = await page_cache.get(url)
+    if cached is not None and cached.truncated and not extract_text:
+        # 流式抓取只保存了页面开头部分，需要完整HTML（例如提取链接）时重新下载
+        cached = None
+    if cached is not None and cached.is_fresh(page_cache.ttl):
+        page_cache.record_hit(cached)
+        page = cached
+    else:
+        headers = cached.conditional_headers() if cached is not None else {}
+        async with session.get(url, timeout=timeout, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                await page_cache.revalidated(cached)
+                page = cached
+            elif response.status == 200:
+                page_cache.record_miss()
+                page = CachedPage(
+                    url=url,
+                    html="",
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+                if extract_text and SCRAPE_STREAMING:
+                    # 边下载边提取正文，提取到足够的内容后停止下载
+                    streamed = await read_html_stream(response, CONTENT_LENGTH_LIMIT)
+                    page.html, page.text, page.truncated = streamed.html, streamed.text, streamed.truncated
+                else:
+                    check_html_response(response)
+                    page.html = await response.text()
+            else:
+                raise PageFetchError(url, response.status)
+
+    is_new = page is not cached
+    if extract_text and page.text is None:
+        # 在进程池中提取文本，避免阻塞事件循环
+        page.text = (await extraction_engine.extract(page.html)).text
+        is_new = True
+    if is_new:
+        await page_cache.put(page)
+    return page
+
+
 def html_to_text(html_content: str) -> str:
     """
     从HTML上下文中剥离所有不必要的元素，为文本提取/LLM处理做准备。
+
+    基于BeautifulSoup的参考实现；抓取流程使用提取规则相同、速度更快的 extraction.extract_page。
     """
     # 使用lxml解析HTML以提高速度
     soup = BeautifulSoup(html_content, 'lxml')
@@ -284,40 +476,46 @@ def html_to_text(html_content: str) -> str:
     return extracted_text
 
 
+# 不是HTML页面的文件扩展名
+RESTRICTED_EXTENSIONS = frozenset([
+    ".pdf", 
+    ".doc", 
+    ".docx", 
+    ".xls",
+    ".xlsx",
+    ".ppt",
+    ".pptx",
+    ".zip",
+    ".rar",
+    ".7z",
+    ".txt", 
+    ".js", 
+    ".xml", 
+    ".css", 
+    ".png", 
+    ".jpg", 
+    ".jpeg", 
+    ".gif", 
+    ".ico", 
+    ".svg", 
+    ".webp", 
+    ".mp3", 
+    ".mp4", 
+    ".avi", 
+    ".mov", 
+    ".wmv", 
+    ".flv", 
+    ".wma", 
+    ".wav", 
+    ".m4a", 
+    ".m4v", 
+    ".m4b", 
+    ".m4p", 
+    ".m4u"
+])
+
+
 def is_valid_url(url: str) -> bool:
-    """检查URL是否不包含受限文件扩展名。"""
-    if any(ext in url for ext in [
-        ".pdf", 
-        ".doc", 
-        ".xls",
-        ".ppt",
-        ".zip",
-        ".rar",
-        ".7z",
-        ".txt", 
-        ".js", 
-        ".xml", 
-        ".css", 
-        ".png", 
-        ".jpg", 
-        ".jpeg", 
-        ".gif", 
-        ".ico", 
-        ".svg", 
-        ".webp", 
-        ".mp3", 
-        ".mp4", 
-        ".avi", 
-        ".mov", 
-        ".wmv", 
-        ".flv", 
-        ".wma", 
-        ".wav", 
-        ".m4a", 
-        ".m4v", 
-        ".m4b", 
-        ".m4p", 
-        ".m4u"
-    ]):
-        return False
-    return True
\ No newline at end of file
+    """检查URL路径是否以受限文件扩展名结尾（只检查路径，不检查域名和查询参数，例如 nodejs.org 是有效的）。"""
+    path = urlparse(url).path.lower()
+    return os.path.splitext(path)[1] not in RESTRICTED_EXTENSIONS
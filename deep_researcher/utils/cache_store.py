@@ -0,0 +1,103 @@
+"""
+基于SQLite的持久化键值缓存存储，供页面缓存、搜索缓存等复用。
+
+每条记录保存值、字节大小、写入时间和最近访问时间；总大小超过上限时按最近最少使用（LRU）淘汰。
+所有方法都是同步的并且线程安全，调用方应通过 asyncio.to_thread 在事件循环之外执行。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+
+class SQLiteCacheStore:
+    """大小受限、按LRU淘汰的SQLite键值存储。"""
+
+    def __init__(self, path: str, max_bytes: int, table: str = "cache"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table}(accessed_at)")
+            self._conn = conn
+            self._total_bytes = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """返回 (值, 写入时间)，不存在时返回None。命中会刷新最近访问时间。"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return bytes(row[0]), row[1]
+
+    def put(self, key: str, value: bytes, stored_at: Optional[float] = None) -> None:
+        """写入或替换一条记录，必要时淘汰最久未访问的记录。"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            previous = conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), stored_at if stored_at is not None else now, now),
+            )
+            self._total_bytes += len(value) - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def touch(self, key: str, stored_at: float) -> None:
+        """更新记录的写入时间（例如条件请求确认内容未变化后）。"""
+        with self._lock:
+            self._connect().execute(
+                f"UPDATE {self.table} SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (stored_at, time.time(), key),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._total_bytes -= row[0]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            self._connect()
+            return self._total_bytes
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按最近访问时间从旧到新删除记录，直到总大小降到上限的90%以下。"""
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC"):
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", evicted)
@@ -0,0 +1,393 @@
+"""
+完整研究运行的录制/回放磁带（cassette）。
+
+没有在线服务时无法对 DeepResearcher.run 做性能分析或回归测试，而在线服务的延迟噪声又远大于我们自身的开销。
+录制模式把所有出站请求及其响应写入磁带文件，回放模式按请求内容确定性地返回录制的响应，可选地加入合成延迟：
+- LLM请求：llm_client 的 AsyncOpenAI 客户端使用 CassetteTransport（httpx传输层）；
+- 搜索API、页面抓取、网站爬取、站点地图：HTTPClient.get_session() 在磁带启用时返回 CassetteSession。
+
+磁带是JSON Lines文件，每行一次交互（类型、方法、URL、请求体、状态码、响应头、响应体和录制时的耗时），
+不保存请求头，因此不包含API密钥。请求按（类型、方法、URL、请求体）匹配，请求体中的日期（提示词里的"今天的日期"）
+不参与匹配；没有完全匹配时按录制顺序使用同一URL的下一条交互，同一请求重复出现时复用最后一次的响应。
+
+录制时应关闭页面缓存、搜索缓存和LLM响应缓存（PAGE_CACHE_ENABLED、SEARCH_CACHE_ENABLED、LLM_CACHE_MODE），
+否则命中缓存的请求不会进入磁带。
+
+通过环境变量 CASSETTE_MODE（off / record / replay）、CASSETTE_PATH、CASSETTE_LATENCY 启用，
+或在代码中使用 use_cassette()。CASSETTE_LATENCY 为秒数时每次回放固定等待该时间，为 "recorded" 时等待录制时的耗时。
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import importlib
+import re
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import aiohttp
+from dotenv import load_dotenv
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+from openai import DefaultAsyncHttpxClient
+
+# 传输层必须与 AsyncOpenAI 使用同一个httpx模块（部分openai版本依赖其分支包 httpx2），否则请求和响应类型不兼容
+httpx = importlib.import_module(DefaultAsyncHttpxClient.__mro__[1].__module__.split(".")[0])
+
+load_dotenv()
+
+CASSETTE_MODES = ("off", "record", "replay")
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.path.expanduser(os.getenv("CASSETTE_PATH", "cassettes/research.jsonl"))
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "0")
+CASSETTE_MAX_BODY_BYTES = int(os.getenv("CASSETTE_MAX_BODY_BYTES", str(4 * 1024 * 1024)))  # 单个响应最多录制的字节数
+
+# 解码后的响应体不再带有这些头，回放时保留它们会让客户端再次解压或按错误的长度读取
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+_DATE_PATTERN = re.compile(rb"\d{4}-\d{2}-\d{2}")
+
+
+class CassetteMissError(Exception):
+    """回放模式下磁带中没有与请求匹配的交互。"""
+
+
+def _body_bytes(body: Any) -> bytes:
+    if body is None:
+        return b""
+    if isinstance(body, bytes):
+        return body
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    return json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+
+class Cassette:
+    """一组录制的HTTP交互，负责录制、匹配和保存。"""
+
+    def __init__(self, path: str, mode: str = "replay", latency: Union[float, str] = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知的磁带模式：{mode}，可选：record、replay")
+        self.path = path
+        self.mode = mode
+        self.latency: Union[float, str] = latency if latency == "recorded" else float(latency)
+        self.interactions: List[Dict[str, Any]] = []
+        self._exact: Dict[str, Deque[int]] = defaultdict(deque)
+        self._loose: Dict[str, Deque[int]] = defaultdict(deque)
+        self._last: Dict[str, int] = {}
+        self._used: Set[int] = set()
+        self.counters: Dict[str, int] = {"recorded": 0, "replayed": 0, "loose_matches": 0, "misses": 0}
+        if mode == "replay":
+            self.load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @staticmethod
+    def make_keys(kind: str, method: str, url: str, body: bytes) -> Tuple[str, str]:
+        """返回（完全匹配键，同一URL的宽松匹配键）。"""
+        loose = f"{kind} {method.upper()} {url}"
+        digest = hashlib.sha256(_DATE_PATTERN.sub(b"<date>", body)).hexdigest()
+        return f"{loose} {digest}", loose
+
+    def _index(self, number: int) -> None:
+        interaction = self.interactions[number]
+        exact, loose = self.make_keys(
+            interaction["kind"], interaction["method"], interaction["url"], base64.b64decode(interaction["request"])
+        )
+        self._exact[exact].append(number)
+        self._loose[loose].append(number)
+
+    def load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            self.interactions = [json.loads(line) for line in f if line.strip()]
+        for number in range(len(self.interactions)):
+            self._index(number)
+
+    def save(self) -> None:
+        """把录制的交互原子地写入磁带文件。"""
+        if not self.recording:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for interaction in self.interactions:
+                f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+        os.replace(temporary, self.path)
+
+    def record(
+        self,
+        kind: str,
+        method: str,
+        url: str,
+        body: bytes,
+        status: int,
+        headers: Dict[str, str],
+        content: bytes,
+        elapsed: float,
+        error: Optional[str] = None,
+    ) -> None:
+        self.interactions.append({
+            "kind": kind,
+            "method": method.upper(),
+            "url": url,
+            "request": base64.b64encode(body).decode("ascii"),
+            "status": status,
+            "headers": {name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS},
+            "body": base64.b64encode(content).decode("ascii"),
+            "complete": len(content) < CASSETTE_MAX_BODY_BYTES,
+            "elapsed": round(elapsed, 4),
+            "error": error,
+        })
+        self.counters["recorded"] += 1
+
+    async def replay(self, kind: str, method: str, url: str, body: bytes) -> Dict[str, Any]:
+        """返回与请求匹配的交互，并按设置等待合成延迟。"""
+        exact, loose = self.make_keys(kind, method, url, body)
+        number = self._take(self._exact.get(exact))
+        if number is None:
+            number = self._take(self._loose.get(loose))
+            if number is not None:
+                self.counters["loose_matches"] += 1
+        if number is None:
+            number = self._last.get(exact)
+        if number is None:
+            self.counters["misses"] += 1
+            raise CassetteMissError(f"磁带 {self.path} 中没有匹配的交互：{method.upper()} {url}")
+        self._last[exact] = number
+        self.counters["replayed"] += 1
+        interaction = self.interactions[number]
+        delay = interaction["elapsed"] if self.latency == "recorded" else self.latency
+        if delay:
+            await asyncio.sleep(delay)
+        return interaction
+
+    def _take(self, queue: Optional[Deque[int]]) -> Optional[int]:
+        while queue:
+            number = queue.popleft()
+            if number not in self._used:
+                self._used.add(number)
+                return number
+        return None
+
+
+_active: Optional[Cassette] = None
+
+
+def active_cassette() -> Optional[Cassette]:
+    return _active
+
+
+def activate_from_env() -> Optional[Cassette]:
+    """按 CASSETTE_MODE 等环境变量启用磁带。"""
+    global _active
+    if CASSETTE_MODE not in CASSETTE_MODES:
+        raise ValueError(f"未知的磁带模式：{CASSETTE_MODE}，可选：{', '.join(CASSETTE_MODES)}")
+    if CASSETTE_MODE != "off" and _active is None:
+        _active = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY)
+    return _active
+
+
+def save_active_cassette() -> None:
+    if _active is not None:
+        _active.save()
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", latency: Union[float, str] = 0.0) -> Iterator[Cassette]:
+    """在代码块内录制或回放磁带，退出时保存录制的交互。"""
+    global _active
+    previous, _active = _active, Cassette(path, mode, latency)
+    try:
+        yield _active
+    finally:
+        _active.save()
+        _active = previous
+
+
+# ------- LLM请求（httpx） -------
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """AsyncOpenAI 使用的httpx传输层：磁带启用时录制或回放请求，否则直接转发。"""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        # 与 openai 默认客户端相同的连接上限，避免并发章节排队等待连接
+        self._transport = transport or httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        cassette = _active
+        if cassette is None:
+            return await self._transport.handle_async_request(request)
+        body = await request.aread()
+        url = str(request.url)
+        if not cassette.recording:
+            interaction = await cassette.replay("llm", request.method, url, body)
+            if interaction["error"]:
+                raise httpx.ConnectError(interaction["error"], request=request)
+            return httpx.Response(
+                interaction["status"],
+                headers=interaction["headers"],
+                content=base64.b64decode(interaction["body"]),
+                request=request,
+            )
+
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+            content = await response.aread()
+        except Exception as e:
+            cassette.record("llm", request.method, url, body, 0, {}, b"", time.perf_counter() - started, error=str(e))
+            raise
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in _DROPPED_HEADERS}
+        cassette.record("llm", request.method, url, body, response.status_code, headers, content, time.perf_counter() - started)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# ------- 搜索API和页面抓取（aiohttp） -------
+
+class RecordedContent:
+    """提供 aiohttp.StreamReader 中工具层用到的读取接口。"""
+
+    def __init__(self, data: bytes, complete: bool = True):
+        self._data = data
+        self._position = 0
+        self._complete = complete
+
+    def at_eof(self) -> bool:
+        return self._position >= len(self._data) and self._complete
+
+    async def read(self, n: int = -1) -> bytes:
+        end = len(self._data) if n < 0 else min(self._position + n, len(self._data))
+        chunk, self._position = self._data[self._position:end], end
+        return chunk
+
+    async def iter_chunked(self, n: int):
+        while self._position < len(self._data):
+            yield await self.read(n)
+
+    def iter_any(self):
+        return self.iter_chunked(64 * 1024)
+
+
+class RecordedResponse:
+    """回放的HTTP响应，接口与工具层使用的 aiohttp.ClientResponse 部分一致。"""
+
+    def __init__(self, method: str, url: str, interaction: Dict[str, Any]):
+        self.method = method
+        self.url = url
+        self.status: int = interaction["status"]
+        self.headers = CIMultiDictProxy(CIMultiDict(interaction["headers"]))
+        self._body = base64.b64decode(interaction["body"])
+        self.content = RecordedContent(self._body, interaction.get("complete", True))
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("Content-Type", "application/octet-stream").split(";")[0].strip().lower()
+
+    @property
+    def charset(self) -> Optional[str]:
+        match = re.search(r"charset=([\w-]+)", self.headers.get("Content-Type", ""), re.IGNORECASE)
+        return match.group(1) if match else None
+
+    @property
+    def content_length(self) -> Optional[int]:
+        return len(self._body)
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            # 与 aiohttp 一样带上请求信息，否则 str(错误) 会因 request_info 为 None 而出错
+            request_info = aiohttp.RequestInfo(URL(self.url), self.method, CIMultiDictProxy(CIMultiDict()), URL(self.url))
+            raise aiohttp.ClientResponseError(
+                request_info, (), status=self.status, message=f"HTTP {self.status}", headers=self.headers
+            )
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        return self._body.decode(encoding or self.charset or "utf-8", errors=errors)
+
+    async def json(self, **kwargs) -> Any:
+        return json.loads(self._body)
+
+    def release(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "RecordedResponse":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+
+class _RequestContext:
+    def __init__(self, coroutine):
+        self._coroutine = coroutine
+
+    def __await__(self):
+        return self._coroutine.__await__()
+
+    async def __aenter__(self) -> RecordedResponse:
+        return await self._coroutine
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+
+class CassetteSession:
+    """包装共享的 aiohttp 会话，在磁带启用时录制或回放 get/post 请求。"""
+
+    def __init__(self, session: aiohttp.ClientSession, cassette: Cassette):
+        self._session = session
+        self._cassette = cassette
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+    def get(self, url: str, **kwargs) -> _RequestContext:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _RequestContext:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> _RequestContext:
+        return _RequestContext(self._request(method, str(url), **kwargs))
+
+    async def _request(self, method: str, url: str, **kwargs) -> RecordedResponse:
+        body = _body_bytes(kwargs.get("json", kwargs.get("data")))
+        if not self._cassette.recording:
+            interaction = await self._cassette.replay("http", method, url, body)
+            if interaction["error"]:
+                raise aiohttp.ClientConnectionError(interaction["error"])
+            return RecordedResponse(method, url, interaction)
+
+        started = time.perf_counter()
+        try:
+            async with self._session.request(method, url, **kwargs) as response:
+                content = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    content.extend(chunk)
+                    if len(content) >= CASSETTE_MAX_BODY_BYTES:
+                        break
+                status, headers = response.status, dict(response.headers)
+        except Exception as e:
+            self._cassette.record("http", method, url, body, 0, {}, b"", time.perf_counter() - started, error=str(e) or type(e).__name__)
+            raise
+        self._cassette.record("http", method, url, body, status, headers, bytes(content), time.perf_counter() - started)
+        return RecordedResponse(method, url, self._cassette.interactions[-1])
+
+
+activate_from_env()
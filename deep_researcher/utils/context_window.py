@@ -0,0 +1,72 @@
+"""
+按token预算裁剪迭代研究的对话历史。
+
+每次迭代有三种详细程度的渲染：
+- full：思考、任务、行动和完整的发现；
+- summary：思考、任务、行动和来源，不含发现正文；
+- brief：只有任务（知识差距）和来源。
+
+最近的 keep_recent 次迭代尽量保持原样，较早的迭代按从旧到新的顺序逐级压缩，直到历史的token数不超过预算；
+所有迭代都压缩到 brief 仍然超出时，从最早的迭代开始整段省略。
+差距评估和工具选择不需要发现正文（思考中已有对发现的总结），传入 include_findings=False 后最多渲染到 summary。
+"""
+
+import os
+from typing import List, Protocol, Tuple
+
+FULL = "full"
+SUMMARY = "summary"
+BRIEF = "brief"
+DETAIL_LEVELS = (FULL, SUMMARY, BRIEF)  # 从详细到简略
+
+# 各代理提示中对话历史的token预算，0表示不限制
+THINKING_HISTORY_TOKENS = int(os.getenv("THINKING_HISTORY_TOKENS", "16000"))
+GAP_HISTORY_TOKENS = int(os.getenv("GAP_HISTORY_TOKENS", "6000"))
+SELECTOR_HISTORY_TOKENS = int(os.getenv("SELECTOR_HISTORY_TOKENS", "4000"))
+HISTORY_RECENT_ITERATIONS = int(os.getenv("HISTORY_RECENT_ITERATIONS", "1"))  # 优先保持原样的最近迭代数
+
+
+class RenderedHistory(Protocol):
+    history: list
+
+    def segment(self, iteration_num: int, detail: str) -> Tuple[str, int]: ...
+
+
+def window_history(
+    conversation: RenderedHistory,
+    token_budget: int,
+    keep_recent: int = HISTORY_RECENT_ITERATIONS,
+    include_findings: bool = True,
+) -> str:
+    """把对话历史渲染为不超过 token_budget 个token的字符串（token_budget<=0 时不限制）。"""
+    count = len(conversation.history)
+    if count == 0:
+        return ""
+    top = DETAIL_LEVELS.index(FULL if include_findings else SUMMARY)
+    levels: List[int] = [top] * count
+    tokens: List[int] = [conversation.segment(num, DETAIL_LEVELS[top])[1] for num in range(count)]
+    total = sum(tokens)
+
+    if token_budget > 0 and total > token_budget:
+        older = list(range(max(count - keep_recent, 0)))
+        recent = list(range(len(older), count - 1))  # 最新一次迭代最后才压缩
+        # 压缩顺序：较早的迭代逐级压缩，然后是最近的迭代，最后是最新的迭代
+        for group in (older, recent, [count - 1]):
+            for level in range(top + 1, len(DETAIL_LEVELS)):
+                for num in group:
+                    if total <= token_budget:
+                        break
+                    if levels[num] < level:
+                        new_tokens = conversation.segment(num, DETAIL_LEVELS[level])[1]
+                        total += new_tokens - tokens[num]
+                        levels[num], tokens[num] = level, new_tokens
+
+    # 仍然超出预算时从最早的迭代开始省略，至少保留最新一次迭代
+    first = 0
+    while token_budget > 0 and total > token_budget and first < count - 1:
+        total -= tokens[first]
+        first += 1
+
+    parts = [f"（为节省上下文，省略了前 {first} 次迭代）\n\n"] if first else []
+    parts.extend(conversation.segment(num, DETAIL_LEVELS[levels[num]])[0] for num in range(first, count))
+    return "".join(parts)
@@ -0,0 +1,220 @@
+"""
+执行日志的后台写入器。
+
+log_message 只把日志记录放入一个有界的内存队列（put_nowait，从不阻塞事件循环），
+由后台线程批量取出、格式化，写到标准输出和日志文件：
+- 按级别过滤（LOG_LEVEL），低于该级别的记录在入队之前就被丢弃；调用方可以传入返回消息的函数，被过滤时不会求值
+- 单条消息超过 LOG_MAX_MESSAGE_CHARS 时截断（只影响本地日志，SSE 仍发送完整消息）
+- 文件超过 LOG_MAX_BYTES 时轮转，保留 LOG_BACKUP_COUNT 个旧文件
+- LOG_FORMAT=json 时每行一个JSON对象，便于日志系统采集
+队列满时新的记录被丢弃并计入 stats()["dropped"]，而不是让调用方等待磁盘或终端。
+"""
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+# 日志文件路径，默认留空表示不写文件（只写标准输出）
+LOG_PATH = os.getenv("LOG_PATH", "")
+LOG_STDOUT = os.getenv("LOG_STDOUT", "true").lower() == "true"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text 或 json（JSON行）
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4000"))  # 0表示不截断
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))  # 0表示不轮转
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "3"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+
+# (级别, 事件类型, 消息, 时间戳, trace_id)
+LogRecord = Tuple[str, str, str, float, str]
+
+
+class LogWriter:
+    """有界队列加后台线程的日志写入器，见模块说明。"""
+
+    def __init__(
+        self,
+        path: Optional[str] = LOG_PATH,
+        level: str = LOG_LEVEL,
+        stdout: bool = LOG_STDOUT,
+        format: str = LOG_FORMAT,
+        max_message_chars: int = LOG_MAX_MESSAGE_CHARS,
+        max_bytes: int = LOG_MAX_BYTES,
+        backup_count: int = LOG_BACKUP_COUNT,
+        queue_size: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+    ):
+        if level not in LEVELS:
+            raise ValueError(f"未知的日志级别：{level}，可选：{', '.join(LEVELS)}")
+        self.path = os.path.abspath(os.path.expanduser(path)) if path else None
+        self.level = level
+        self.stdout = stdout
+        self.format = format
+        self.max_message_chars = max_message_chars
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = max(batch_size, 1)
+        self._queue: "queue.Queue[Optional[LogRecord]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._file = None
+        self.counters: Dict[str, int] = {
+            "written": 0,
+            "dropped": 0,
+            "truncated": 0,
+            "batches": 0,
+            "rotations": 0,
+            "errors": 0,
+        }
+
+    def enabled(self, level: str) -> bool:
+        return LEVELS.get(level, LEVELS["info"]) >= LEVELS[self.level]
+
+    def submit(self, level: str, event: str, message: str, timestamp: Optional[float] = None, trace_id: str = "") -> bool:
+        """非阻塞地排入一条记录；级别被过滤或队列已满时返回 False。"""
+        if not self.enabled(level):
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((level, event, message, timestamp or time.time(), trace_id))
+            return True
+        except queue.Full:
+            self.counters["dropped"] += 1
+            return False
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self._write([self.format_record(record) for record in records])
+            except Exception:
+                self.counters["errors"] += 1
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                self._close_file()
+                return
+
+    def format_record(self, record: LogRecord) -> str:
+        level, event, message, timestamp, trace_id = record
+        if self.max_message_chars and len(message) > self.max_message_chars:
+            self.counters["truncated"] += 1
+            message = f"{message[:self.max_message_chars]}…（截断，共 {len(message)} 个字符）"
+        if self.format == "json":
+            return json.dumps({
+                "timestamp": timestamp,
+                "level": level,
+                "event": event,
+                "trace_id": trace_id,
+                "message": message,
+            }, ensure_ascii=False)
+        readable = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        return f"【执行日志】【{readable}】【{event}】: {message}"
+
+    def _write(self, lines: List[str]) -> None:
+        text = "\n".join(lines) + "\n"
+        if self.stdout:
+            try:
+                sys.stdout.write(text)
+            except UnicodeEncodeError:
+                sys.stdout.write(text.encode("ascii", "backslashreplace").decode("ascii"))
+            sys.stdout.flush()
+        if self.path:
+            self._open_file()
+            # 一批记录可能跨越轮转边界：按行累积，写满 max_bytes 后轮转
+            chunk, size = [], self._file.tell()
+            for line in lines:
+                data = (line + "\n").encode("utf-8")
+                if self.max_bytes and size > 0 and size + len(data) > self.max_bytes:
+                    self._file.write(b"".join(chunk))
+                    self._rotate()
+                    chunk, size = [], 0
+                chunk.append(data)
+                size += len(data)
+            self._file.write(b"".join(chunk))
+            self._file.flush()
+        self.counters["written"] += len(lines)
+        self.counters["batches"] += 1
+
+    def _open_file(self) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "ab")
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self) -> None:
+        """把 path 依次改名为 path.1、path.2……，超出 backup_count 的旧文件被删除。"""
+        self._close_file()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.counters["rotations"] += 1
+        self._open_file()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已排入的记录全部写出，超时返回 False。"""
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写出剩余记录并停止后台线程，之后的 submit 会重新启动线程。"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "queued": self._queue.qsize(), "level": self.level}
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.close)
@@ -1,46 +1,68 @@
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict, Union
 from .message_parser import MessageParser
 from ..sse_manager import SSEManager
+from .simhash import SimHashIndex
+from .usage import UsageTracker
+from .log_writer import log_writer
 from dataclasses import dataclass
-import os
-from datetime import datetime  # 添加datetime导入
 @dataclass
 class TraceInfo:  # (1)!
     trace_id: str
+    task_query: Optional[str] = None  # 当前工具代理任务的查询，用于筛选抓取内容
+    task_gap: Optional[str] = None  # 当前工具代理任务要解决的知识差距
+    page_index: Optional[SimHashIndex] = None  # 本次研究已返回页面的指纹索引，用于跨迭代去重
+    usage: Optional[UsageTracker] = None  # 本次运行的token用量和预算，DeepResearcher的各章节共用
+    section: Optional[str] = None  # 当前章节标题，用于按章节统计用量
 
-async def log_message(message: str, trace_info:TraceInfo, additional_data: Optional[Dict] = None) -> None:
+async def log_message(
+    message: Union[str, Callable[[], str]],
+    trace_info: TraceInfo,
+    additional_data: Optional[Dict] = None,
+    level: str = "info",
+    event: Optional[str] = None,
+) -> None:
     """统一的消息日志记录函数
-    
+
+    消息交给后台写入器（见 log_writer.py）写到标准输出和日志文件，并放入运行的SSE通道缓冲区（见 sse_manager.py）；
+    本函数不做任何磁盘或终端IO。级别低于 LOG_LEVEL，且运行没有SSE通道或级别低于 SSE_LEVEL 时直接返回，
+    此时以函数形式传入的 message 不会被求值。
+
     Args:
-        message: 要记录的消息
-        trace_id: 客户端ID
+        message: 要记录的消息，或返回消息的函数（用于较大的负载，例如完整的搜索结果）
+        trace_info: 包含客户端ID（trace_id）的跟踪信息
         additional_data: 额外的数据字段
+        level: 日志级别 debug / info / warning / error
+        event: 事件类型（见 MessageParser.MESSAGE_TYPES），此时 message 就是事件内容，不再解析；
+            为 None 时按旧格式 "<类型>内容</类型>" 解析 message
     """
+    to_log = log_writer.enabled(level)
+    to_sse = SSEManager.accepts(trace_info.trace_id, level)
+    if not (to_log or to_sse):
+        return
     try:
-        
-        sse_data = MessageParser.format_sse_data(
-            message, 
-            trace_id=trace_info.trace_id,
-            additional_data=additional_data
-        )
-        # 从data中获取时间戳并转换为可读格式
-        timestamp = datetime.fromtimestamp(sse_data['data']['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-        log_output = f"【执行日志】【{timestamp}】【{sse_data['event']}】: {sse_data['data']['message']}"
-        print(log_output)
-        
-        # 同时写入测试日志文件
-        test_log_path = os.path.join(os.path.dirname(__file__), "../../tests/logs/test_execution3.log")
-        os.makedirs(os.path.dirname(test_log_path), exist_ok=True)
-        with open(test_log_path, "a", encoding="utf-8") as f:
-            f.write(f"{log_output}\n")
-            
-        await SSEManager.publish(
-            trace_info.trace_id, 
-            sse_data["event"], 
-            sse_data["data"]
-        )
-            
-    except UnicodeEncodeError:
-        print(repr(message))
+        if callable(message):
+            message = message()
+        if event is None:
+            sse_data = MessageParser.format_sse_data(
+                message, 
+                trace_id=trace_info.trace_id,
+                additional_data=additional_data
+            )
+        else:
+            sse_data = MessageParser.format_event(event, message, trace_id=trace_info.trace_id, additional_data=additional_data)
+        if to_log:
+            log_writer.submit(level, sse_data["event"], sse_data["data"]["message"], sse_data["data"]["timestamp"], trace_info.trace_id)
+        if to_sse:
+            await SSEManager.publish(
+                trace_info.trace_id, 
+                sse_data["event"], 
+                sse_data["data"]
+            )
     except Exception as e:
-        print(f"SSE发送失败: {str(e)}")
\ No newline at end of file
+        log_writer.submit("error", "error", f"SSE发送失败: {str(e)}", trace_id=trace_info.trace_id)
+
+
+def log_local(message: Union[str, Callable[[], str]], level: str = "debug", event: str = "debug") -> None:
+    """只写入本地日志、不发送SSE的调试输出，代替热路径上的 print；级别被过滤时 message 函数不会被求值。"""
+    if log_writer.enabled(level):
+        log_writer.submit(level, event, message() if callable(message) else message)
@@ -3,7 +3,12 @@ import time
 import re
 
 class MessageParser:
-    """消息解析器，用于处理结构化消息"""
+    """
+    消息解析器，用于处理结构化消息
+
+    log_message 通过 event 参数直接传入事件类型时使用 format_event，耗时与消息大小无关；
+    只有未指定事件类型的旧式字符串消息（"<类型>内容</类型>"）才用一个预编译的组合模式解析。
+    """
     
     # 定义所有支持的消息类型
     MESSAGE_TYPES = {
@@ -20,9 +25,13 @@ class MessageParser:
         "research-result": "<research-result>",
         "processing": "<processing>",
         "agent-select": "<agent-select>",
+        "token-usage": "<token-usage>",
+        "usage-summary": "<usage-summary>",
         
         # 评估差距相关
         "evaluate_gaps": "<evaluate_gaps>",
+        "reflection-stats": "<reflection-stats>",
+        "speculation-stats": "<speculation-stats>",
         
         # 报告生成相关
         "report-create": "<report-create>",
@@ -33,6 +42,7 @@ class MessageParser:
         "search": "<search>",
         "search-filter": "<search-filter>",
         "search-result": "<search-result>",
+        "search-error": "<search-error>",
         "scrape": "<scrape>",
         
         # 函数工具相关
@@ -42,6 +52,7 @@ class MessageParser:
         "research_runner_kwargs": "<research_runner_kwargs>",  # 添加 ResearchRunner 关键字参数类型
         
         # 其他类型
+        "info": "<info>",
         "error": "<error>",
         "task": "<task>",
         "action": "<action>",
@@ -49,17 +60,46 @@ class MessageParser:
         "thought": "<thought>"
     }
 
+    # 所有已知标签的组合模式：一次扫描找到消息中最先出现的已知标签及其闭合标签
+    _TAG_PATTERN = re.compile(
+        "<(" + "|".join(map(re.escape, MESSAGE_TYPES)) + ")>(.*?)</\\1>",
+        re.DOTALL,
+    )
+
     @classmethod
     def parse(cls, message: str) -> Tuple[str, str]:
-        """解析消息，返回消息类型和内容"""
-        for event_type, tag in cls.MESSAGE_TYPES.items():
-            pattern = f"{tag}(.*?)</{tag[1:]}"
-            match = re.search(pattern, message, re.DOTALL)
-            if match:
-                return event_type, match.group(1).strip()
+        """解析旧式字符串消息，返回消息类型和内容"""
+        match = cls._TAG_PATTERN.search(message)
+        if match:
+            return match.group(1), match.group(2).strip()
         
         return "info", message
 
+    @classmethod
+    def format_event(cls,
+                     event: str,
+                     message: str,
+                     trace_id: str = "default",
+                     additional_data: Optional[Dict] = None) -> Dict:
+        """
+        按给定的事件类型格式化SSE消息数据，不扫描消息内容
+
+        与 format_sse_data 不同，data 中不包含 raw_message（旧式消息带标签的原文），避免大消息发送两份。
+        """
+        data = {
+            "message": message,
+            "timestamp": time.time(),
+            "trace_id": trace_id
+        }
+        
+        if additional_data:
+            data.update(additional_data)
+            
+        return {
+            "event": event,
+            "data": data
+        }
+
     @classmethod
     def format_sse_data(cls, 
                        message: str, 
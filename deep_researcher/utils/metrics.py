@@ -0,0 +1,263 @@
+"""
+研究流程的计时跨度和Prometheus文本格式的指标。
+
+每个代理调用（ResearchRunner.run）、工具调用（web_search、crawl_website）和流程阶段（规划、章节研究循环、
+反思、工具选择与执行、写作）都包在一个跨度中，跨度记录：
+- 耗时
+- 排队等待：调用方排入任务到实际开始执行的时间（例如并发章节和工具任务的事件循环调度延迟）
+- 输入和输出的大小（字节）
+
+跨度和按主机统计的HTTP请求耗时汇总为直方图和计数器；缓存命中率等现有统计通过采集函数在抓取时读取。
+抓取的主机不可枚举，按主机的直方图最多保留 METRICS_MAX_HOSTS 个主机的序列，之后出现的主机计入 host="other"。
+server/app.py 的 /metrics 端点以Prometheus文本格式（0.0.4）输出 metrics.render() 的结果。
+不依赖 prometheus_client，计数都在进程内存中，进程重启后清零。
+"""
+
+import bisect
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+METRICS_MAX_HOSTS = int(os.getenv("METRICS_MAX_HOSTS", "50"))  # 按主机统计的直方图最多单独保留的主机数
+OVERFLOW_LABEL = "other"
+
+# 采集函数返回的一组样本：(指标名, 说明, 类型, [(标签, 值)])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """只增不减的计数器。"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def clear(self) -> None:
+        self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    按固定桶统计分布的直方图（累积桶计数、总和与样本数）。
+    max_series 限制标签组合的数量，超出后新的标签组合都计入各标签为 "other" 的序列。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        max_series: Optional[int] = None,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.max_series = max_series
+        # 每个标签组合：[各桶（非累积）计数..., +Inf桶计数], 总和
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None and self.max_series is not None and len(self._series) >= self.max_series:
+            key = (OVERFLOW_LABEL,) * len(self.labelnames)
+            series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return sum(series[0]) if series else 0
+
+    def sum(self, **labels: str) -> float:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series[1][0] if series else 0.0
+
+    def clear(self) -> None:
+        self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程级指标注册表：计数器、直方图，以及在每次输出时调用的采集函数。"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        max_series: Optional[int] = None,
+    ) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labelnames, buckets, max_series))
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """注册一个返回 (指标名, 说明, 类型, 样本列表) 的函数，用于输出已有模块自己维护的统计。"""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        """清零所有计数器和直方图（保留注册关系），用于测试。"""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"采集指标出错: {str(e)}")
+                continue
+            for name, help, metric_type, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+SPAN_SECONDS = metrics.histogram(
+    "deep_researcher_span_seconds", "代理调用、工具调用和流程阶段的耗时（秒）", ("kind", "name"))
+SPAN_QUEUE_SECONDS = metrics.histogram(
+    "deep_researcher_span_queue_seconds", "跨度从排入到开始执行的等待时间（秒）", ("kind", "name"))
+SPAN_PAYLOAD_BYTES = metrics.histogram(
+    "deep_researcher_span_payload_bytes", "跨度的输入和输出大小（字节）", ("kind", "name", "direction"), buckets=SIZE_BUCKETS)
+SPAN_ERRORS = metrics.counter(
+    "deep_researcher_span_errors_total", "以异常结束的跨度数", ("kind", "name"))
+FETCH_SECONDS = metrics.histogram(
+    "deep_researcher_fetch_seconds", "出站HTTP请求到收到响应头的耗时（秒），按主机统计", ("host",),
+    max_series=METRICS_MAX_HOSTS)
+FETCH_QUEUE_SECONDS = metrics.histogram(
+    "deep_researcher_fetch_queue_seconds", "出站HTTP请求等待连接池空闲连接的时间（秒），按主机统计", ("host",),
+    max_series=METRICS_MAX_HOSTS)
+
+
+def payload_size(value: Any) -> int:
+    """估算输入或输出的大小（UTF-8字节数）。"""
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json().encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(value).encode("utf-8"))
+
+
+@dataclass
+class Span:
+    kind: str  # agent / tool / phase
+    name: str
+    queue_wait: float = 0.0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    duration: float = 0.0
+    error: bool = False
+
+    def set_output(self, output: Any) -> None:
+        self.output_bytes = payload_size(output)
+
+
+@asynccontextmanager
+async def span(kind: str, name: str, input: Any = None, queued_at: Optional[float] = None) -> AsyncIterator[Span]:
+    """
+    记录一个计时跨度。queued_at 是调用方排入该工作的 time.perf_counter() 时刻，用于计算排队等待；
+    调用方通过 Span.set_output 记录输出大小。
+    """
+    started = time.perf_counter()
+    current = Span(
+        kind=kind,
+        name=name,
+        queue_wait=max(started - queued_at, 0.0) if queued_at is not None else 0.0,
+        input_bytes=payload_size(input),
+    )
+    try:
+        yield current
+    except Exception:
+        current.error = True
+        SPAN_ERRORS.inc(kind=kind, name=name)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        SPAN_SECONDS.observe(current.duration, kind=kind, name=name)
+        if queued_at is not None:
+            SPAN_QUEUE_SECONDS.observe(current.queue_wait, kind=kind, name=name)
+        SPAN_PAYLOAD_BYTES.observe(current.input_bytes, kind=kind, name=name, direction="input")
+        SPAN_PAYLOAD_BYTES.observe(current.output_bytes, kind=kind, name=name, direction="output")
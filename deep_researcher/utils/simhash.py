@@ -0,0 +1,124 @@
+"""
+SimHash 指纹和近重复检索索引。
+
+每个文档由其词项3-gram（shingle）计算一个64位 SimHash 指纹，内容几乎相同的文档（转载、镜像站、分页变体）
+指纹之间的汉明距离很小。指纹紧凑地保存在 array('Q') 中；索引把指纹切分为 SIMHASH_BANDS 段，
+按每一段的值分桶，查找时只比较至少有一段完全相同的候选，耗时与文档数量成线性关系，而不是两两比较。
+只要 max_distance < SIMHASH_BANDS，距离不超过 max_distance 的指纹至少有一段相同（抽屉原理），不会漏检。
+"""
+
+import threading
+from array import array
+from hashlib import blake2b
+from typing import Dict, List, Optional
+
+from .terms import tokenize_terms
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8
+SIMHASH_MAX_DISTANCE = 6  # 转载页加上头尾说明后通常在6位以内，无关页面相距十几位以上
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 16  # 少于此数量的文本（例如错误提示）不计算指纹
+_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+_DIGEST_SIZE = SIMHASH_BITS // 8
+# 第i张表把字节值映射为其第i位（0或1），用于逐位计数
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    计算文本的64位SimHash指纹，文本过短时返回None。
+
+    shingle的哈希值取8字节的 blake2b 摘要，不受 PYTHONHASHSEED 影响，指纹在不同进程和不同运行之间一致。
+    按位投票不逐个shingle循环：所有摘要拼接成字节后，对每个字节位置的字节序列，
+    用查找表把每一位映射为0/1后在C中计数，Python层的工作量与shingle数量无关。
+    """
+    terms = tokenize_terms(text)
+    if len(terms) < SHINGLE_SIZE + MIN_SHINGLES - 1:
+        return None
+    shingles = zip(*(terms[offset:] for offset in range(SHINGLE_SIZE)))
+    data = b"".join(_shingle_digest(shingle) for shingle in shingles)
+    half = len(data) / _DIGEST_SIZE / 2
+    signature = 0
+    for position in range(_DIGEST_SIZE):
+        shift = 8 * (_DIGEST_SIZE - 1 - position)  # 摘要按大端解释
+        column = data[position::_DIGEST_SIZE]
+        for bit, table in enumerate(_BIT_TABLES):
+            if column.translate(table).count(1) > half:
+                signature |= 1 << (shift + bit)
+    return signature
+
+
+def _shingle_digest(shingle) -> bytes:
+    return blake2b("\x1f".join(shingle).encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+
+class SimHashIndex:
+    """按段分桶的SimHash索引，可在多个线程中使用。"""
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.signatures = array("Q")
+        self.keys: List[str] = []
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(SIMHASH_BANDS)]
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "checked": 0,
+            "duplicates": 0,
+            "tokens_saved": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def find(self, signature: int) -> Optional[str]:
+        """返回与指纹距离不超过max_distance的已有文档的键，没有时返回None。"""
+        with self._lock:
+            return self._find(signature)
+
+    def add_if_new(self, signature: int, key: str) -> Optional[str]:
+        """查找近重复文档；找到时返回其键，否则登记该指纹并返回None。"""
+        with self._lock:
+            self.counters["checked"] += 1
+            duplicate = self._find(signature)
+            if duplicate is not None:
+                self.counters["duplicates"] += 1
+                return duplicate
+            self._add(signature, key)
+            return None
+
+    def copy(self) -> "SimHashIndex":
+        """当前指纹的独立副本（计数器清零），用于在不影响本索引的情况下检查一批页面。"""
+        clone = SimHashIndex(self.max_distance)
+        with self._lock:
+            clone.signatures = array("Q", self.signatures)
+            clone.keys = list(self.keys)
+            clone._buckets = [{value: list(indexes) for value, indexes in bucket.items()} for bucket in self._buckets]
+        return clone
+
+    def merge(self, other: "SimHashIndex") -> int:
+        """把另一个索引中本索引还没有近重复项的指纹登记进来，返回新登记的数量；不计入 checked/duplicates。"""
+        with other._lock:
+            entries = list(zip(other.signatures, other.keys))
+        added = 0
+        with self._lock:
+            for signature, key in entries:
+                if self._find(signature) is None:
+                    self._add(signature, key)
+                    added += 1
+        return added
+
+    def _add(self, signature: int, key: str) -> None:
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        self.keys.append(key)
+        for band, bucket in enumerate(self._buckets):
+            bucket.setdefault((signature >> (band * _BAND_BITS)) & _BAND_MASK, []).append(index)
+
+    def _find(self, signature: int) -> Optional[str]:
+        for band, bucket in enumerate(self._buckets):
+            for index in bucket.get((signature >> (band * _BAND_BITS)) & _BAND_MASK, ()):
+                if (self.signatures[index] ^ signature).bit_count() <= self.max_distance:
+                    return self.keys[index]
+        return None
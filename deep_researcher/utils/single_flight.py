@@ -0,0 +1,57 @@
+"""
+单飞（single-flight）请求合并。
+
+DeepResearcher 会并发运行所有章节的研究循环，同一主题的章节经常在同一时刻搜索相同的词、抓取相同的URL。
+SingleFlight 维护进程内的进行中请求表：对同一键的并发调用只执行一次，其余调用方等待同一个共享结果。
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """按键合并并发的相同异步调用，并统计被合并的调用次数。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.counters: Dict[str, int] = {
+            "calls": 0,
+            "executions": 0,
+            "deduplicated": 0,
+        }
+
+    def is_inflight(self, key: Hashable) -> bool:
+        task = self._inflight.get(key)
+        return task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop()
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        如果同一键已有进行中的调用，则等待其结果；否则调用factory()并登记为进行中。
+
+        共享任务通过 asyncio.shield 等待，因此某个调用方被取消不会影响其他等待者。
+        """
+        self.counters["calls"] += 1
+        if self.is_inflight(key):
+            self.counters["deduplicated"] += 1
+            task = self._inflight[key]
+        else:
+            self.counters["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self.counters)
+        stats["inflight"] = len(self._inflight)
+        return stats
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 所有等待者都已取消时避免"exception was never retrieved"警告
+            task.exception()
@@ -0,0 +1,158 @@
+"""
+投机执行知识差距的研究任务。
+
+迭代研究的各阶段依次进行（思考、评估、选择、执行），每次LLM调用期间事件循环基本空闲。
+差距评估通常返回多个差距，本次迭代没有处理的差距很可能成为下一次迭代的差距。
+SpeculativeScheduler 提前为这些差距启动工具选择和执行，与本次迭代的工具执行和下一次的反思同时进行：
+- 之后的评估选中了相似的差距时，直接使用（或继续等待）投机任务的结果；
+- 新的评估不再包含该差距时，未完成的任务被取消，已完成的结果作为缓存证据保留，之后的迭代仍可使用。
+
+差距文本每次评估都会改写，因此按词项集合的 Jaccard 相似度匹配，而不是要求完全相同。
+只为有把握会被选中的差距投机：差距的置信度是相似差距在连续几次评估中出现的次数，
+低于 SPECULATION_MIN_CONFIDENCE 的差距（只出现过一次、很可能在下一次评估中被改掉）不启动投机任务。
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Generic, Iterable, Optional, Set, TypeVar
+
+from dotenv import load_dotenv
+
+from .terms import tokenize_terms
+
+load_dotenv()
+
+T = TypeVar("T")
+
+SPECULATION_MATCH_THRESHOLD = 0.6
+# 差距至少在连续几次评估中出现才投机执行，1表示评估返回的后续差距都投机执行
+SPECULATION_MIN_CONFIDENCE = int(os.getenv("SPECULATION_MIN_CONFIDENCE", "2"))
+
+
+def gap_similarity(first: str, second: str) -> float:
+    """两个差距描述的词项集合的 Jaccard 相似度。"""
+    first_terms: Set[str] = set(tokenize_terms(first))
+    second_terms: Set[str] = set(tokenize_terms(second))
+    if not first_terms or not second_terms:
+        return float(first.strip() == second.strip())
+    return len(first_terms & second_terms) / len(first_terms | second_terms)
+
+
+class _Speculation(Generic[T]):
+    __slots__ = ("task", "started", "finished")
+
+    def __init__(self, task: "asyncio.Task[T]"):
+        self.task = task
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+
+class SpeculativeScheduler(Generic[T]):
+    """按差距管理投机任务，并统计命中次数和与其他阶段重叠的时间。"""
+
+    def __init__(self, threshold: float = SPECULATION_MATCH_THRESHOLD, min_confidence: int = SPECULATION_MIN_CONFIDENCE):
+        self.threshold = threshold
+        self.min_confidence = min_confidence
+        self._speculations: Dict[str, _Speculation[T]] = {}
+        self._streaks: Dict[str, int] = {}  # 最近一次评估的差距 -> 连续出现的次数
+        self.counters: Dict[str, float] = {
+            "started": 0,
+            "low_confidence": 0,
+            "hits": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "overlap_seconds": 0.0,  # 投机任务在被需要之前已经完成的工作时间
+            "wait_seconds": 0.0,  # 命中后仍需等待投机任务完成的时间
+        }
+
+    def _find(self, gap: str) -> Optional[str]:
+        best_gap, best_score = None, self.threshold
+        for speculated_gap in self._speculations:
+            score = gap_similarity(gap, speculated_gap)
+            if score >= best_score:
+                best_gap, best_score = speculated_gap, score
+        return best_gap
+
+    def observe(self, gaps: Iterable[str]) -> None:
+        """记录一次评估返回的差距，与上一次评估中的相似差距连续出现的次数作为其置信度。"""
+        streaks = {}
+        for gap in gaps:
+            previous = max(
+                (count for seen, count in self._streaks.items() if gap_similarity(gap, seen) >= self.threshold), default=0
+            )
+            streaks[gap] = previous + 1
+        self._streaks = streaks
+
+    def confident(self, gap: str) -> bool:
+        """差距是否在足够多次连续的评估中出现，值得投机执行；不够时计入 low_confidence。"""
+        if self._streaks.get(gap, 0) >= self.min_confidence:
+            return True
+        self.counters["low_confidence"] += 1
+        return False
+
+    def is_speculated(self, gap: str) -> bool:
+        return self._find(gap) is not None
+
+    def start(self, gap: str, factory: Callable[[], Awaitable[T]]) -> bool:
+        """为差距启动投机任务；已有相似差距的任务时不重复启动。"""
+        if self.is_speculated(gap):
+            return False
+        speculation = _Speculation(asyncio.ensure_future(factory()))
+        speculation.task.add_done_callback(lambda task, speculation=speculation: self._on_done(speculation, task))
+        self._speculations[gap] = speculation
+        self.counters["started"] += 1
+        return True
+
+    def _on_done(self, speculation: _Speculation[T], task: "asyncio.Task[T]") -> None:
+        speculation.finished = time.perf_counter()
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["failed"] += 1
+
+    async def take(self, gap: str) -> Optional[T]:
+        """
+        取出与差距匹配的投机结果（必要时等待其完成）；没有匹配的任务或任务失败时返回None，由调用方正常执行。
+        """
+        speculated_gap = self._find(gap)
+        if speculated_gap is None:
+            return None
+        speculation = self._speculations.pop(speculated_gap)
+        needed = time.perf_counter()
+        try:
+            result = await asyncio.shield(speculation.task)
+        except asyncio.CancelledError:
+            if not speculation.task.cancelled():
+                raise
+            return None
+        except Exception:
+            return None
+        finished = speculation.finished or time.perf_counter()
+        self.counters["hits"] += 1
+        self.counters["overlap_seconds"] += min(needed, finished) - speculation.started
+        self.counters["wait_seconds"] += max(finished - needed, 0.0)
+        return result
+
+    def retain(self, gaps: Iterable[str]) -> None:
+        """新的评估结果到达后，取消与其中任何差距都不相似的未完成任务，已完成的结果保留为缓存证据。"""
+        gaps = list(gaps)
+        for speculated_gap, speculation in list(self._speculations.items()):
+            if speculation.task.done():
+                continue
+            if not any(gap_similarity(gap, speculated_gap) >= self.threshold for gap in gaps):
+                speculation.task.cancel()
+                del self._speculations[speculated_gap]
+                self.counters["cancelled"] += 1
+
+    def cancel_all(self) -> None:
+        """研究结束时取消所有未完成的投机任务。"""
+        for speculated_gap, speculation in list(self._speculations.items()):
+            if not speculation.task.done():
+                speculation.task.cancel()
+                del self._speculations[speculated_gap]
+                self.counters["cancelled"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        stats = dict(self.counters)
+        stats["pending"] = sum(not speculation.task.done() for speculation in self._speculations.values())
+        stats["evidence"] = len(self._speculations) - stats["pending"]
+        return stats
@@ -0,0 +1,32 @@
+"""
+轻量的分词工具，供URL排序、相关性打分等不依赖模型的文本匹配使用。
+
+- 拉丁字母和数字按单词切分并转为小写（NFKC规范化后，全角字符折叠为半角）
+- 连续的中日韩字符切分为相邻的双字（单个字符时保留单字），不需要词典即可对中文做粗粒度匹配
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_TERM_PATTERN = re.compile(r"([0-9a-z]+)|([぀-ヿ㐀-䶿一-鿿가-힯]+)")
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+
+
+def is_cjk(text: str) -> bool:
+    """文本的首字符是否是中日韩字符。"""
+    return bool(text) and _CJK_PATTERN.match(text) is not None
+
+
+def tokenize_terms(text: str) -> List[str]:
+    """将文本切分为用于匹配的词项列表（保留顺序和重复）。"""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    text = text.casefold()
+    terms: List[str] = []
+    for word, run in _TERM_PATTERN.findall(text):
+        if word or len(run) == 1:
+            terms.append(word or run)
+        else:
+            terms.extend(map(str.__add__, run, run[1:]))
+    return terms
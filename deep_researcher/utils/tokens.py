@@ -0,0 +1,21 @@
+"""
+不依赖分词器的token数估算。
+
+按字符数截断对中英文并不公平：同样10000个字符，中文约合10000个token，英文只有约2500个。
+estimate_tokens 按常见BPE分词器的经验比例估算：每个中日韩字符约1个token，其余文本约4个字符1个token。
+中日韩字符在UTF-8中占3个字节，因此由UTF-8编码长度与字符数之差即可得到其数量，无需逐字符匹配。
+"""
+
+import math
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数。"""
+    if not text:
+        return 0
+    if text.isascii():
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    wide = (len(text.encode("utf-8", errors="replace")) - len(text)) // 2
+    return wide + math.ceil((len(text) - wide) / CHARS_PER_TOKEN)
@@ -0,0 +1,139 @@
+"""
+研究运行的token用量和费用统计，以及可选的token/费用预算。
+
+ResearchRunner.run 把每次代理调用的 RunResult 中各次模型响应的 usage 记到上下文（TraceInfo）携带的 UsageTracker 上，
+按代理、按章节和按模型分别汇总，整个运行另有总计。DeepResearcher 的各章节共用同一个 UsageTracker，因此预算是整次运行共享的。
+
+费用按 MODEL_PRICES 中每百万输入/输出token的价格（美元）计算，例如 "gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6"，
+未配置价格的模型费用记为0。TOKEN_BUDGET 和 COST_BUDGET 为0表示不限制；
+IterativeResearcher 在每次迭代开始前检查预算，超出后不再开始新的迭代，但仍会写出章节和最终报告，
+因此实际用量可能超出预算一次迭代和写作步骤的用量。
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .metrics import metrics
+
+load_dotenv()
+
+TOKEN_BUDGET = int(os.getenv("TOKEN_BUDGET", "0"))  # 每次运行的token预算（输入+输出），0表示不限制
+COST_BUDGET = float(os.getenv("COST_BUDGET", "0"))  # 每次运行的费用预算（美元），0表示不限制
+MODEL_PRICES = os.getenv("MODEL_PRICES", "")
+
+LLM_TOKENS = metrics.counter("deep_researcher_llm_tokens_total", "代理调用消耗的token数", ("agent", "direction"))
+LLM_COST = metrics.counter("deep_researcher_llm_cost_usd_total", "代理调用按 MODEL_PRICES 估算的费用（美元）", ("agent",))
+
+
+def parse_model_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    """解析 "modelA=输入价格/输出价格,modelB=..." 形式的每百万token价格。"""
+    prices = {}
+    for item in spec.split(","):
+        if "=" not in item or "/" not in item:
+            continue
+        name, price = (part.strip() for part in item.rsplit("=", 1))
+        input_price, output_price = (part.strip() for part in price.split("/", 1))
+        try:
+            prices[name] = (float(input_price), float(output_price))
+        except ValueError:
+            print(f"忽略无效的模型价格：{item}")
+    return prices
+
+
+def model_name(agent: Any) -> str:
+    """代理使用的模型名称（模型可以是字符串或 OpenAI*Model 实例）。"""
+    model = getattr(agent, "model", None)
+    if model is None or isinstance(model, str):
+        return model or ""
+    return str(getattr(model, "model", type(model).__name__))
+
+
+@dataclass
+class UsageTotals:
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, other: "UsageTotals") -> None:
+        self.requests += other.requests
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cost += other.cost
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": round(self.cost, 6),
+        }
+
+
+@dataclass
+class UsageTracker:
+    """一次研究运行的token用量统计和预算。"""
+    token_budget: int = TOKEN_BUDGET
+    cost_budget: float = COST_BUDGET
+    prices: Dict[str, Tuple[float, float]] = field(default_factory=lambda: parse_model_prices(MODEL_PRICES))
+    total: UsageTotals = field(default_factory=UsageTotals)
+    by_agent: Dict[str, UsageTotals] = field(default_factory=dict)
+    by_section: Dict[str, UsageTotals] = field(default_factory=dict)
+    by_model: Dict[str, UsageTotals] = field(default_factory=dict)
+
+    def record(self, agent_name: str, model: str, result: Any, section: Optional[str] = None) -> UsageTotals:
+        """累加一次代理调用（RunResult）中所有模型响应的用量，返回这次调用的用量。"""
+        call = UsageTotals()
+        for response in getattr(result, "raw_responses", None) or []:
+            call.requests += response.usage.requests or 0
+            call.input_tokens += response.usage.input_tokens or 0
+            call.output_tokens += response.usage.output_tokens or 0
+        input_price, output_price = self.prices.get(model, (0.0, 0.0))
+        call.cost = (call.input_tokens * input_price + call.output_tokens * output_price) / 1_000_000
+
+        self.total.add(call)
+        self.by_agent.setdefault(agent_name, UsageTotals()).add(call)
+        self.by_model.setdefault(model, UsageTotals()).add(call)
+        if section is not None:
+            self.by_section.setdefault(section, UsageTotals()).add(call)
+
+        LLM_TOKENS.inc(call.input_tokens, agent=agent_name, direction="input")
+        LLM_TOKENS.inc(call.output_tokens, agent=agent_name, direction="output")
+        LLM_COST.inc(call.cost, agent=agent_name)
+        return call
+
+    def section(self, name: Optional[str]) -> UsageTotals:
+        """某个章节的累计用量；name 为 None 时返回整个运行的总计。"""
+        if name is None:
+            return self.total
+        return self.by_section.get(name, UsageTotals())
+
+    def exceeded(self) -> Optional[str]:
+        """超出预算时返回原因描述，否则返回 None。"""
+        if self.token_budget and self.total.total_tokens >= self.token_budget:
+            return f"已用 {self.total.total_tokens} tokens，达到token预算（{self.token_budget}）"
+        if self.cost_budget and self.total.cost >= self.cost_budget:
+            return f"已用 ${self.total.cost:.4f}，达到费用预算（${self.cost_budget}）"
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.as_dict(),
+            "by_agent": {name: totals.as_dict() for name, totals in self.by_agent.items()},
+            "by_section": {name: totals.as_dict() for name, totals in self.by_section.items()},
+            "by_model": {name: totals.as_dict() for name, totals in self.by_model.items()},
+            "token_budget": self.token_budget,
+            "cost_budget": self.cost_budget,
+        }
+
+
+def format_usage(totals: UsageTotals) -> str:
+    return f"{totals.total_tokens} tokens（输入 {totals.input_tokens}，输出 {totals.output_tokens}），${totals.cost:.4f}"
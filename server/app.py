@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, PlainTextResponse, Response
 import os
 import traceback
 import uuid
@@ -7,7 +7,7 @@ import asyncio
 import sys
 import subprocess
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from deep_researcher.utils.logging import TraceInfo  # 添加 TraceInfo 导入
+from deep_researcher.utils.logging import TraceInfo, log_message  # 添加 TraceInfo 导入
 # 检查并安装缺失的依赖
 try:
     import agents
@@ -17,12 +17,24 @@ except ModuleNotFoundError:
     import agents
 
 from deep_researcher import DeepResearcher
-from deep_researcher.sse_manager import SSEManager
+from deep_researcher.sse_manager import HEARTBEAT, SSEManager
+from deep_researcher.tools import close_tool_resources
+from deep_researcher.utils.metrics import metrics
+from deep_researcher.utils.usage import COST_BUDGET, TOKEN_BUDGET
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import json
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：退出时关闭共享的HTTP连接池等工具层资源"""
+    yield
+    await close_tool_resources()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -34,6 +46,22 @@ class ResearchRequest(BaseModel):
     query: str
     max_iterations: int = 3
     max_time_minutes: int = 10
+    token_budget: int = TOKEN_BUDGET  # 整个运行的token预算，0表示不限制
+    cost_budget: float = COST_BUDGET  # 整个运行的费用预算（美元），0表示不限制
+
+# 事件循环只持有任务的弱引用，运行中的研究任务保存在这里
+running_tasks = set()
+
+
+async def run_research(researcher: DeepResearcher, query: str, trace_info: TraceInfo):
+    """执行研究并在结束（包括出错）后关闭SSE通道"""
+    try:
+        await researcher.run(query=query, trace_info=trace_info)
+    except Exception as e:
+        traceback.print_exc()
+        await log_message(f"研究运行失败: {str(e)}", trace_info, level="error", event="error")
+    finally:
+        await SSEManager.close(trace_info.trace_id)
 
 @app.post("/api/research")
 async def start_research(request: ResearchRequest):
@@ -42,11 +70,17 @@ async def start_research(request: ResearchRequest):
     researcher = DeepResearcher(
         max_iterations=request.max_iterations,
         max_time_minutes=request.max_time_minutes,
+        token_budget=request.token_budget,
+        cost_budget=request.cost_budget,
         verbose=True,
         tracing=False
     )
     trace_info= TraceInfo(trace_id=client_id)
-    asyncio.create_task(researcher.run(query=request.query,trace_info=trace_info))
+    # 先打开SSE通道，客户端连接之前产生的事件会被缓冲
+    SSEManager.open(client_id)
+    task = asyncio.create_task(run_research(researcher, request.query, trace_info))
+    running_tasks.add(task)
+    task.add_done_callback(running_tasks.discard)
     
     return JSONResponse({
         "status": "started",
@@ -82,19 +116,38 @@ async def get_index():
         print("="*50)
         raise
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus文本格式的指标：各代理/工具/阶段的耗时直方图、按主机的请求耗时和缓存命中率"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/sse/{client_id}")
-async def sse_endpoint(request: Request, client_id: str):
+async def sse_endpoint(request: Request, client_id: str, last_event_id: int = 0):
+    """
+    运行的事件流。先发送缓冲区中编号大于 Last-Event-ID（断线重连时浏览器自动带上，也可用 last_event_id 查询参数）的事件，
+    之后推送新事件，空闲时发送心跳注释。运行未知、或已结束且事件已读完时返回204，浏览器不再重连。
+    """
+    header = request.headers.get("last-event-id", "")
+    if header.isdigit():
+        last_event_id = int(header)
+    if not SSEManager.available(client_id, last_event_id):
+        return Response(status_code=204)
+
     async def event_stream():
-        queue = SSEManager.subscribe(client_id)
+        subscription = SSEManager.subscribe(client_id, last_event_id)
         try:
             while True:
-                event = await queue.get()
-                if event is None:  # 添加检查
+                item = await subscription.next()
+                if item is None:
                     break
-                # 修改消息格式
-                yield f"data: {json.dumps(event)}\n\n"
+                if item == HEARTBEAT:
+                    yield ": heartbeat\n\n"
+                    continue
+                event_id, event, data = item
+                payload = f"data: {json.dumps({'event': event, 'data': data})}\n\n"
+                yield payload if event_id is None else f"id: {event_id}\n{payload}"
         finally:
-            SSEManager.unsubscribe(client_id)
+            SSEManager.unsubscribe(subscription)
 
     return StreamingResponse(
         event_stream(),
@@ -104,4 +157,4 @@ async def sse_endpoint(request: Request, client_id: str):
             'Connection': 'keep-alive',
             'X-Accel-Buffering': 'no'
         }
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,30 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_log_file(monkeypatch):
+    """测试中全局日志写入器不写文件，避免每次运行都追加到 LOG_PATH。"""
+    from deep_researcher.utils.log_writer import log_writer
+
+    monkeypatch.setattr(log_writer, "path", None)
+
+
+@pytest.fixture
+def local_server():
+    """返回 serve(app)：在当前事件循环中把aiohttp应用启动在本机随机端口上，产出其根URL，退出时关闭。"""
+    from aiohttp import web
+
+    @asynccontextmanager
+    async def serve(app: web.Application):
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        host, port = runner.addresses[0][:2]
+        try:
+            yield f"http://{host}:{port}"
+        finally:
+            await runner.cleanup()
+
+    return serve
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import pytest
+
+
+def test_cassette_records_and_replays_page_fetches(tmp_path, monkeypatch, local_server):
+    from aiohttp import web
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.tools.page_cache import page_cache
+    from deep_researcher.tools.web_search import WebpageSnippet, scrape_urls
+    from deep_researcher.utils.cassette import use_cassette
+
+    monkeypatch.setattr(page_cache, "enabled", False)
+    path = str(tmp_path / "run.jsonl")
+    body = "<html><body><p>" + "电池 battery " * 50 + "</p></body></html>"
+
+    async def record():
+        app = web.Application()
+        app.router.add_get("/page", lambda request: web.Response(text=body, content_type="text/html", charset="utf-8"))
+        app.router.add_get("/missing", lambda request: web.Response(status=404))
+        async with local_server(app) as base_url:
+            items = [WebpageSnippet(url=f"{base_url}/{page}", title="", description="") for page in ("page", "missing")]
+            try:
+                with use_cassette(path, mode="record"):
+                    return items, await scrape_urls(items)
+            finally:
+                await HTTPClient.close()
+
+    items, recorded = asyncio.run(record())
+    with open(path, encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f]) == 2
+
+    async def replay():
+        with use_cassette(path, mode="replay", latency=0.05) as cassette:
+            started = asyncio.get_running_loop().time()
+            results = await scrape_urls(items)  # 服务器已关闭，只能从磁带回放
+            elapsed = asyncio.get_running_loop().time() - started
+        await HTTPClient.close()
+        return results, elapsed, cassette.counters
+
+    replayed, elapsed, counters = asyncio.run(replay())
+    assert [result.text for result in replayed] == [result.text for result in recorded]
+    assert "battery" in replayed[0].text and replayed[1].text == "获取内容时出错：HTTP 404"
+    assert counters["replayed"] == 2 and counters["misses"] == 0
+    assert elapsed >= 0.05
+
+
+def test_cassette_transport_replays_llm_requests(tmp_path):
+    from deep_researcher.utils.cassette import httpx
+    from deep_researcher.utils.cassette import CassetteMissError, CassetteTransport, use_cassette
+
+    path = str(tmp_path / "llm.jsonl")
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"output": f"reply {len(calls)}"})
+
+    async def run(mode, date):
+        async with httpx.AsyncClient(transport=CassetteTransport(httpx.MockTransport(handler))) as client:
+            with use_cassette(path, mode=mode):
+                prompt = {"model": "gpt-4o", "input": f"今天的日期是{date}。研究电池"}
+                response = await client.post("https://api.openai.com/v1/responses", json=prompt)
+                if mode == "replay":
+                    with pytest.raises(CassetteMissError):
+                        await client.post("https://api.openai.com/v1/chat/completions", json=prompt)
+                return response.json()
+
+    assert asyncio.run(run("record", "2026-10-16")) == {"output": "reply 1"}
+    assert len(calls) == 1
+    # 回放时不发出请求，提示词中的日期不同也能匹配
+    assert asyncio.run(run("replay", "2026-10-17")) == {"output": "reply 1"}
+    assert len(calls) == 1
+
+
+def test_replayed_search_error_status_returns_no_results(tmp_path, monkeypatch, local_server):
+    import importlib
+    from aiohttp import web
+    from agents import RunContextWrapper
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.utils.cassette import use_cassette
+    from deep_researcher.utils.logging import TraceInfo
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+    monkeypatch.setattr(web_search.search_cache, "enabled", False)
+    path = str(tmp_path / "search.jsonl")
+    logged = []
+
+    async def record_log(message, trace_info, additional_data=None, level="info", event=None):
+        logged.append((event, message))
+
+    monkeypatch.setattr(web_search, "log_message", record_log)
+    wrapper = RunContextWrapper(context=TraceInfo(trace_id="cassette-search"))
+
+    async def record():
+        app = web.Application()
+        app.router.add_post("/search", lambda request: web.Response(status=503, text="busy"))
+        async with local_server(app) as base_url:
+            client = web_search.SerperClient()
+            client.url = f"{base_url}/search"
+            try:
+                with use_cassette(path, mode="record"):
+                    return client, await client.search(wrapper, "固态电池", filter_for_relevance=False)
+            finally:
+                await HTTPClient.close()
+
+    client, recorded = asyncio.run(record())
+
+    async def replay():
+        try:
+            with use_cassette(path, mode="replay") as cassette:
+                return await client.search(wrapper, "固态电池", filter_for_relevance=False), cassette.counters
+        finally:
+            await HTTPClient.close()
+
+    replayed, counters = asyncio.run(replay())
+    assert recorded == replayed == []
+    assert counters["replayed"] == 1
+    errors = [message for event, message in logged if event == "search-error"]
+    assert len(errors) == 2 and all("503" in message for message in errors)
@@ -0,0 +1,88 @@
+def _reference_history(conversation) -> str:
+    """改为增量渲染之前的实现，作为输出格式的参照。"""
+    text = ""
+    for num, data in enumerate(conversation.history):
+        text += f"[迭代 {num + 1}]\n\n"
+        if data.thought:
+            text += f"{conversation.get_thought_string(num)}\n\n"
+        if data.gap:
+            text += f"{conversation.get_task_string(num)}\n\n"
+        if data.tool_calls:
+            text += f"{conversation.get_action_string(num)}\n\n"
+        if data.findings:
+            text += f"{conversation.get_findings_string(num)}\n\n"
+    return text
+
+
+def test_compile_conversation_history_renders_only_changed_iterations(monkeypatch):
+    from deep_researcher.iterative_research import Conversation
+
+    conversation = Conversation()
+    rendered = []
+    original = Conversation.render_iteration
+
+    def counting_render(self, iteration_num, *args):
+        rendered.append(iteration_num)
+        return original(self, iteration_num, *args)
+
+    monkeypatch.setattr(Conversation, "render_iteration", counting_render)
+
+    for i in range(5):
+        conversation.add_iteration()
+        conversation.set_latest_thought(f"思考 {i}")
+        assert conversation.compile_conversation_history() == _reference_history(conversation)
+        conversation.set_latest_gap(f"差距 {i}")
+        conversation.set_latest_tool_calls([f"WebSearchAgent: query {i}"])
+        assert conversation.compile_conversation_history() == _reference_history(conversation)
+        conversation.set_latest_findings([f"发现 {i}" * 1000, "更多发现"])
+        assert conversation.compile_conversation_history() == _reference_history(conversation)
+        assert conversation.compile_conversation_history() == _reference_history(conversation)
+
+    # 每次编译只重新渲染被修改的最新迭代，未修改时不渲染
+    assert len(rendered) == 5 * 3
+    assert rendered.count(0) == 3
+
+
+def _research_conversation(iterations: int):
+    from deep_researcher.iterative_research import Conversation
+
+    conversation = Conversation()
+    for i in range(iterations):
+        conversation.add_iteration()
+        conversation.set_latest_thought(f"第 {i} 次迭代的思考")
+        conversation.set_latest_gap(f"差距 {i}")
+        conversation.set_latest_tool_calls([f"[Agent] WebSearchAgent [Query] query {i}"])
+        conversation.set_latest_findings([f"finding {i} " * 2000])
+        conversation.set_latest_sources([f"https://example.com/{i}"])
+    return conversation
+
+
+def test_windowed_history_compresses_older_iterations_to_budget():
+    from deep_researcher.utils.tokens import estimate_tokens
+
+    conversation = _research_conversation(5)
+    full = conversation.compile_conversation_history()
+    assert "https://example.com/0" not in full
+
+    windowed = conversation.compile_conversation_history(6000)
+    assert estimate_tokens(windowed) <= 6000
+    # 最新一次迭代保持原样，较早的迭代只保留任务和来源
+    assert windowed.endswith(conversation.segment(4)[0])
+    assert "差距 0" in windowed and "https://example.com/0" in windowed
+    assert "finding 0" not in windowed
+
+    # 预算随迭代数增长时提示长度保持不变
+    longer = _research_conversation(10).compile_conversation_history(6000)
+    assert estimate_tokens(longer) <= 6000
+
+
+def test_windowed_history_without_findings_and_omits_oldest():
+    conversation = _research_conversation(6)
+
+    summary = conversation.compile_conversation_history(include_findings=False)
+    assert "finding" not in summary
+    assert "第 0 次迭代的思考" in summary and "https://example.com/5" in summary
+
+    tiny = conversation.compile_conversation_history(60, include_findings=False)
+    assert tiny.startswith("（为节省上下文，省略了前")
+    assert "差距 5" in tiny and "差距 0" not in tiny
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+
+def test_site_crawler_is_concurrent_and_deduplicates(monkeypatch, local_server):
+    from aiohttp import web
+    from deep_researcher.tools.crawler import SiteCrawler
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.tools.page_cache import page_cache
+    monkeypatch.setattr(page_cache, "enabled", False)
+
+    requests = []
+    delay = 0.2
+
+    async def handler(request):
+        requests.append(request.path)
+        await asyncio.sleep(delay)
+        name = request.match_info["name"] or "home"
+        nav = "".join(f"<a href='/nav{i}/'>n</a>" for i in range(4))
+        body = "".join(f"<a href='/body{i}?utm_source=x#frag'>b</a>" for i in range(10))
+        html = (
+            f"<html><head><title>{name}</title></head><body><nav>{nav}</nav>"
+            f"<p>page {name}</p>{body}<a href='https://elsewhere.com/'>x</a><a href='/file.pdf'>pdf</a></body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{name:.*}', handler)
+        async with local_server(app) as base_url:
+            try:
+                crawler = SiteCrawler(f"{base_url}/", max_pages=10, concurrency=10, per_domain_concurrency=10)
+                start = time.perf_counter()
+                results = await crawler.crawl()
+                return results, time.perf_counter() - start
+            finally:
+                await HTTPClient.close()
+
+    results, elapsed = asyncio.run(run())
+    assert len(results) == 10
+    # 每个页面只请求一次，且不会爬取站外链接或受限文件
+    assert len(requests) == len(set(requests)) == 10
+    assert not any(path.endswith(".pdf") for path in requests)
+    # 首页之后，导航链接先于正文链接被抓取
+    assert requests[0] == "/"
+    assert set(requests[1:5]) == {f"/nav{i}" for i in range(4)}
+    # 两层页面各耗时约一个delay，而不是10个delay之和
+    assert elapsed < delay * 4
+    assert all(result.text.startswith("page") for result in results)
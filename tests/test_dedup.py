@@ -0,0 +1,98 @@
+import random
+
+
+def _article(seed: int, words: int = 400) -> str:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def test_simhash_index_finds_near_duplicates_only():
+    from deep_researcher.utils.simhash import SimHashIndex, simhash
+
+    article = _article(1)
+    syndicated = "Originally published by Example News. " + article.replace("word7 ", "word8 ", 1) + " Share this story."
+    assert simhash("too short") is None
+    assert (simhash(article) ^ simhash(syndicated)).bit_count() <= 6
+
+    index = SimHashIndex()
+    assert index.add_if_new(simhash(article), "https://a.com/story") is None
+    assert index.add_if_new(simhash(_article(2)), "https://b.com/other") is None
+    assert index.add_if_new(simhash(syndicated), "https://mirror.com/story") == "https://a.com/story"
+    assert len(index) == 2 and index.counters["duplicates"] == 1
+
+
+def test_drop_near_duplicates_within_search_and_across_iterations():
+    from deep_researcher.tools.dedup import drop_near_duplicates
+    from deep_researcher.tools.web_search import ScrapeResult
+    from deep_researcher.utils.simhash import SimHashIndex
+
+    def page(url, text):
+        return ScrapeResult(url=url, title="", description="", text=text)
+
+    index = SimHashIndex()
+    first = [page("https://a.com/1", _article(1)), page("https://a.com/1?page=2", _article(1) + " next page"),
+             page("https://err.com", "获取内容时出错：HTTP 404"), page("https://b.com", _article(2))]
+    kept, duplicates = drop_near_duplicates(first, index)
+    assert [result.url for result in kept] == ["https://a.com/1", "https://err.com", "https://b.com"]
+    assert duplicates[0][1] == "https://a.com/1"
+
+    # 下一次迭代中再次出现的相同文章也会被丢弃
+    kept, duplicates = drop_near_duplicates([page("https://mirror.com", _article(2)), page("https://c.com", _article(3))], index)
+    assert [result.url for result in kept] == ["https://c.com"]
+    assert duplicates[0][1] == "https://b.com"
+
+
+def test_index_copy_is_independent_and_merge_skips_known_pages():
+    from deep_researcher.utils.simhash import SimHashIndex, simhash
+
+    index = SimHashIndex()
+    index.add_if_new(simhash(_article(1)), "https://a.com")
+    speculative = index.copy()
+    # 副本能识别已返回的页面，新登记的页面不影响原索引
+    assert speculative.add_if_new(simhash(_article(1) + " mirror"), "https://mirror.com") == "https://a.com"
+    assert speculative.add_if_new(simhash(_article(2)), "https://b.com") is None
+    assert len(index) == 1
+
+    index.add_if_new(simhash(_article(3)), "https://c.com")
+    assert index.merge(speculative) == 1
+    assert index.keys == ["https://a.com", "https://c.com", "https://b.com"]
+    assert index.counters["checked"] == 2
+
+
+def test_refine_scrape_results_registers_only_returned_text(monkeypatch):
+    import asyncio
+    import importlib
+    from deep_researcher.utils.logging import TraceInfo
+    from deep_researcher.utils.simhash import SimHashIndex, simhash
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+
+    async def quiet_log(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(web_search, "log_message", quiet_log)
+
+    def page(url, text):
+        return web_search.ScrapeResult(url=url, title="", description="", text=text)
+
+    def select_first(text):
+        # 段落筛选只返回第一个页面的一部分正文
+        return lambda results, queries: [results[0].model_copy(update={"text": text})]
+
+    index = SimHashIndex()
+    trace_info = TraceInfo(trace_id="dedup-test", page_index=index)
+    pages = [page("https://a.com", _article(1)), page("https://mirror.com", _article(1) + " mirror"),
+             page("https://b.com", _article(2))]
+    monkeypatch.setattr(web_search, "select_passages", select_first(_article(5)))
+    returned = asyncio.run(web_search.refine_scrape_results(trace_info, pages, "查询"))
+    assert [result.url for result in returned] == ["https://a.com"]
+    # 只登记返回的正文；被筛选丢弃的页面和未返回的全文不会让之后的搜索把它们当作重复
+    assert index.keys == ["https://a.com"]
+    assert index.find(simhash(_article(5))) == "https://a.com"
+    assert index.find(simhash(_article(1))) is None and index.find(simhash(_article(2))) is None
+    assert index.counters["tokens_saved"] == 0
+
+    # 之后的搜索返回了代理已经读过的正文时丢弃该页面
+    returned = asyncio.run(web_search.refine_scrape_results(trace_info, [page("https://b.com", _article(2))], "查询"))
+    assert returned == []
+    assert index.counters["tokens_saved"] > 0
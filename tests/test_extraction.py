@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+HTML_CASES = [
+    "<html><head><title>T</title><script>var x=1</script></head><body><!-- c -->tail"
+    "<p>Hello <b>world</b> tail<script>x</script><!-- k -->after</p><li><p>in</p>li tail</li></body></html>",
+    "<div><h1> 标题 </h1><p>段落&nbsp;一<br/>二</p><blockquote><p>引用</p></blockquote>"
+    "<ul><li>x<ul><li>y</li></ul></li></ul></div>",
+    "<?xml version='1.0' encoding='utf-8'?><html><body><p>x</p></body></html>",
+    "<p>unclosed <p>second <li>item",
+    "<table><tr><td><p>cell</p></td></tr></table><style>p{}</style><p><noscript>ns</noscript>vis</p>",
+    "",
+]
+
+
+@pytest.mark.parametrize("html", HTML_CASES)
+def test_extract_page_matches_html_to_text(html):
+    from deep_researcher.tools.web_search import html_to_text
+    from deep_researcher.tools.extraction import extract_page
+
+    if html:
+        assert extract_page(html).text == html_to_text(html)
+    else:
+        assert extract_page(html).text == ""
+
+
+def test_extract_page_links_and_title():
+    from deep_researcher.tools.extraction import extract_page
+
+    html = (
+        "<html><head><title> Acme </title></head><body>"
+        "<header><nav><a href='/about'>About</a><a href='/pricing#plans'>Pricing</a></nav></header>"
+        "<p><a href='about'>About again</a><a href='https://other.com/x'>x</a><a href='/about'>dup</a></p>"
+        "</body></html>"
+    )
+    page = extract_page(html, "https://acme.com/", with_links=True)
+    assert page.title == "Acme"
+    assert page.nav_links == ["https://acme.com/about", "https://acme.com/pricing#plans"]
+    assert page.body_links == ["https://other.com/x"]
+    assert extract_page(html, "https://acme.com/").nav_links == []
+
+
+def test_extraction_engine_uses_process_pool():
+    from deep_researcher.tools.extraction import ExtractionEngine
+
+    engine = ExtractionEngine(max_workers=1, inline_bytes=0)
+    html = "<p>" + "word " * 1000 + "</p>"
+
+    async def run():
+        try:
+            return await asyncio.gather(*(engine.extract(html) for _ in range(3)))
+        finally:
+            engine.shutdown()
+
+    pages = asyncio.run(run())
+    assert all(page.text == ("word " * 1000).strip() for page in pages)
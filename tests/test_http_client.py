@@ -0,0 +1,30 @@
+import asyncio
+
+
+def test_shared_session_reuses_connections(monkeypatch, local_server):
+    from aiohttp import web
+    from deep_researcher.tools.page_cache import page_cache
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.tools.web_search import scrape_urls, WebpageSnippet
+
+    # 关闭页面缓存，确保每次都真正发起请求
+    monkeypatch.setattr(page_cache, "enabled", False)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{page}', lambda request: web.Response(text="<p>hello</p>", content_type="text/html"))
+        async with local_server(app) as base_url:
+            before = dict(HTTPClient.stats)
+            try:
+                items = [WebpageSnippet(url=f"{base_url}/{i}", title="", description="") for i in range(3)]
+                for _ in range(3):
+                    results = await scrape_urls(items)
+                    assert [r.text for r in results] == ["hello"] * 3
+                assert HTTPClient.get_session() is HTTPClient.get_session()
+                return {name: HTTPClient.stats[name] - before[name] for name in before}
+            finally:
+                await HTTPClient.close()
+
+    stats = asyncio.run(run())
+    assert stats["connections_reused"] > 0
+    assert stats["connections_created"] <= 3
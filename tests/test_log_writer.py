@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+
+
+def test_writer_batches_truncates_and_rotates_json_lines(tmp_path):
+    from deep_researcher.utils.log_writer import LogWriter
+
+    path = tmp_path / "logs" / "run.log"
+    writer = LogWriter(path=str(path), level="info", stdout=False, format="json",
+                       max_message_chars=50, max_bytes=2000, backup_count=2)
+    for i in range(40):
+        writer.submit("info", "search", f"消息{i}" + "x" * (100 if i == 0 else 0), trace_id="t1")
+    assert not writer.submit("debug", "scrape", "过滤掉的调试消息")
+    assert writer.flush()
+    writer.close()
+
+    records = []
+    for name in ("run.log.2", "run.log.1", "run.log"):
+        if os.path.exists(tmp_path / "logs" / name):
+            with open(tmp_path / "logs" / name, encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f)
+    stats = writer.stats()
+    assert stats["rotations"] >= 1 and not os.path.exists(tmp_path / "logs" / "run.log.3")
+    assert stats["truncated"] == 1 and stats["dropped"] == 0 and len(records) == 40
+    assert records[-1] == {**records[-1], "level": "info", "event": "search", "trace_id": "t1", "message": "消息39"}
+    assert all(os.path.getsize(tmp_path / "logs" / name) <= 2000 for name in os.listdir(tmp_path / "logs"))
+    assert "截断" in next(record["message"] for record in records if record["message"].startswith("消息0"))
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+    from deep_researcher.utils.log_writer import LogWriter
+
+    writer = LogWriter(path=str(tmp_path / "run.log"), stdout=False, queue_size=3)
+    # 后台线程没有启动，队列不会被消费
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+    accepted = [writer.submit("info", "info", f"消息{i}") for i in range(5)]
+    assert accepted == [True, True, True, False, False]
+    assert writer.stats()["dropped"] == 2 and writer.stats()["queued"] == 3
+
+
+def test_log_message_skips_disabled_levels_lazily_and_still_feeds_sse(tmp_path, monkeypatch):
+    from deep_researcher import sse_manager
+    from deep_researcher.sse_manager import SSEManager
+    from deep_researcher.utils import logging as research_logging
+    from deep_researcher.utils.log_writer import LogWriter
+    from deep_researcher.utils.logging import TraceInfo, log_message
+
+    writer = LogWriter(path=str(tmp_path / "run.log"), level="info", stdout=False)
+    monkeypatch.setattr(research_logging, "log_writer", writer)
+    evaluated = []
+
+    def expensive():
+        evaluated.append(True)
+        return "<search-result>50条结果</search-result>"
+
+    async def run():
+        await log_message(expensive, TraceInfo(trace_id="nobody"), level="debug")
+        channel = SSEManager.open("log-test")
+        try:
+            # 运行有通道但 SSE_LEVEL 为 info 时，调试事件同样不构造
+            await log_message(expensive, TraceInfo(trace_id="log-test"), level="debug")
+            assert evaluated == []
+            monkeypatch.setattr(sse_manager, "SSE_LEVEL", "debug")
+            await log_message(expensive, TraceInfo(trace_id="log-test"), level="debug")
+            await log_message("<search>执行搜索：电池</search>", TraceInfo(trace_id="log-test"))
+            return list(channel.events)
+        finally:
+            SSEManager.channels.pop("log-test")
+
+    events = asyncio.run(run())
+    assert evaluated == [True]
+    assert [event for _, event, _ in events] == ["search-result", "search"]
+    assert writer.flush()
+    writer.close()
+    with open(tmp_path / "run.log", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1 and lines[0].endswith("【search】: 执行搜索：电池")
@@ -0,0 +1,44 @@
+import asyncio
+
+
+def test_legacy_messages_parse_with_one_combined_pattern():
+    from deep_researcher.utils.message_parser import MessageParser
+
+    assert MessageParser.parse("<agent-select>\n=== 选择代理 ===</agent-select>") == ("agent-select", "=== 选择代理 ===")
+    assert MessageParser.parse("<search-result>[]</search-result>") == ("search-result", "[]")
+    assert MessageParser.parse("<search>执行搜索：电池</search>") == ("search", "执行搜索：电池")
+    assert MessageParser.parse("<search-error>超时</search-error>") == ("search-error", "超时")
+    # 外层标签先出现，内层的已知标签属于内容
+    assert MessageParser.parse("<evaluate_gaps>历史\n<thought>想法</thought></evaluate_gaps>") == (
+        "evaluate_gaps", "历史\n<thought>想法</thought>")
+    assert MessageParser.parse("<unknown>x</unknown>") == ("info", "<unknown>x</unknown>")
+    assert MessageParser.parse("<thought>没有闭合标签") == ("info", "<thought>没有闭合标签")
+    assert MessageParser.parse("普通消息") == ("info", "普通消息")
+
+
+def test_structured_events_skip_parsing(monkeypatch):
+    from deep_researcher.sse_manager import SSEManager
+    from deep_researcher.utils import logging as research_logging
+    from deep_researcher.utils.logging import TraceInfo, log_message
+    from deep_researcher.utils.message_parser import MessageParser
+
+    def fail(message):
+        raise AssertionError("带事件类型的消息不应被解析")
+
+    monkeypatch.setattr(MessageParser, "parse", fail)
+    monkeypatch.setattr(research_logging.log_writer, "submit", lambda *args, **kwargs: True)
+    payload = "x" * 1_000_000
+
+    async def run():
+        channel = SSEManager.open("parser-test")
+        try:
+            await log_message(payload, TraceInfo(trace_id="parser-test"), additional_data={"count": 50}, event="search-result")
+            return channel.events[0]
+        finally:
+            SSEManager.channels.pop("parser-test")
+
+    _, event, data = asyncio.run(run())
+    assert event == "search-result"
+    assert data["message"] is payload
+    assert data["count"] == 50 and data["trace_id"] == "parser-test"
+    assert "raw_message" not in data
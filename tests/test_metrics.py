@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+
+
+def test_span_records_duration_queue_wait_payload_and_errors():
+    from deep_researcher.utils.metrics import (
+        SPAN_ERRORS, SPAN_PAYLOAD_BYTES, SPAN_QUEUE_SECONDS, SPAN_SECONDS, metrics, span,
+    )
+
+    metrics.reset()
+
+    async def run():
+        queued_at = time.perf_counter()
+        await asyncio.sleep(0.01)
+        async with span("phase", "section", input="问题", queued_at=queued_at) as current:
+            await asyncio.sleep(0.01)
+            current.set_output("结果" * 10)
+        with pytest.raises(ValueError):
+            async with span("agent", "WriterAgent"):
+                raise ValueError("boom")
+        return current
+
+    current = asyncio.run(run())
+    assert current.queue_wait >= 0.01
+    assert current.duration >= 0.01
+    assert (current.input_bytes, current.output_bytes) == (6, 60)
+    assert SPAN_SECONDS.count(kind="phase", name="section") == 1
+    assert SPAN_QUEUE_SECONDS.count(kind="phase", name="section") == 1
+    assert SPAN_PAYLOAD_BYTES.sum(kind="phase", name="section", direction="output") == 60
+    assert SPAN_SECONDS.count(kind="agent", name="WriterAgent") == 1
+    assert SPAN_ERRORS.value(kind="agent", name="WriterAgent") == 1
+
+
+def test_render_prometheus_text_format():
+    from deep_researcher.utils.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "耗时", ("name",), buckets=(0.1, 1.0))
+    counter = registry.counter("test_total", "次数", ("name",))
+    histogram.observe(0.05, name='a"b')
+    histogram.observe(0.5, name='a"b')
+    histogram.observe(5, name='a"b')
+    counter.inc(name="x")
+    registry.register_collector(lambda: [("test_ratio", "命中率", "gauge", [({"cache": "page"}, 0.25)])])
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{name="a\\"b",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{name="a\\"b",le="1"} 2' in lines
+    assert 'test_seconds_bucket{name="a\\"b",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{name="a\\"b"} 5.55' in lines
+    assert 'test_seconds_count{name="a\\"b"} 3' in lines
+    assert 'test_total{name="x"} 1' in lines
+    assert 'test_ratio{cache="page"} 0.25' in lines
+
+
+def test_histogram_caps_label_series():
+    from deep_researcher.utils.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram("fetch_seconds", "耗时", ("host",), max_series=2)
+    for host in ("a.com", "b.com", "c.com", "d.com", "a.com"):
+        histogram.observe(0.1, host=host)
+
+    assert histogram.count(host="a.com") == 2 and histogram.count(host="b.com") == 1
+    assert histogram.count(host="other") == 2
+    assert 'fetch_seconds_count{host="c.com"}' not in registry.render()
+
+
+def test_metrics_endpoint_reports_agent_latency_fetches_and_cache_ratios(monkeypatch, local_server):
+    from aiohttp import web
+    from fastapi.testclient import TestClient
+    from deep_researcher.agents import baseclass
+    from deep_researcher.agents.baseclass import ResearchAgent, ResearchRunner
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.utils.metrics import metrics
+    from server.app import app
+
+    metrics.reset()
+
+    class FakeResult:
+        final_output = "输出"
+
+    async def fake_run(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return FakeResult()
+
+    monkeypatch.setattr(baseclass.Runner, "run", fake_run)
+
+    async def run():
+        server_app = web.Application()
+        server_app.router.add_get("/", lambda request: web.Response(text="ok"))
+        async with local_server(server_app) as base_url:
+            try:
+                await ResearchRunner.run(ResearchAgent(name="MetricsTestAgent", instructions="x"), "输入")
+                async with HTTPClient.get_session().get(f"{base_url}/") as response:
+                    await response.read()
+            finally:
+                await HTTPClient.close()
+
+    asyncio.run(run())
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'deep_researcher_span_seconds_count{kind="agent",name="MetricsTestAgent"} 1' in body
+    assert 'deep_researcher_fetch_seconds_count{host="127.0.0.1"} 1' in body
+    assert 'deep_researcher_fetch_queue_seconds_count{host="127.0.0.1"} 1' in body
+    assert 'deep_researcher_cache_hit_ratio{cache="page"}' in body
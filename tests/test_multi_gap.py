@@ -0,0 +1,55 @@
+import asyncio
+import importlib
+import time
+from types import SimpleNamespace
+
+
+def test_research_gaps_runs_gaps_concurrently_and_records_each(monkeypatch):
+    iterative_research = importlib.import_module("deep_researcher.iterative_research")
+    from deep_researcher.agents.tool_agents import ToolAgentOutput
+    from deep_researcher.agents.tool_selector_agent import AgentSelectionPlan, AgentTask
+    from deep_researcher.utils.logging import TraceInfo
+
+    gaps = ["市场规模", "主要厂商", "政策影响"]
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_run(agent, prompt, context=None):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if agent.name == "ToolSelectorAgent":
+            gap = prompt.split("要解决的知识差距：")[1].split()[0]
+            output = AgentSelectionPlan(tasks=[AgentTask(gap=gap, agent="WebSearchAgent", query=f"{gap} 2025")])
+        else:
+            query = AgentTask.model_validate_json(prompt).query
+            output = ToolAgentOutput(output=f"关于{query}的发现", sources=[f"https://example.com/{query}"])
+        return SimpleNamespace(final_output=output, final_output_as=lambda cls: output)
+
+    async def quiet_log(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(iterative_research.ResearchRunner, "run", fake_run)
+    monkeypatch.setattr(iterative_research, "log_message", quiet_log)
+
+    researcher = iterative_research.IterativeResearcher(gaps_per_iteration=3)
+    researcher.trace_info = TraceInfo(trace_id="multi-gap-test")
+    researcher.start_time = time.time()
+    researcher.conversation.add_iteration()
+    results = asyncio.run(researcher._research_gaps(gaps, "电池市场"))
+
+    assert len(results) == 3
+    assert max_in_flight == 3  # 三个差距的工具选择同时进行
+
+    iteration = researcher.conversation.history[-1]
+    assert iteration.gap == "市场规模"
+    assert [data.gap for data in iteration.gaps] == gaps
+    assert [data.findings for data in iteration.gaps] == [[f"关于{gap} 2025的发现"] for gap in gaps]
+    assert len(iteration.findings) == 3 and len(iteration.sources) == 3
+
+    history = researcher.conversation.compile_conversation_history()
+    for gap in gaps:
+        task = history.index(f"解决这个知识差距：{gap}")
+        assert history.index(f"关于{gap} 2025的发现") > task
@@ -0,0 +1,46 @@
+import asyncio
+import importlib
+
+
+def test_page_cache_hits_and_revalidates(tmp_path, monkeypatch, local_server):
+    from aiohttp import web
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.tools.page_cache import PageCache
+
+    cache = PageCache(path=str(tmp_path / "pages.sqlite3"), ttl=3600)
+    monkeypatch.setattr(web_search, "page_cache", cache)
+    statuses = []
+
+    async def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            statuses.append(304)
+            return web.Response(status=304)
+        statuses.append(200)
+        return web.Response(text="<h1>Title</h1><p>Body</p>", content_type="text/html", headers={"ETag": '"v1"'})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/page', handler)
+        async with local_server(app) as base_url:
+            item = web_search.WebpageSnippet(url=f"{base_url}/page#intro", title="t", description="d")
+            try:
+                session = HTTPClient.get_session()
+                first = await web_search.fetch_and_process_url(session, item)
+                # 片段和跟踪参数不同的URL命中同一条目
+                item.url = f"{base_url}/page?utm_source=x"
+                second = await web_search.fetch_and_process_url(session, item)
+                # 过期后通过ETag重新验证
+                cache.ttl = 0
+                third = await web_search.fetch_and_process_url(session, item)
+                return first, second, third
+            finally:
+                await HTTPClient.close()
+
+    first, second, third = asyncio.run(run())
+    assert first.text == second.text == third.text == "Title\nBody"
+    assert statuses == [200, 304]
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["revalidated"] == 1
+    assert stats["bytes_saved"] > 0
@@ -0,0 +1,15 @@
+import pytest
+
+from deep_researcher.agents.utils.parse_output import OutputParserError, parse_json_output
+
+
+def test_parse_json_output_handles_plain_fenced_and_embedded_json():
+    assert parse_json_output('{"a": 1}') == {"a": 1}
+    assert parse_json_output('说明\n```json\n{"a": {"b": 2}}\n```\n结束') == {"a": {"b": 2}}
+    # 没有代码块时回退到查找最左侧的花括号，而不是在拆分代码块时抛出IndexError
+    assert parse_json_output('结果如下：{"gaps": ["{x}"]} 以上') == {"gaps": ["{x}"]}
+
+
+def test_parse_json_output_raises_parser_error_without_json():
+    with pytest.raises(OutputParserError):
+        parse_json_output("没有JSON的输出")
@@ -0,0 +1,58 @@
+def test_estimate_tokens_counts_cjk_per_character():
+    from deep_researcher.utils.tokens import estimate_tokens
+
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) == 100
+    assert estimate_tokens("电" * 400) == 400
+    assert 140 <= estimate_tokens("电池" * 50 + " battery" * 25) <= 160
+
+
+def test_select_passages_packs_relevant_passages_into_budget():
+    from deep_researcher.tools.passages import PASSAGE_SEPARATOR, select_passages
+    from deep_researcher.tools.web_search import ScrapeResult
+    from deep_researcher.utils.tokens import estimate_tokens
+
+    filler = "Unrelated cooking tips about pasta and tomato sauce for the weekend."
+    english = "\n".join(
+        [filler] * 20
+        + ["Solid-state battery supply chain constraints are easing as lithium prices fall."]
+        + [filler] * 20
+        + ["The battery supply chain now relies on three major cathode suppliers."]
+    )
+    chinese = "\n".join(["今天的天气很好，适合出门散步。"] * 30 + ["固态电池供应链的瓶颈在于电解质材料的产能。"])
+    noise = "\n".join([filler] * 40)
+    pages = [
+        ScrapeResult(url="https://a.com", title="A", description="", text=english),
+        ScrapeResult(url="https://b.com", title="B", description="", text=noise),
+        ScrapeResult(url="https://c.cn", title="C", description="", text=chinese),
+    ]
+
+    selected = select_passages(pages, ["battery supply chain", "电池供应链"], budget=400, page_share=1.0)
+    # 无关页面被整体丢弃，其余页面保持原顺序，只保留相关段落
+    assert [page.url for page in selected] == ["https://a.com", "https://c.cn"]
+    assert "lithium prices" in selected[0].text and "cathode suppliers" in selected[0].text
+    assert PASSAGE_SEPARATOR in selected[0].text and len(selected[0].text) < len(english) / 2
+    assert "电解质" in selected[1].text and "散步" not in selected[1].text
+    assert sum(estimate_tokens(page.text) for page in selected) <= 400
+
+    # 预算为0时不做筛选
+    assert select_passages(pages, ["battery"], budget=0) == pages
+
+
+def test_select_passages_falls_back_to_leading_passages_when_nothing_matches():
+    from deep_researcher.tools.passages import select_passages
+    from deep_researcher.tools.web_search import ScrapeResult
+    from deep_researcher.utils.tokens import estimate_tokens
+
+    def article(topic):
+        return "\n".join(f"{topic} paragraph {i}: " + "details about the cathode material market. " * 6 for i in range(20))
+
+    pages = [
+        ScrapeResult(url="https://a.com", title="A", description="", text=article("Intro")),
+        ScrapeResult(url="https://b.com", title="B", description="", text=article("Overview")),
+    ]
+    # 中文差距对英文页面：没有任何段落匹配，仍按页面返回开头的段落
+    selected = select_passages(pages, ["固态电池 正极材料"], budget=400, page_share=1.0)
+    assert [page.url for page in selected] == ["https://a.com", "https://b.com"]
+    assert all(page.text.startswith(("Intro paragraph 0", "Overview paragraph 0")) for page in selected)
+    assert sum(estimate_tokens(page.text) for page in selected) <= 400
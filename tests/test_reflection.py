@@ -0,0 +1,67 @@
+import asyncio
+import importlib
+import time
+from types import SimpleNamespace
+
+
+def _fake_result(output, input_tokens):
+    usage = SimpleNamespace(input_tokens=input_tokens, output_tokens=10)
+    return SimpleNamespace(
+        final_output=output,
+        final_output_as=lambda cls: output,
+        raw_responses=[SimpleNamespace(usage=usage)],
+    )
+
+
+def _reflect(monkeypatch, mode, gaps=("市场规模",)):
+    iterative_research = importlib.import_module("deep_researcher.iterative_research")
+    from deep_researcher.utils.logging import TraceInfo
+
+    calls = []
+
+    async def fake_run(agent, prompt, context=None):
+        calls.append(agent.name)
+        if agent.name == "ReflectionAgent":
+            output = iterative_research.ReflectionOutput(
+                thought="需要先了解市场规模", research_complete=False, outstanding_gaps=list(gaps)
+            )
+        elif agent.name == "ThinkingAgent":
+            output = "需要先了解市场规模"
+        else:
+            output = iterative_research.KnowledgeGapOutput(research_complete=False, outstanding_gaps=list(gaps))
+        return _fake_result(output, input_tokens=len(prompt))
+
+    async def quiet_log(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(iterative_research.ResearchRunner, "run", fake_run)
+    monkeypatch.setattr(iterative_research, "log_message", quiet_log)
+
+    researcher = iterative_research.IterativeResearcher(reflection_mode=mode)
+    researcher.trace_info = TraceInfo(trace_id="reflection-test")
+    researcher.start_time = time.time()
+    researcher.iteration = 1
+    researcher.conversation.add_iteration()
+    evaluation = asyncio.run(researcher._reflect("电池市场"))
+    return researcher, evaluation, calls
+
+
+def test_fused_reflection_uses_one_call_and_matches_split(monkeypatch):
+    split, split_evaluation, split_calls = _reflect(monkeypatch, "split")
+    fused, fused_evaluation, fused_calls = _reflect(monkeypatch, "fused")
+
+    assert split_calls == ["ThinkingAgent", "KnowledgeGapAgent"]
+    assert fused_calls == ["ReflectionAgent"]
+    assert fused_evaluation == split_evaluation
+    assert fused.conversation.history == split.conversation.history
+
+    assert split.reflection_stats["calls"] == 2 and fused.reflection_stats["calls"] == 1
+    assert fused.reflection_stats["output_tokens"] == 10
+    assert 0 < fused.reflection_stats["input_tokens"] < split.reflection_stats["input_tokens"]
+
+
+def test_incomplete_evaluation_without_gaps_counts_as_complete(monkeypatch):
+    for mode in ("split", "fused"):
+        researcher, evaluation, _ = _reflect(monkeypatch, mode, gaps=())
+        assert evaluation.research_complete and evaluation.outstanding_gaps == []
+        assert not researcher.conversation.get_latest_gap()
@@ -0,0 +1,88 @@
+import asyncio
+import importlib
+
+
+RESULTS = [
+    {"url": "https://acme.com/about", "title": "About Acme Inc", "description": "Acme Inc builds reusable rockets"},
+    {"url": "https://acmesolutions.com/", "title": "Acme Solutions", "description": "Acme Inc rocket consulting"},
+    {"url": "https://acme.net/launch", "title": "Acme rockets", "description": "acme inc launches"},
+    {"url": "https://news.example.com/acme-rocket-launch", "title": "Acme Inc launches its first rocket",
+     "description": "The company behind the rocket"},
+    {"url": "https://cooking.example.com/pasta", "title": "Best pasta recipes", "description": "tomato and basil"},
+]
+
+
+def test_local_ranker_scores_text_and_rejects_lookalike_domains():
+    from deep_researcher.tools.relevance import local_ranker, query_domains
+
+    assert query_domains("Acme Inc, acme.com site:www.Acme.com") == {"acme.com"}
+    outcome = local_ranker.rank("Acme Inc, acme.com rocket launches", RESULTS)
+    # 官方域名和相关新闻保留，无关结果剔除；仿冒域名（acme.net）不保留但算作拿不准，
+    # 只是名称中包含 acme 的域名（acmesolutions.com）按文本打分
+    assert sorted(outcome.kept) == [0, 1, 3]
+    assert outcome.scored[1].domain_match is None and outcome.scored[2].domain_match is False
+    assert outcome.uncertain == [2]
+    assert outcome.confidence >= 0.7
+
+    chinese = [
+        {"url": "https://example.cn/a", "title": "宁德时代发布电池回收计划", "description": "动力电池回收"},
+        {"url": "https://example.cn/b", "title": "今日天气预报", "description": "晴转多云"},
+    ]
+    assert local_ranker.rank("宁德时代 电池回收", chinese).kept == [0]
+
+
+def test_framework_names_and_substring_hosts_are_not_rejected_as_lookalikes():
+    from deep_researcher.tools.relevance import local_ranker, query_domains
+
+    assert query_domains("Next.js 服务端渲染 性能优化") == set()
+    assert query_domains("Node.js vue.js site:nodejs.org") == {"nodejs.org"}
+    docs = [{"url": "https://nextjs.org/docs/app/rendering/server-components", "title": "Server Components | Next.js",
+             "description": "服务端渲染"}]
+    assert local_ranker.rank("Next.js 服务端渲染 性能优化", docs).kept == [0]
+
+    results = [
+        {"url": "https://pineapple.com/iphone", "title": "Pineapple iPhone cases", "description": "iphone"},
+        {"url": "https://appie.com/iphone", "title": "iPhone deals", "description": "iphone"},
+    ]
+    outcome = local_ranker.rank("apple.com iphone", results)
+    assert outcome.scored[0].domain_match is None and outcome.kept == [0]
+    assert outcome.scored[1].domain_match is False and outcome.uncertain == [1]
+
+
+def test_filter_results_skips_llm_when_local_ranker_is_confident(monkeypatch):
+    from agents import RunContextWrapper
+    from deep_researcher.utils.logging import TraceInfo
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+
+    calls = []
+
+    async def fake_run(agent, prompt, context=None):
+        calls.append(prompt)
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(web_search.ResearchRunner, "run", fake_run)
+    results = [web_search.WebpageSnippet(**result) for result in RESULTS]
+    wrapper = RunContextWrapper(context=TraceInfo(trace_id="relevance-test"))
+    client = web_search.SerperClient()
+
+    monkeypatch.setattr(web_search, "SEARCH_FILTER_POLICY", "auto")
+    filtered = asyncio.run(client._filter_results(wrapper, web_search.SearchEvents(), results, "Acme Inc, acme.com rocket launches"))
+    assert {result.url for result in filtered} == {RESULTS[0]["url"], RESULTS[1]["url"], RESULTS[3]["url"]}
+    assert not calls
+
+    # always：无论置信度如何都调用过滤代理（此处失败后回退为原始结果）
+    monkeypatch.setattr(web_search, "SEARCH_FILTER_POLICY", "always")
+    filtered = asyncio.run(client._filter_results(wrapper, web_search.SearchEvents(), results, "Acme Inc, acme.com rocket launches"))
+    assert len(calls) == 1 and len(filtered) == len(results)
+
+
+def test_unknown_filter_policy_is_rejected():
+    import pytest
+    from deep_researcher.tools.relevance import RankingOutcome, check_filter_policy, should_use_llm
+
+    assert check_filter_policy("never") == "never"
+    with pytest.raises(ValueError, match="alway"):
+        check_filter_policy("alway")
+    with pytest.raises(ValueError):
+        should_use_llm("alway", RankingOutcome())
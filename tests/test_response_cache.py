@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+
+
+def test_research_runner_caches_responses_per_agent_mode(tmp_path, monkeypatch):
+    from agents import Agent
+    from pydantic import BaseModel
+    from deep_researcher.agents import baseclass
+    from deep_researcher.agents.baseclass import ResearchAgent, ResearchRunner
+    from deep_researcher.agents.response_cache import ResponseCache
+
+    class Plan(BaseModel):
+        steps: list[str]
+
+    calls = []
+
+    async def fake_run(agent, input, **kwargs):
+        calls.append((agent.name, input))
+        output = Plan(steps=[input]) if agent.output_type else f"answer to {input}"
+        return SimpleNamespace(final_output=output, raw_responses=["response"])
+
+    cache = ResponseCache(path=str(tmp_path / "llm.sqlite3"), ttl=3600, mode="read-write",
+                          agent_modes={"Thinker": "off", "Replayer": "read-only"})
+    monkeypatch.setattr(baseclass.Runner, "run", fake_run)
+    monkeypatch.setattr(baseclass, "response_cache", cache)
+
+    planner = ResearchAgent(name="Planner", instructions="plan it", model="gpt-4o", output_type=Plan)
+    thinker = Agent(name="Thinker", instructions="think", model="gpt-4o")
+    replayer = Agent(name="Replayer", instructions="think", model="gpt-4o")
+
+    async def run():
+        first = await ResearchRunner.run(planner, "query", context=None)
+        second = await ResearchRunner.run(planner, "query", context=None)
+        assert second.final_output == first.final_output == Plan(steps=["query"])
+        assert second.raw_responses == []  # 命中时没有调用模型
+        # 输入或指令不同则不命中
+        await ResearchRunner.run(planner, "other query")
+        await ResearchRunner.run(planner.clone(instructions="plan it carefully"), "query")
+        assert len(calls) == 3
+
+        # off：每次都调用模型
+        await ResearchRunner.run(thinker, "query")
+        await ResearchRunner.run(thinker, "query")
+        assert len(calls) == 5
+
+        # read-only：未命中时调用模型但不写入
+        await ResearchRunner.run(replayer, "query")
+        await ResearchRunner.run(replayer, "query")
+        assert len(calls) == 7
+        cache.set_mode("Replayer", "read-write")
+        await ResearchRunner.run(replayer, "query")
+        cache.set_mode("Replayer", "read-only")
+        replayed = await ResearchRunner.run(replayer, "query")
+        assert replayed.final_output == "answer to query" and len(calls) == 8
+
+    asyncio.run(run())
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["stores"] == 4
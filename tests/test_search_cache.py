@@ -0,0 +1,40 @@
+import asyncio
+
+
+def test_normalize_query():
+    from deep_researcher.tools.search_cache import normalize_query
+
+    assert normalize_query("  Tesla   Revenue 2024 ") == "tesla revenue 2024"
+    # 全角字符折叠为半角
+    assert normalize_query("ＴＥＳＬＡ　营收　２０２４") == "tesla 营收 2024"
+    # site: 操作符的位置、大小写、协议和www前缀不影响结果
+    assert normalize_query("site:https://www.Acme.com/ acme pricing") == "acme pricing site:acme.com"
+    assert normalize_query("acme SITE:acme.com pricing") == "acme pricing site:acme.com"
+
+
+def test_search_cache_tiers(tmp_path):
+    from deep_researcher.tools.search_cache import SearchCache
+
+    path = str(tmp_path / "search.sqlite3")
+    params = {"freshness": "oneYear", "count": 50}
+    results = [{"url": "https://acme.com", "title": "Acme", "description": "Acme Inc"}]
+
+    async def run():
+        cache = SearchCache(path=path, ttl=3600)
+        assert await cache.get("Acme pricing", params) is None
+        await cache.put("Acme pricing", params, results)
+        assert await cache.get("acme   PRICING", params) == results
+        # 请求参数或结果类型不同则不命中
+        assert await cache.get("acme pricing", {**params, "count": 10}) is None
+        assert await cache.get("acme pricing", params, variant="filtered:50") is None
+        first_stats = cache.stats()
+
+        # 新实例（内存为空）从SQLite层命中
+        other = SearchCache(path=path, ttl=3600)
+        assert await other.get("acme pricing", params) == results
+        return first_stats, other.stats()
+
+    first_stats, other_stats = asyncio.run(run())
+    assert first_stats["memory_hits"] == 1
+    assert first_stats["misses"] == 3
+    assert other_stats["disk_hits"] == 1
@@ -0,0 +1,129 @@
+import asyncio
+
+
+def test_single_flight_deduplicates_concurrent_calls():
+    from deep_researcher.utils.single_flight import SingleFlight
+
+    flight = SingleFlight("test")
+    executions = []
+
+    async def work(value):
+        executions.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", lambda: work(21)) for _ in range(5)))
+        # 前一次调用完成后，相同的键会重新执行
+        again = await flight.do("key", lambda: work(1))
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert results == [42] * 5
+    assert again == 2
+    assert executions == [21, 1]
+    assert flight.stats() == {"calls": 6, "executions": 2, "deduplicated": 4, "inflight": 0}
+
+
+def test_single_flight_cancelled_caller_does_not_cancel_others():
+    from deep_researcher.utils.single_flight import SingleFlight
+
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("a", work))
+        second = asyncio.ensure_future(flight.do("a", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await second
+        errors = await asyncio.gather(flight.do("b", failing), flight.do("b", failing), return_exceptions=True)
+        return first, result, errors
+
+    first, result, errors = asyncio.run(run())
+    assert first.cancelled()
+    assert result == "done"
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+
+def test_fetch_and_process_url_fetches_once_for_concurrent_callers(monkeypatch, local_server):
+    import importlib
+    from aiohttp import web
+    from deep_researcher.tools.http_client import HTTPClient
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+    monkeypatch.setattr(web_search.page_cache, "enabled", False)
+    requests = []
+
+    async def handler(request):
+        requests.append(request.path)
+        await asyncio.sleep(0.05)
+        return web.Response(text="<p>shared</p>", content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/page', handler)
+        async with local_server(app) as base_url:
+            items = [
+                web_search.WebpageSnippet(url=f"{base_url}/page{suffix}", title=f"t{i}", description="")
+                for i, suffix in enumerate(["", "#a", "?utm_source=x"])
+            ]
+            try:
+                return await web_search.scrape_urls(items)
+            finally:
+                await HTTPClient.close()
+
+    results = asyncio.run(run())
+    assert [r.text for r in results] == ["shared"] * 3
+    assert [r.title for r in results] == ["t0", "t1", "t2"]
+    assert requests == ["/page"]
+
+
+def test_concurrent_identical_searches_report_results_to_every_run(monkeypatch, local_server):
+    import importlib
+    from aiohttp import web
+    from agents import RunContextWrapper
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.utils.logging import TraceInfo
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+    monkeypatch.setattr(web_search.search_cache, "enabled", False)
+    requests = []
+    logged = []
+
+    async def search_api(request):
+        requests.append(await request.json())
+        await asyncio.sleep(0.05)
+        value = [{"url": "https://a.com", "name": "A", "summary": "a"}]
+        return web.json_response({"data": {"webPages": {"value": value}}})
+
+    async def record_log(message, trace_info, additional_data=None, level="info", event=None):
+        logged.append((trace_info.trace_id, event))
+
+    monkeypatch.setattr(web_search, "log_message", record_log)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/search", search_api)
+        async with local_server(app) as base_url:
+            client = web_search.SerperClient()
+            client.url = f"{base_url}/search"
+            try:
+                return await asyncio.gather(*(
+                    client.search(RunContextWrapper(context=TraceInfo(trace_id=trace_id)), "固态电池", filter_for_relevance=False)
+                    for trace_id in ("run-a", "run-b")
+                ))
+            finally:
+                await HTTPClient.close()
+
+    results = asyncio.run(run())
+    assert len(requests) == 1
+    assert [[result.url for result in run_results] for run_results in results] == [["https://a.com"]] * 2
+    # 合并进来的运行也收到搜索结果事件
+    assert ("run-a", "search-result") in logged and ("run-b", "search-result") in logged
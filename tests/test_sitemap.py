@@ -0,0 +1,159 @@
+import asyncio
+import gzip
+
+
+URLSET = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  {entries}
+</urlset>"""
+
+
+def _urlset(paths):
+    entries = "".join(
+        f"<url><loc>{path}</loc><lastmod>{lastmod}</lastmod></url>" for path, lastmod in paths
+    )
+    return URLSET.format(entries=entries)
+
+
+def test_sitemap_parser_is_incremental_and_ranks_by_query():
+    from deep_researcher.tools.sitemap import SitemapParser, rank_entries
+
+    xml = _urlset([
+        ("/blog/2019/battery-recycling-update", "2019-01-01"),
+        ("/products/solid-state-battery", "2024-05-01T10:00:00+08:00"),
+        ("/tag/battery", "2024-06-01"),
+        ("/about-us", "2024-06-01"),
+        ("/news/电池回收", "2024-06-01"),
+    ]).encode("utf-8")
+    parser = SitemapParser("https://example.com/sitemap.xml")
+    for i in range(0, len(xml), 7):
+        parser.feed(xml[i:i + 7])
+    document = parser.close()
+
+    assert [page.url for page in document.pages][:2] == [
+        "https://example.com/blog/2019/battery-recycling-update",
+        "https://example.com/products/solid-state-battery",
+    ]
+    assert document.pages[0].lastmod is not None
+
+    ranked = rank_entries(document.pages, "solid-state battery roadmap", limit=10)
+    # 路径与查询无关的页面被丢弃，样板页面排在实质页面之后
+    assert ranked[0] == "https://example.com/products/solid-state-battery"
+    assert "https://example.com/about-us" not in ranked
+    assert ranked.index("https://example.com/tag/battery") > ranked.index(
+        "https://example.com/blog/2019/battery-recycling-update")
+    assert rank_entries(document.pages, "电池回收", limit=10) == ["https://example.com/news/电池回收"]
+
+
+def test_parse_lastmod_accepts_utc_designator():
+    from datetime import datetime, timezone
+    from deep_researcher.tools.sitemap import parse_lastmod
+
+    expected = datetime(2024, 5, 1, 2, tzinfo=timezone.utc).timestamp()
+    assert parse_lastmod("2024-05-01T02:00:00Z") == expected
+    assert parse_lastmod(" 2024-05-01T10:00:00+08:00 ") == expected
+    assert parse_lastmod("2024-05-01") == datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp()
+    assert parse_lastmod("yesterday") is None and parse_lastmod("") is None
+
+
+def test_crawler_seeds_from_sitemap_index_and_respects_robots(monkeypatch, local_server):
+    from aiohttp import web
+    from deep_researcher.tools.crawler import SiteCrawler
+    from deep_researcher.tools.http_client import HTTPClient
+    from deep_researcher.tools.page_cache import page_cache
+    from deep_researcher.tools.sitemap import sitemap_seeder
+    monkeypatch.setattr(page_cache, "enabled", False)
+    monkeypatch.setattr(sitemap_seeder, "_cache", type(sitemap_seeder._cache)())
+
+    requests = []
+
+    async def run():
+        app = web.Application()
+        server = {}
+
+        def base():
+            return server["url"]
+
+        async def robots(request):
+            requests.append(request.path)
+            text = f"User-agent: *\nDisallow: /private/\nSitemap: {base()}/sitemap_index.xml\n"
+            return web.Response(text=text)
+
+        async def index(request):
+            requests.append(request.path)
+            xml = (
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f"<sitemap><loc>{base()}/post-sitemap.xml.gz</loc></sitemap>"
+                f"<sitemap><loc>{base()}/pricing-sitemap.xml.gz</loc></sitemap>"
+                "</sitemapindex>"
+            )
+            return web.Response(text=xml, content_type="application/xml")
+
+        async def pricing_sitemap(request):
+            requests.append(request.path)
+            body = gzip.compress(_urlset([
+                (f"{base()}/pricing/enterprise", "2024-01-01"),
+                (f"{base()}/private/pricing-internal", "2024-01-01"),
+                (f"{base()}/pricing/startup", "2024-01-01"),
+            ]).encode("utf-8"))
+            return web.Response(body=body, content_type="application/x-gzip")
+
+        async def post_sitemap(request):
+            requests.append(request.path)
+            body = gzip.compress(_urlset([(f"{base()}/posts/hello-world", "2024-01-01")]).encode("utf-8"))
+            return web.Response(body=body, content_type="application/x-gzip")
+
+        async def page(request):
+            requests.append(request.path)
+            html = (
+                f"<html><head><title>{request.path}</title></head><body>"
+                f"<p>content of {request.path}</p><a href='/private/secret'>s</a></body></html>"
+            )
+            return web.Response(text=html, content_type="text/html")
+
+        app.router.add_get('/robots.txt', robots)
+        app.router.add_get('/sitemap_index.xml', index)
+        app.router.add_get('/pricing-sitemap.xml.gz', pricing_sitemap)
+        app.router.add_get('/post-sitemap.xml.gz', post_sitemap)
+        app.router.add_get('/{name:.*}', page)
+        async with local_server(app) as base_url:
+            server["url"] = base_url
+            try:
+                crawler = SiteCrawler(base() + "/", max_pages=2, query="enterprise pricing plans", use_sitemap=True)
+                return await crawler.crawl()
+            finally:
+                await HTTPClient.close()
+
+    results = asyncio.run(run())
+    fetched_pages = [path for path in requests if not path.endswith((".xml", ".gz", ".txt"))]
+    # 直接抓取站点地图中最相关的两个页面，不经过首页，也不抓取robots.txt禁止的页面
+    assert sorted(result.url.rsplit("/", 1)[-1] for result in results) == ["enterprise", "startup"]
+    assert sorted(fetched_pages) == ["/pricing/enterprise", "/pricing/startup"]
+    assert not any(path.startswith("/private/") for path in requests)
+
+
+def test_failed_loads_are_cached_only_for_negative_ttl(monkeypatch):
+    from deep_researcher.tools import sitemap
+    from deep_researcher.tools.sitemap import SitemapSeeder
+
+    seeder = SitemapSeeder(ttl=3600, negative_ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(sitemap.time, "time", lambda: now[0])
+    calls = []
+
+    async def load(value):
+        calls.append(value)
+        return value
+
+    async def run():
+        # 失败（None）的结果在 negative_ttl 之后重新加载，成功的结果缓存到 ttl
+        assert await seeder._cached("https://a.com/robots.txt", lambda: load(None)) is None
+        assert await seeder._cached("https://b.com/robots.txt", lambda: load("robots")) == "robots"
+        now[0] += 30
+        await seeder._cached("https://a.com/robots.txt", lambda: load(None))
+        now[0] += 31
+        await seeder._cached("https://a.com/robots.txt", lambda: load(None))
+        assert await seeder._cached("https://b.com/robots.txt", lambda: load("again")) == "robots"
+
+    asyncio.run(run())
+    assert calls == [None, "robots", None]
@@ -0,0 +1,99 @@
+import asyncio
+import importlib
+import random
+from types import SimpleNamespace
+
+
+def test_scheduler_reuses_matching_speculation_and_cancels_stale_ones():
+    from deep_researcher.utils.speculation import SpeculativeScheduler, gap_similarity
+
+    assert gap_similarity("固态电池的市场规模", "固态电池市场规模") >= 0.6
+    assert gap_similarity("固态电池的市场规模", "主要厂商的专利布局") < 0.6
+
+    async def scenario():
+        scheduler = SpeculativeScheduler()
+        done = asyncio.Event()
+
+        async def research(result):
+            await asyncio.sleep(0.02)
+            return result
+
+        async def blocked():
+            await done.wait()
+            return "never used"
+
+        assert scheduler.start("solid-state battery market size 2025", lambda: research("market"))
+        assert not scheduler.start("Solid-state battery market size in 2025", lambda: research("duplicate"))
+        assert scheduler.start("patent landscape of major vendors", blocked)
+        assert scheduler.start("charging infrastructure rollout", lambda: research("charging"))
+        await asyncio.sleep(0.05)
+
+        scheduler.retain(["battery market size 2025 solid-state", "recycling regulations"])
+        assert await scheduler.take("unrelated gap") is None
+        assert await scheduler.take("battery market size 2025 solid-state") == "market"
+        # 已完成但暂时用不到的结果作为缓存证据保留
+        assert await scheduler.take("charging infrastructure rollout plans") == "charging"
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["started"] == 3 and stats["hits"] == 2 and stats["cancelled"] == 1
+    assert stats["overlap_seconds"] > 0.03 and stats["pending"] == 0
+
+
+def test_run_uses_speculative_results_for_the_next_iteration(monkeypatch):
+    iterative_research = importlib.import_module("deep_researcher.iterative_research")
+    from deep_researcher.agents.tool_agents import ToolAgentOutput
+    from deep_researcher.agents.tool_selector_agent import AgentSelectionPlan, AgentTask
+    from deep_researcher.utils.logging import TraceInfo
+
+    evaluations = iter([
+        ["market size of solid-state batteries", "major vendors and their patent portfolios"],
+        ["cost of solid-state cells", "the major vendors and their patent portfolios"],
+        ["major vendors and their patent portfolios", "recycling rules"],
+    ])
+    selections = []
+
+    async def fake_run(agent, prompt, context=None):
+        await asyncio.sleep(0.01)
+        if agent.name == "ThinkingAgent":
+            output = "thought"
+        elif agent.name == "KnowledgeGapAgent":
+            output = iterative_research.KnowledgeGapOutput(research_complete=False, outstanding_gaps=next(evaluations))
+        elif agent.name == "ToolSelectorAgent":
+            gap = prompt.split("要解决的知识差距：")[1].strip().splitlines()[0]
+            selections.append(gap)
+            output = AgentSelectionPlan(tasks=[AgentTask(gap=gap, agent="WebSearchAgent", query=gap)])
+        elif agent.name == "WriterAgent":
+            output = "report"
+        else:
+            task_query = AgentTask.model_validate_json(prompt).query
+            # 每次工具执行返回一个页面，登记到上下文携带的页面指纹索引
+            context.page_index.add_if_new(random.Random(task_query).getrandbits(64), f"https://example.com/{task_query}")
+            output = ToolAgentOutput(output=f"findings for {task_query}", sources=[])
+        usage = SimpleNamespace(input_tokens=0, output_tokens=0)
+        return SimpleNamespace(final_output=output, final_output_as=lambda cls: output,
+                               raw_responses=[SimpleNamespace(usage=usage)])
+
+    async def quiet_log(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(iterative_research.ResearchRunner, "run", fake_run)
+    monkeypatch.setattr(iterative_research, "log_message", quiet_log)
+
+    researcher = iterative_research.IterativeResearcher(max_iterations=3, speculative_gaps=1)
+    report = asyncio.run(researcher.run("solid-state batteries", trace_info=TraceInfo(trace_id="speculation-test")))
+
+    assert report == "report"
+    # 厂商差距只出现过一次时不投机；第二次评估再次给出后投机执行，第三次迭代直接使用其结果
+    assert selections == [
+        "market size of solid-state batteries", "cost of solid-state cells", "the major vendors and their patent portfolios",
+    ]
+    third = researcher.conversation.history[2]
+    assert third.gap == "major vendors and their patent portfolios"
+    assert third.findings == ["findings for the major vendors and their patent portfolios"]
+    stats = researcher.speculation.stats()
+    assert stats["started"] == 1 and stats["hits"] == 1 and stats["overlap_seconds"] > 0
+    assert stats["low_confidence"] == 2  # 第一次评估的厂商差距和第三次评估的回收差距
+    # 投机任务返回的页面合并回研究者的页面指纹索引，之后的迭代会把它们当作已返回的页面
+    assert "https://example.com/the major vendors and their patent portfolios" in researcher.page_index.keys
+    assert len(researcher.page_index) == 3
@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+
+def _publish(trace_id, *events):
+    from deep_researcher.sse_manager import SSEManager
+
+    async def run():
+        for event in events:
+            await SSEManager.publish(trace_id, event, {"message": event})
+
+    asyncio.run(run())
+
+
+def _drain(subscription):
+    async def run():
+        items = []
+        while True:
+            item = await subscription.next(heartbeat=0.01)
+            if item is None or isinstance(item, str):
+                return items
+            items.append(item)
+
+    return asyncio.run(run())
+
+
+def test_events_before_subscribe_are_replayed_and_resumable():
+    from deep_researcher.sse_manager import SSEManager
+
+    SSEManager.open("replay-test")
+    try:
+        _publish("replay-test", "plan", "thought", "action")
+        first = _drain(SSEManager.subscribe("replay-test"))
+        assert [(event_id, event) for event_id, event, _ in first] == [(1, "plan"), (2, "thought"), (3, "action")]
+
+        _publish("replay-test", "task")
+        resumed = _drain(SSEManager.subscribe("replay-test", last_event_id=2))
+        assert [event for _, event, _ in resumed] == ["action", "task"]
+    finally:
+        SSEManager.channels.pop("replay-test")
+
+    # 没有通道的运行不缓冲事件
+    _publish("unknown-run", "plan")
+    assert not SSEManager.has_channel("unknown-run")
+
+
+def test_slow_subscriber_gets_gap_event_and_coalesced_backlog(monkeypatch):
+    from deep_researcher import sse_manager
+    from deep_researcher.sse_manager import SSEChannel, SSEManager
+
+    monkeypatch.setattr(sse_manager, "SSE_COALESCE_BACKLOG", 5)
+    SSEManager.channels["slow-test"] = SSEChannel("slow-test", buffer_size=10)
+    try:
+        _publish("slow-test", *["processing"] * 4)
+        _publish("slow-test", "thought", *["processing"] * 3, "scrape", "scrape", "action")
+        items = _drain(SSEManager.subscribe("slow-test"))
+    finally:
+        SSEManager.channels.pop("slow-test")
+
+    # 环形缓冲区只保留最后10个事件，第一个以 sse-gap 事件告知；积压超过5个时每种低优先级事件只保留最新一个
+    assert items[0][0] is None and items[0][1] == "sse-gap" and items[0][2]["missed"] == 1
+    assert [(event_id, event) for event_id, event, _ in items[1:]] == [
+        (5, "thought"), (8, "processing"), (10, "scrape"), (11, "action"),
+    ]
+
+
+def test_heartbeat_close_and_cleanup_after_grace_period(monkeypatch):
+    from deep_researcher import sse_manager
+    from deep_researcher.sse_manager import HEARTBEAT, SSEManager
+
+    monkeypatch.setattr(sse_manager, "SSE_CHANNEL_GRACE_SECONDS", 60)
+    channel = SSEManager.open("close-test")
+
+    async def run():
+        subscription = SSEManager.subscribe("close-test")
+        assert await subscription.next(heartbeat=0.01) == HEARTBEAT
+        waiting = asyncio.create_task(subscription.next(heartbeat=5))
+        await asyncio.sleep(0)
+        await SSEManager.publish("close-test", "plan", {"message": "计划"})
+        assert (await waiting)[1] == "plan"
+        await SSEManager.close("close-test")
+        assert (await subscription.next())[1] == "complete"
+        assert await subscription.next() is None
+        SSEManager.unsubscribe(subscription)
+
+    try:
+        asyncio.run(run())
+        assert not SSEManager.has_channel("close-test")
+        assert SSEManager.available("close-test", last_event_id=1)
+        assert not SSEManager.available("close-test", last_event_id=2)
+        assert SSEManager.cleanup(now=channel.closed_at + 30) == 0
+        assert SSEManager.cleanup(now=channel.closed_at + 60) == 1
+        assert "close-test" not in SSEManager.channels
+    finally:
+        SSEManager.channels.pop("close-test", None)
+
+
+def test_buffer_evicts_oldest_events_beyond_byte_limit():
+    from deep_researcher.sse_manager import SSEChannel, SSEManager
+    from deep_researcher.utils.metrics import payload_size
+
+    event_size = payload_size({"message": "x" * 100})
+    SSEManager.channels["bytes-test"] = SSEChannel("bytes-test", buffer_size=100, buffer_bytes=event_size * 3)
+    try:
+        async def run():
+            for _ in range(5):
+                await SSEManager.publish("bytes-test", "processing", {"message": "x" * 100})
+
+        asyncio.run(run())
+        channel = SSEManager.channels["bytes-test"]
+        assert [event_id for event_id, _, _ in channel.events] == [3, 4, 5]
+        assert channel.buffered_bytes == event_size * 3
+        items = _drain(SSEManager.subscribe("bytes-test"))
+        assert items[0][1] == "sse-gap" and items[0][2]["missed"] == 2
+
+        # 单个事件超过字节上限时仍然保留（只保留它自己）
+        channel.append("report", {"message": "y" * 1000})
+        assert [event_id for event_id, _, _ in channel.events] == [6]
+    finally:
+        SSEManager.channels.pop("bytes-test")
+
+
+def test_closed_channel_is_removed_by_timer_without_further_requests(monkeypatch):
+    from deep_researcher import sse_manager
+    from deep_researcher.sse_manager import SSEManager
+
+    monkeypatch.setattr(sse_manager, "SSE_CHANNEL_GRACE_SECONDS", 0.01)
+    SSEManager.open("timer-test")
+
+    async def run():
+        await SSEManager.close("timer-test")
+        assert "timer-test" in SSEManager.channels
+        await asyncio.sleep(0.05)
+
+    try:
+        asyncio.run(run())
+        assert "timer-test" not in SSEManager.channels
+    finally:
+        SSEManager.channels.pop("timer-test", None)
+
+
+def test_sse_endpoint_resumes_from_last_event_id_and_ends_finished_streams():
+    from fastapi.testclient import TestClient
+    from deep_researcher.sse_manager import SSEManager
+    from server.app import app
+
+    SSEManager.open("endpoint-test")
+    try:
+        _publish("endpoint-test", "plan", "thought", "action")
+        asyncio.run(SSEManager.close("endpoint-test"))
+        client = TestClient(app)
+
+        response = client.get("/sse/endpoint-test", headers={"Last-Event-ID": "1"})
+        assert response.status_code == 200
+        frames = [frame for frame in response.text.split("\n\n") if frame]
+        assert [frame.split("\n")[0] for frame in frames] == ["id: 2", "id: 3", "id: 4"]
+        assert [json.loads(frame.split("data: ", 1)[1])["event"] for frame in frames] == ["thought", "action", "complete"]
+
+        assert client.get("/sse/endpoint-test?last_event_id=4").status_code == 204
+        assert client.get("/sse/no-such-run").status_code == 204
+    finally:
+        SSEManager.channels.pop("endpoint-test", None)
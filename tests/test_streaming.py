@@ -0,0 +1,96 @@
+import asyncio
+import gzip
+import importlib
+
+
+def test_is_valid_url_checks_path_extension():
+    from deep_researcher.tools.web_search import is_valid_url
+
+    assert is_valid_url("https://nodejs.org/en/about")
+    assert is_valid_url("https://example.com/report.html?format=.pdf")
+    assert not is_valid_url("https://example.com/files/Report.PDF")
+    assert not is_valid_url("https://example.com/data.xml")
+
+
+def test_incremental_extractor_matches_extract_page():
+    from deep_researcher.tools.extraction import extract_page
+    from deep_researcher.tools.streaming import IncrementalTextExtractor
+
+    html = (
+        "<html><body><h1>标题</h1><script>skip()</script><ul><li>x<ul><li>y</li></ul></li></ul>"
+        "<p>Hello <b>world</b><!-- c -->tail</p><blockquote><p>q</p></blockquote></body></html>"
+    )
+    extractor = IncrementalTextExtractor()
+    for i in range(0, len(html), 7):
+        extractor.feed(html[i:i + 7])
+    extractor.close()
+    assert extractor.text() == extract_page(html).text
+
+
+def test_streaming_fetch_stops_early_and_decodes(monkeypatch, local_server):
+    from aiohttp import web
+    from deep_researcher.tools.http_client import HTTPClient
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+    monkeypatch.setattr(web_search.page_cache, "enabled", False)
+
+    paragraphs = "".join(f"<p>第{i}段：市场规模持续增长。</p>" for i in range(20000))
+    body = f"<html><head><meta charset='gbk'></head><body>{paragraphs}</body></html>".encode("gbk")
+    compressed = gzip.compress(body)
+
+    async def page(request):
+        return web.Response(body=compressed, headers={"Content-Type": "text/html", "Content-Encoding": "gzip"})
+
+    async def pdf(request):
+        return web.Response(body=b"%PDF-1.4", content_type="application/pdf")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/page', page)
+        app.router.add_get('/download', pdf)
+        async with local_server(app) as base_url:
+            try:
+                session = HTTPClient.get_session()
+                fetched = await web_search.fetch_page_content(session, f"{base_url}/page", extract_text=True)
+                rejected = await web_search.fetch_and_process_url(
+                    session, web_search.WebpageSnippet(url=f"{base_url}/download", title="", description=""))
+                return fetched, rejected
+            finally:
+                await HTTPClient.close()
+
+    fetched, rejected = asyncio.run(run())
+    assert fetched.truncated
+    assert len(fetched.html) < len(body.decode("gbk"))
+    assert fetched.text.startswith("第0段：市场规模持续增长。\n第1段：")
+    assert len(fetched.text) >= web_search.CONTENT_LENGTH_LIMIT
+    assert "不支持的内容类型 application/pdf" in rejected.text
+
+
+def test_streaming_fetch_finds_meta_charset_after_first_chunk(monkeypatch, local_server):
+    from aiohttp import web
+    from deep_researcher.tools.http_client import HTTPClient
+    web_search = importlib.import_module("deep_researcher.tools.web_search")
+    monkeypatch.setattr(web_search.page_cache, "enabled", False)
+
+    rest = "<meta charset='gbk'></head><body><p>固态电池的市场规模持续增长。</p></body></html>".encode("gbk")
+
+    async def page(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await response.prepare(request)
+        # 第一个块只有页面开头，字符集声明在之后的块中
+        await response.write(b"<html><head><title>t</title>")
+        await asyncio.sleep(0.05)
+        await response.write(rest)
+        await response.write_eof()
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/page', page)
+        async with local_server(app) as base_url:
+            try:
+                return await web_search.fetch_page_content(HTTPClient.get_session(), f"{base_url}/page", extract_text=True)
+            finally:
+                await HTTPClient.close()
+
+    fetched = asyncio.run(run())
+    assert fetched.text == "固态电池的市场规模持续增长。"
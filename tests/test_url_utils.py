@@ -0,0 +1,8 @@
+def test_canonicalize_url_strips_only_tracking_ids():
+    from deep_researcher.tools.url_utils import canonicalize_url
+
+    assert canonicalize_url("https://Example.com:443/a/?utm_source=x&b=2&gclid=1&a=1#top") == "https://example.com/a?a=1&b=2"
+    # 通用参数名可能决定页面内容，保留
+    assert canonicalize_url("https://forum.example.com/t/123?from=20") != canonicalize_url("https://forum.example.com/t/123?from=40")
+    assert canonicalize_url("https://git.example.com/repo?ref=v2") == "https://git.example.com/repo?ref=v2"
+    assert canonicalize_url("https://shop.example.com/item?spm=a1.b2") == "https://shop.example.com/item?spm=a1.b2"
@@ -0,0 +1,95 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+
+def _fake_result(output, input_tokens=100, output_tokens=50):
+    usage = SimpleNamespace(requests=1, input_tokens=input_tokens, output_tokens=output_tokens)
+    return SimpleNamespace(final_output=output, final_output_as=lambda cls: output,
+                           raw_responses=[SimpleNamespace(usage=usage)])
+
+
+def test_tracker_aggregates_by_agent_section_and_model_and_checks_budgets():
+    from deep_researcher.utils.usage import UsageTracker, parse_model_prices
+
+    assert parse_model_prices("gpt-4o=2.5/10, gpt-4o-mini = 0.15/0.6,broken") == {
+        "gpt-4o": (2.5, 10.0), "gpt-4o-mini": (0.15, 0.6),
+    }
+
+    tracker = UsageTracker(token_budget=0, cost_budget=0.02, prices={"gpt-4o": (2.5, 10.0)})
+    tracker.record("WriterAgent", "gpt-4o", _fake_result("a", 2000, 1000), section="市场规模")
+    tracker.record("ThinkingAgent", "local-model", _fake_result("b", 500, 100), section="市场规模")
+    call = tracker.record("WriterAgent", "gpt-4o", _fake_result("c", 2000, 1000), section="主要厂商")
+
+    assert call.cost == 0.015
+    assert tracker.total.total_tokens == 6600 and tracker.total.requests == 3
+    assert tracker.by_agent["WriterAgent"].output_tokens == 2000
+    assert tracker.by_model["local-model"].cost == 0
+    assert tracker.section("市场规模").total_tokens == 3600
+    assert tracker.section("不存在").total_tokens == 0
+    assert "费用预算" in tracker.exceeded()
+
+    summary = tracker.summary()
+    assert summary["total"]["cost"] == 0.03
+    assert set(summary["by_section"]) == {"市场规模", "主要厂商"}
+    assert UsageTracker(token_budget=10000).exceeded() is None
+
+
+def test_deep_research_sections_share_the_token_budget(monkeypatch):
+    from deep_researcher.agents import baseclass
+    from deep_researcher.agents.long_writer_agent import LongWriterOutput
+    from deep_researcher.agents.planner_agent import ReportPlan, ReportPlanSection
+    from deep_researcher.agents.tool_selector_agent import AgentSelectionPlan
+    from deep_researcher.utils.logging import TraceInfo
+    iterative_research = importlib.import_module("deep_researcher.iterative_research")
+    deep_research = importlib.import_module("deep_researcher.deep_research")
+
+    calls = []
+
+    async def fake_run(agent, prompt, context=None, **kwargs):
+        calls.append(agent.name)
+        await asyncio.sleep(0.01)
+        if agent.name == "PlannerAgent":
+            output = ReportPlan(background_context="", report_title="电池", report_outline=[
+                ReportPlanSection(title="市场规模", key_question="市场有多大？"),
+                ReportPlanSection(title="主要厂商", key_question="谁是主要厂商？"),
+            ])
+        elif agent.name == "ThinkingAgent":
+            output = "thought"
+        elif agent.name == "KnowledgeGapAgent":
+            output = iterative_research.KnowledgeGapOutput(research_complete=False, outstanding_gaps=["更多数据"])
+        elif agent.name == "ToolSelectorAgent":
+            output = AgentSelectionPlan(tasks=[])
+        elif agent.name == "LongWriterAgent":
+            output = LongWriterOutput(next_section_markdown="内容", references=[])
+        else:
+            output = "section draft"
+        return _fake_result(output)
+
+    messages = []
+
+    async def record_log(message, trace_info, additional_data=None, level="info", event=None):
+        messages.append((event, message, additional_data))
+
+    monkeypatch.setattr(baseclass.Runner, "run", fake_run)
+    monkeypatch.setattr(iterative_research, "log_message", record_log)
+    monkeypatch.setattr(deep_research, "log_message", record_log)
+
+    researcher = deep_research.DeepResearcher(max_iterations=10, verbose=False, token_budget=500)
+    asyncio.run(researcher.run("固态电池", TraceInfo(trace_id="usage-test")))
+
+    # 规划用去150 tokens，两个章节各完成一次迭代（450 tokens）后共享的预算用尽，不再开始新的迭代
+    assert calls.count("ThinkingAgent") == 2
+    assert any("达到token预算（500）" in message for _, message, _ in messages)
+
+    summary = next(data["usage"] for event, _, data in messages if event == "usage-summary")
+    assert summary["total"]["requests"] == len(calls) == 11
+    assert summary["total"]["total_tokens"] == 11 * 150
+    assert set(summary["by_section"]) == {"市场规模", "主要厂商"}
+    assert summary["by_section"]["市场规模"]["requests"] == 4
+    assert summary["by_agent"]["PlannerAgent"]["requests"] == 1
+    assert summary["by_agent"]["LongWriterAgent"]["requests"] == 2
+
+    iteration_usage = [data for event, _, data in messages if event == "token-usage"]
+    assert len(iteration_usage) == 2
+    assert all(data["section_usage"]["total_tokens"] == 450 for data in iteration_usage)